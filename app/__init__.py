@@ -5,7 +5,6 @@ from flasgger import Swagger
 from flask_jwt_extended import JWTManager
 from config import Config, TestConfig
 from app.utils.logger import setup_logger
-import redis  # Подключаем библиотеку Redis
 
 db = SQLAlchemy()
 migrate = Migrate()
@@ -24,24 +23,52 @@ def create_app(test_config=False):
     else:
         app.config.from_object(Config)
 
-    # Инициализация клиента Redis в create_app
+    # Инициализация клиента Redis в create_app: пул, таймауты и автоматический выключатель.
+    # Ответы храним в кэше как байты (в том числе gzip), поэтому без decode_responses
+    from app.utils.redis_client import create_redis_client
     global redis_client
-    redis_client = redis.StrictRedis.from_url(app.config['REDIS_URL'], decode_responses=True)
+    redis_client = create_redis_client(app.config)
+
+    # Параметры пула соединений с БД (для SQLite без размеров пула)
+    from app.utils.db_metrics import engine_options, init_query_stats
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+
+    # Метрики запросов регистрируются первыми, чтобы замер охватывал остальные хуки
+    from app.utils.request_metrics import init_request_metrics
+    init_request_metrics(app)
 
     # Инициализация других компонентов
     db.init_app(app)
+    init_query_stats(app)  # Время и число запросов к БД, медленные запросы, N+1
+    from app.utils.outbox import init_outbox_relay
+    init_outbox_relay(app)  # Доставка событий outbox, не отправленных сразу после commit
     migrate.init_app(app, db)
     jwt.init_app(app)
     Swagger(app)
 
+    # Локальный уровень кэша (импорт здесь, т.к. модулю нужен уже созданный logger)
+    from app.utils.local_cache import init_local_cache
+    init_local_cache(app)
+
     # Регистрация маршрутов
-    from .routes import client_routes, product_routes, order_routes, auth_routes
+    from .routes import client_routes, product_routes, order_routes, auth_routes, metrics_routes, report_routes
     app.register_blueprint(client_routes.bp)
     app.register_blueprint(product_routes.bp)
     app.register_blueprint(order_routes.bp)
     app.register_blueprint(auth_routes.bp)
+    app.register_blueprint(metrics_routes.bp)
+    app.register_blueprint(report_routes.bp)
+
+    # CLI-команды (flask products import ...)
+    from app.cli import register_cli
+    register_cli(app)
 
     # Добавление redis_client в приложение
     app.redis_client = redis_client
 
+    # Уровень логов из конфига приложения и доставка логов в Redis (если включена)
+    from app.utils.logger import init_redis_logging
+    logger.setLevel(app.config['LOG_LEVEL'])
+    init_redis_logging(app, logger)
+
     return app
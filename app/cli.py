@@ -0,0 +1,120 @@
+import click
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+from app.utils.catalog_import import IMPORT_FORMATS, iter_rows, import_products
+from app.utils.seed import seed_database
+from app.utils.jobs import Worker, queue_stats, requeue_dead
+from app.utils.outbox import relay, run_relay
+from app.utils.sales import rebuild_sales
+
+products_cli = AppGroup('products', help='Управление каталогом продуктов.')
+jobs_cli = AppGroup('jobs', help='Очередь фоновых задач.')
+outbox_cli = AppGroup('outbox', help='Доставка событий transactional outbox.')
+reports_cli = AppGroup('reports', help='Агрегаты продаж для отчётов.')
+
+
+@products_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(IMPORT_FORMATS),
+              help='Формат файла; по умолчанию определяется по расширению.')
+@click.option('--batch-size', type=int, default=None, help='Строк в одном upsert (IMPORT_BATCH_SIZE).')
+def import_products_command(path, fmt, batch_size):
+    """Импорт каталога из CSV или JSON Lines с upsert по sku."""
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+    batch_size = batch_size or current_app.config['IMPORT_BATCH_SIZE']
+
+    with open(path, encoding='utf-8', newline='') as lines:
+        report = import_products(iter_rows(lines, fmt), current_app.redis_client, batch_size)
+
+    for error in report['errors']:
+        click.echo(f"row {error['row']}: {error['error']}", err=True)
+    click.echo(
+        f"Processed {report['processed']} rows: {report['upserted']} upserted, "
+        f"{report['rejected']} rejected in {report['seconds']}s ({report['rows_per_second']} rows/s)."
+    )
+
+
+@click.command('seed')
+@click.option('--clients', type=int, default=10000, show_default=True)
+@click.option('--products', type=int, default=1000, show_default=True)
+@click.option('--orders', type=int, default=1000000, show_default=True)
+@click.option('--batch-size', type=int, default=None, help='Строк в одной пачке (SEED_BATCH_SIZE).')
+@click.option('--zipf', 'zipf_s', type=float, default=1.1, show_default=True,
+              help='Показатель распределения Ципфа; больше — сильнее перекос популярности.')
+@click.option('--days', type=int, default=365, show_default=True, help='Глубина истории заказов в днях.')
+@click.option('--seed', 'seed', type=int, default=None, help='Seed генератора для воспроизводимых данных.')
+@click.option('--password', default='password', show_default=True, help='Пароль всех созданных клиентов.')
+@with_appcontext
+def seed_command(clients, products, orders, batch_size, zipf_s, days, seed, password):
+    """Синтетические клиенты, продукты и заказы для нагрузочных тестов."""
+    batch_size = batch_size or current_app.config['SEED_BATCH_SIZE']
+
+    def progress(name, done, total, seconds):
+        click.echo(f"{name}: {done}/{total} ({seconds:.1f}s)")
+
+    report = seed_database(clients, products, orders, batch_size, zipf_s=zipf_s, days=days, seed=seed,
+                           password=password, redis_client=current_app.redis_client, progress=progress)
+    click.echo(
+        f"Seeded {report['clients']} clients, {report['products']} products and {report['orders']} orders "
+        f"in {report['seconds']}s ({report['rows_per_second']} rows/s)."
+    )
+
+
+@jobs_cli.command('worker')
+@click.option('--queue', default='default', show_default=True)
+@click.option('--burst', is_flag=True, help='Завершиться, когда очередь опустеет.')
+def jobs_worker_command(queue, burst):
+    """Обработка фоновых задач (подтверждения, аналитика, остатки)."""
+    worker = Worker(current_app._get_current_object(), current_app.redis_client, queue=queue)
+    click.echo(f"Worker {worker.worker_id} listening on queue {queue}.")
+    processed = worker.run(burst=burst)
+    click.echo(f"Processed {processed} jobs.")
+
+
+@jobs_cli.command('stats')
+@click.option('--queue', default='default', show_default=True)
+def jobs_stats_command(queue):
+    """Размер очереди, отложенных повторов и мёртвых задач."""
+    stats = queue_stats(current_app.redis_client, queue)
+    click.echo(f"queued: {stats['queued']}, delayed: {stats['delayed']}, dead: {stats['dead']}")
+
+
+@jobs_cli.command('requeue-dead')
+@click.option('--queue', default='default', show_default=True)
+@click.option('--limit', type=int, default=None, help='Сколько задач вернуть (по умолчанию все).')
+def jobs_requeue_dead_command(queue, limit):
+    """Возврат мёртвых задач в очередь после исправления причины ошибки."""
+    moved = requeue_dead(current_app.redis_client, queue, limit)
+    click.echo(f"Requeued {moved} jobs.")
+
+
+@outbox_cli.command('relay')
+@click.option('--once', is_flag=True, help='Доставить накопившиеся события и завершиться.')
+@click.option('--interval', type=float, default=None, help='Пауза между проходами (OUTBOX_RELAY_INTERVAL).')
+def outbox_relay_command(once, interval):
+    """Доставка сбросов кэша и задач из outbox в Redis."""
+    if once:
+        delivered = relay(current_app.redis_client, current_app.config['OUTBOX_BATCH_SIZE'])
+        click.echo(f"Delivered {delivered} outbox events.")
+        return
+    interval = interval or current_app.config['OUTBOX_RELAY_INTERVAL']
+    click.echo(f"Relaying outbox events every {interval}s.")
+    run_relay(current_app._get_current_object(), interval)
+
+
+@reports_cli.command('rollup')
+def reports_rollup_command():
+    """Полный пересчёт агрегатов продаж по таблице заказов."""
+    counts = rebuild_sales()
+    click.echo(
+        f"Rebuilt sales aggregates: {counts['product_sales']} products, "
+        f"{counts['client_sales']} clients, {counts['daily_sales']} days."
+    )
+
+
+def register_cli(app):
+    app.cli.add_command(products_cli)
+    app.cli.add_command(jobs_cli)
+    app.cli.add_command(outbox_cli)
+    app.cli.add_command(reports_cli)
+    app.cli.add_command(seed_command)
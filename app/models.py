@@ -27,12 +27,25 @@ class Client(db.Model):
             raise ValueError(f"Invalid role: {role}")
         db.session.commit()
 
+        # Роль кэшируется и передаётся в JWT — новая роль должна вытеснить старую
+        from app.utils.auth import invalidate_client_role
+        invalidate_client_role(self.id, self.role)
+
     def get_role(self):
         """Метод для получения роли пользователя"""
         return self.role
 
+    def to_dict(self):
+        """Сериализация клиента для ответов API"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'email': self.email
+        }
+
 class Product(db.Model):
     id = db.Column(db.Integer, primary_key=True)
+    sku = db.Column(db.String(64), unique=True, nullable=True)  # Артикул поставщика, ключ для импорта
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=True)
     price = db.Column(db.Float, nullable=False)
@@ -42,7 +55,26 @@ class Product(db.Model):
     def __repr__(self):
         return f'<Product {self.name}>'
 
+    def to_dict(self):
+        """Сериализация продукта для ответов API"""
+        return {
+            'id': self.id,
+            'sku': self.sku,
+            'name': self.name,
+            'description': self.description,
+            'price': self.price,
+            'stock': self.stock
+        }
+
 class Order(db.Model):
+    # Индексы под основные запросы: история заказов клиента (по дате),
+    # заказы продукта и отчёты за период
+    __table_args__ = (
+        db.Index('ix_order_client_id_created_at', 'client_id', 'created_at'),
+        db.Index('ix_order_product_id', 'product_id'),
+        db.Index('ix_order_created_at', 'created_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     client_id = db.Column(db.Integer, db.ForeignKey('client.id'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
@@ -55,3 +87,63 @@ class Order(db.Model):
 
     def __repr__(self):
         return f'<Order {self.id}>'
+
+    def to_dict(self):
+        """Сериализация заказа для ответов API"""
+        return {
+            'id': self.id,
+            'client_id': self.client_id,
+            'product_id': self.product_id,
+            'quantity': self.quantity,
+            'total_price': self.total_price
+        }
+
+class ProductSales(db.Model):
+    """Продажи продукта нарастающим итогом — обновляются в транзакции заказа"""
+    __table_args__ = (
+        db.Index('ix_product_sales_revenue', 'revenue'),
+        db.Index('ix_product_sales_items', 'items'),
+    )
+
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='CASCADE'), primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    items = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+class ClientSales(db.Model):
+    """Покупки клиента нарастающим итогом"""
+    __table_args__ = (
+        db.Index('ix_client_sales_revenue', 'revenue'),
+    )
+
+    client_id = db.Column(db.Integer, db.ForeignKey('client.id', ondelete='CASCADE'), primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    items = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+class DailySales(db.Model):
+    """
+    Продажи за день (UTC, по дате создания заказа). Счётчик дня разбит на шарды,
+    чтобы параллельные заказы не ждали блокировку одной строки; итог — сумма шардов
+    """
+    day = db.Column(db.Date, primary_key=True)
+    shard = db.Column(db.SmallInteger, primary_key=True, default=0)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    items = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+class OutboxEvent(db.Model):
+    """
+    Событие transactional outbox: пишется в той же транзакции, что и изменение данных,
+    и доставляется в Redis (сброс кэша, фоновые задачи) после commit или relay-процессом.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(32), nullable=False)  # invalidate | jobs
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Время захвата немедленной доставкой после commit; relay такие события не трогает
+    # до истечения OUTBOX_CLAIM_TIMEOUT
+    claimed_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<OutboxEvent {self.id} {self.kind}>'
@@ -1,11 +1,14 @@
-from flask import Blueprint, request, jsonify, current_app
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token
 from app import db, logger
 from app.models import Client, RoleEnum  # Используем RoleEnum
+from app.utils.passwords import hash_password, verify_password, needs_rehash, PasswordHasherBusy
+from app.utils.rate_limit import rate_limit, by_ip, by_json_field
 
 bp = Blueprint('auth_routes', __name__, url_prefix='/auth')
 
+LOGIN_LIMIT_MESSAGE = 'Too many login attempts. Please try again later.'
+
 @bp.route('/register', methods=['POST'])
 def register():
     """
@@ -34,6 +37,8 @@ def register():
         description: User registered successfully
       400:
         description: Email already exists
+      503:
+        description: Password hashing queue is full, retry later
     """
     data = request.get_json()
     
@@ -42,29 +47,41 @@ def register():
         return jsonify({'error': 'Name, email, and password are required'}), 400
 
     if Client.query.filter_by(email=data['email']).first():
-        logger.error(f"Registration failed: email {data['email']} already exists.")
+        logger.error("Registration failed: email %s already exists.", data['email'])
         return jsonify({'error': 'Email already exists'}), 400
 
-    hashed_password = generate_password_hash(data['password'], method='pbkdf2:sha256')
+    try:
+        # Хэш считается в пуле процессов, метод и стоимость — из PASSWORD_HASH_METHOD
+        hashed_password = hash_password(data['password'])
+    except PasswordHasherBusy as e:
+        logger.warning("Registration for %s rejected: %s", data['email'], e)
+        return jsonify({'error': 'Server is busy, please try again later'}), 503
 
     try:
-        # Добавление роли 'user' при регистрации
+        # Добавление роли 'client' при регистрации
         new_client = Client(
             name=data['name'],
             email=data['email'],
             phone=data.get('phone'),
-            role=RoleEnum.USER  # Используем RoleEnum для роли
+            role=RoleEnum.CLIENT  # Используем RoleEnum для роли
         )
         new_client.password = hashed_password
         db.session.add(new_client)
         db.session.commit()
-        logger.info(f"User {data['email']} registered successfully.")
+        logger.info("User %s registered successfully.", data['email'])
         return jsonify({'message': 'User registered successfully'}), 201
     except Exception as e:
-        logger.error(f"Error during user registration: {e}")
+        logger.error("Error during user registration: %s", e)
         return jsonify({'error': 'Registration failed due to server error'}), 500
 
 @bp.route('/login', methods=['POST'])
+# Неудачные входы ограничиваются скользящим окном по IP (перебор аккаунтов)
+# и по email (перебор паролей); успешный вход сбрасывает счётчик email
+@rate_limit('login_attempts_ip', limit='LOGIN_IP_MAX_ATTEMPTS', window='LOGIN_ATTEMPTS_WINDOW',
+            key_func=by_ip, count_status=(401,), message=LOGIN_LIMIT_MESSAGE)
+@rate_limit('login_attempts', limit='LOGIN_MAX_ATTEMPTS', window='LOGIN_ATTEMPTS_WINDOW',
+            key_func=by_json_field('email'), count_status=(401,), reset_on_success=True,
+            message=LOGIN_LIMIT_MESSAGE)
 def login():
     """
     User login
@@ -89,6 +106,10 @@ def login():
         description: Login successful
       401:
         description: Invalid credentials
+      429:
+        description: Too many failed login attempts for this email or IP (see Retry-After)
+      503:
+        description: Password hashing queue is full, retry later
     """
     data = request.get_json()
 
@@ -96,36 +117,40 @@ def login():
         logger.error("Missing email or password in login request.")
         return jsonify({'error': 'Email and password are required'}), 400
 
-    # Ограничение количества попыток входа через Redis
-    redis_client = current_app.redis_client
-    attempts_key = f"login_attempts:{data['email']}"
-    attempts = redis_client.get(attempts_key)
-
-    if attempts and int(attempts) >= 5:
-        logger.warning(f"Too many login attempts for {data['email']}.")
-        return jsonify({'error': 'Too many login attempts. Please try again later.'}), 429
-
     client = Client.query.filter_by(email=data['email']).first()
 
-    if not client or not check_password_hash(client.password, data['password']):
-        # Увеличение счётчика попыток при ошибке
-        redis_client.incr(attempts_key)
-        redis_client.expire(attempts_key, 300)  # Срок действия ключа: 5 минут
-        logger.warning(f"Invalid login attempt for email {data['email']}.")
+    try:
+        password_ok = client is not None and verify_password(client.password, data['password'])
+    except PasswordHasherBusy as e:
+        logger.warning("Login for %s rejected: %s", data['email'], e)
+        return jsonify({'error': 'Server is busy, please try again later'}), 503
+
+    if not password_ok:
+        # Попытка учитывается декораторами rate_limit по коду ответа 401
+        logger.warning("Invalid login attempt for email %s.", data['email'])
         return jsonify({'error': 'Invalid credentials'}), 401
 
     try:
-        # Успешный вход: сброс счётчика попыток
-        redis_client.delete(attempts_key)
+        # Параметры хэширования изменились — пересчитываем хэш, пока известен пароль
+        if needs_rehash(client.password):
+            try:
+                client.password = hash_password(data['password'])
+                db.session.commit()
+                logger.info("Password hash for %s upgraded.", data['email'])
+            except PasswordHasherBusy:
+                # Не критично: хэш обновится при одном из следующих входов
+                logger.warning("Password rehash for %s postponed: hashing pool is busy.", data['email'])
 
         # Генерация JWT токена с ролью
-        access_token = create_access_token(identity=client.id, additional_claims={
+        # identity — строка (требование claim sub), роль — значение Enum, чтобы
+        # admin_required мог проверять доступ по подписанному claim без запроса в БД
+        access_token = create_access_token(identity=str(client.id), additional_claims={
             'name': client.name,
             'email': client.email,
-            'role': client.role  # Роль клиента добавляем в claims
+            'role': client.role.value  # Роль клиента добавляем в claims
         })
-        logger.info(f"User {data['email']} logged in successfully.")
+        logger.info("User %s logged in successfully.", data['email'])
         return jsonify({'access_token': access_token}), 200
     except Exception as e:
-        logger.error(f"Error during login for {data['email']}: {e}")
+        logger.error("Error during login for %s: %s", data['email'], e)
         return jsonify({'error': 'Login failed due to server error'}), 500
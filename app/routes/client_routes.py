@@ -1,24 +1,47 @@
+import secrets
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required
 from app import db, logger
 from app.models import Client
 from app.utils.auth import admin_required  # Импортируем декоратор
-import json
+from app.utils.cache import (
+    cached_json_response, conditional_collection
+)
+from app.utils.outbox import record_invalidation, commit_with_outbox
+from app.utils.pagination import is_paginated, cached_page_response, PaginationError
+from app.utils.export import ndjson_response
+from app.utils.order_history import client_orders_response
+from app.utils.passwords import hash_password, PasswordHasherBusy
 
 bp = Blueprint('client_routes', __name__, url_prefix='/clients')
 
 @bp.route('/', methods=['GET'])
 @jwt_required()
 @admin_required  # Добавлен декоратор для проверки админских прав
+@conditional_collection('clients')  # 304 по If-None-Match без обращения к БД
 def get_clients():
     """
     Get all clients
     --- 
     tags:
       - Clients
+    parameters:
+      - name: limit
+        in: query
+        required: false
+        type: integer
+        example: 50
+        description: Page size; enables cursor pagination
+      - name: cursor
+        in: query
+        required: false
+        type: string
+        description: Value of next_cursor from the previous page
     responses:
+      304:
+        description: Not modified since the version in If-None-Match
       200:
-        description: A list of clients
+        description: A list of clients (or a page {items, next_cursor} when limit/cursor is given)
         schema:
           type: array
           items:
@@ -36,26 +59,105 @@ def get_clients():
     """
     redis_client = current_app.redis_client
 
-    cached_clients = redis_client.get('clients')
+    if is_paginated(request.args):
+        try:
+            return cached_page_response(redis_client, 'clients', Client, request.args, ttl=60)
+        except PaginationError as e:
+            return jsonify({'error': str(e)}), 400
 
-    if cached_clients:
-        # Если данные есть в кэше, возвращаем их
-        logger.info("Returning clients from cache.")
-        clients = json.loads(cached_clients)  # Десериализуем JSON из кэша
-    else:
-        # Если данных нет в кэше, получаем из БД и сохраняем в кэш
+    def load_clients():
+        # Вызывается только при промахе кэша и только одним воркером
         logger.info("Fetching clients from database.")
-        clients = [{
-            'id': c.id,
-            'name': c.name,
-            'email': c.email
-        } for c in Client.query.all()]
+        return [c.to_dict() for c in Client.query.all()]
+
+    # Сохраняем в кэш с TTL 60 секунд
+    return cached_json_response(redis_client, 'clients', load_clients, ttl=60, collection='clients')
+
+@bp.route('/<int:client_id>/orders', methods=['GET'])
+@jwt_required()
+@admin_required  # История заказов доступна администратору (поддержке)
+def get_client_orders(client_id):
+    """
+    Get order history of a client, newest first
+    --- 
+    tags:
+      - Clients
+    parameters:
+      - name: client_id
+        in: path
+        required: true
+        type: integer
+        example: 1
+      - name: limit
+        in: query
+        required: false
+        type: integer
+        example: 50
+      - name: cursor
+        in: query
+        required: false
+        type: string
+        description: Value of next_cursor from the previous page
+      - name: from
+        in: query
+        required: false
+        type: string
+        example: "2024-01-01"
+        description: Only orders created at or after this date/datetime (ISO 8601)
+      - name: to
+        in: query
+        required: false
+        type: string
+        example: "2024-02-01T00:00:00"
+        description: Only orders created before this date/datetime (ISO 8601)
+    responses:
+      200:
+        description: A page of orders {items, next_cursor}
+      400:
+        description: Invalid limit, cursor or date filter
+      404:
+        description: Client not found
+    """
+    if not db.session.query(Client.id).filter_by(id=client_id).first():
+        logger.error("Client with ID %s not found.", client_id)
+        return jsonify({'error': 'Client not found'}), 404
+
+    try:
+        return client_orders_response(current_app.redis_client, client_id, request.args)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
 
-        # Сохраняем в кэш с TTL 60 секунд (сериализация в JSON)
-        redis_client.set('clients', json.dumps(clients), ex=60)
-        logger.info("Clients data cached.")
+@bp.route('/export', methods=['GET'])
+@jwt_required()
+@admin_required  # Выгрузка всей таблицы доступна только администратору
+def export_clients():
+    """
+    Export all clients as a stream
+    --- 
+    tags:
+      - Clients
+    produces:
+      - application/x-ndjson
+    parameters:
+      - name: format
+        in: query
+        required: false
+        type: string
+        enum: [ndjson]
+        default: ndjson
+    responses:
+      200:
+        description: One JSON object per line, streamed in batches from the database
+      400:
+        description: Unsupported export format
+    """
+    export_format = request.args.get('format', 'ndjson')
+    if export_format != 'ndjson':
+        logger.error("Unsupported export format: %s", export_format)
+        return jsonify({'error': 'Unsupported export format'}), 400
 
-    return jsonify(clients), 200
+    logger.info("Streaming clients export.")
+    return ndjson_response(Client, 'clients')
 
 @bp.route('/', methods=['POST'])
 @jwt_required()
@@ -82,6 +184,10 @@ def create_client():
             phone:
               type: string
               example: "+79539688575"
+            password:
+              type: string
+              example: "password123"
+              description: Initial password; without it a random one is set and the client cannot log in until it is changed
     responses:
       201:
         description: Client created successfully
@@ -94,30 +200,35 @@ def create_client():
             id:
               type: integer
               example: 1
+      503:
+        description: Password hashing queue is full, retry later
     """
     data = request.get_json()
-    logger.info(f"Received client creation request: {data}")
+    logger.info("Received client creation request: %s", data)
 
     # Валидация входных данных
     if not data.get('name') or not data.get('email'):
         logger.error("Missing required fields: name or email.")
         return jsonify({'error': 'Name and email are required'}), 400
 
+    try:
+        # Без пароля клиенту задаётся случайный: войти он сможет только после смены пароля
+        hashed_password = hash_password(data.get('password') or secrets.token_urlsafe(32))
+    except PasswordHasherBusy as e:
+        logger.warning("Client creation for %s rejected: %s", data['email'], e)
+        return jsonify({'error': 'Server is busy, please try again later'}), 503
+
     try:
         # Создание нового клиента
-        client = Client(name=data['name'], email=data['email'], phone=data.get('phone'))
+        client = Client(name=data['name'], email=data['email'], phone=data.get('phone'), password=hashed_password)
         db.session.add(client)
-        db.session.commit()
-        logger.info(f"Client created with ID {client.id}")
-
-        
-        redis_client = current_app.redis_client
-        # Сбрасываем кэш, так как данные изменены
-        redis_client.delete('clients')
-        logger.info("Cleared clients cache.")
+        # Сбрасываем кэш, так как данные изменены (событие outbox в той же транзакции)
+        record_invalidation('clients')
+        commit_with_outbox()
+        logger.info("Client created with ID %s", client.id)
 
         return jsonify({'message': 'Client created successfully', 'id': client.id}), 201
 
     except Exception as e:
-        logger.error(f"Error while creating client: {e}")
+        logger.error("Error while creating client: %s", e)
         return jsonify({'error': 'Client creation failed'}), 500
@@ -0,0 +1,148 @@
+import hmac
+import redis
+from flask import Blueprint, Response, jsonify, current_app, request
+from flask_jwt_extended import jwt_required
+from app import logger
+from app.utils.auth import admin_required
+from app.utils.redis_client import pool_stats
+from app.utils.request_metrics import flush_metrics, read_metrics, render_prometheus
+
+bp = Blueprint('metrics_routes', __name__, url_prefix='/metrics')
+PROMETHEUS_MIMETYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+@bp.route('', methods=['GET'])
+def prometheus_metrics():
+    """
+    Request metrics of all workers in Prometheus text format
+    --- 
+    tags:
+      - Metrics
+    produces:
+      - text/plain
+    parameters:
+      - name: Authorization
+        in: header
+        type: string
+        required: true
+        description: "Bearer METRICS_TOKEN"
+    responses:
+      200:
+        description: Latency and response size histograms, DB and Redis time per endpoint, cache hits and misses per key family
+      401:
+        description: Missing or invalid metrics token
+      404:
+        description: Metrics are disabled or METRICS_TOKEN is not configured
+    """
+    registry = current_app.extensions.get('request_metrics')
+    if registry is None:
+        return jsonify({'message': 'Metrics are disabled'}), 404
+
+    # Без токена эндпоинт закрыт: метрики раскрывают маршруты, нагрузку и состояние кэша
+    token = current_app.config['METRICS_TOKEN']
+    if not token:
+        logger.warning("Metrics request rejected: METRICS_TOKEN is not configured.")
+        return jsonify({'message': 'Metrics are disabled: METRICS_TOKEN is not configured'}), 404
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return jsonify({'message': 'Invalid metrics token'}), 401
+
+    key = current_app.config['METRICS_REDIS_KEY']
+    try:
+        # Свои накопленные значения отправляем сразу, остальные воркеры — по расписанию
+        flush_metrics(registry, current_app.redis_client, key)
+        values = read_metrics(current_app.redis_client, key)
+    except redis.RedisError as e:
+        logger.warning("Redis unavailable (%s), serving metrics of this worker only.", e)
+        values = registry.snapshot()
+    return Response(render_prometheus(values), content_type=PROMETHEUS_MIMETYPE)
+
+@bp.route('/cache', methods=['GET'])
+@jwt_required()
+@admin_required  # Внутренняя статистика доступна только администратору
+def cache_metrics():
+    """
+    Cache hit/miss counters per tier for this worker
+    --- 
+    tags:
+      - Metrics
+    responses:
+      200:
+        description: Hit/miss counters of the in-process and Redis cache tiers
+        schema:
+          type: object
+          properties:
+            local:
+              type: object
+              properties:
+                hits:
+                  type: integer
+                  example: 120
+                misses:
+                  type: integer
+                  example: 3
+                size:
+                  type: integer
+                  example: 2
+            redis:
+              type: object
+              properties:
+                hits:
+                  type: integer
+                  example: 3
+                misses:
+                  type: integer
+                  example: 1
+    """
+    stats = current_app.extensions['cache_stats'].snapshot()
+    stats['local']['size'] = len(current_app.extensions['local_cache'])
+    return jsonify(stats), 200
+
+@bp.route('/redis', methods=['GET'])
+@jwt_required()
+@admin_required  # Внутренняя статистика доступна только администратору
+def redis_metrics():
+    """
+    Redis connection pool utilization and circuit breaker state for this worker
+    --- 
+    tags:
+      - Metrics
+    responses:
+      200:
+        description: Pool size and usage; the breaker is open while Redis is considered unavailable
+        schema:
+          type: object
+          properties:
+            pool:
+              type: object
+              properties:
+                class:
+                  type: string
+                  example: "BlockingConnectionPool"
+                max_connections:
+                  type: integer
+                  example: 50
+                created:
+                  type: integer
+                  example: 8
+                in_use:
+                  type: integer
+                  example: 2
+                idle:
+                  type: integer
+                  example: 6
+                utilization:
+                  type: number
+                  example: 0.04
+            circuit_breaker:
+              type: object
+              properties:
+                state:
+                  type: string
+                  example: "closed"
+                failures:
+                  type: integer
+                  example: 0
+                rejected:
+                  type: integer
+                  example: 0
+    """
+    return jsonify(pool_stats(current_app.redis_client)), 200
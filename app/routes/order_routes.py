@@ -3,22 +3,47 @@ from flask_jwt_extended import jwt_required
 from app import db, logger
 from app.models import Order, Client, Product
 from app.utils.auth import admin_required  # Импортируем декоратор
-import json
+from app.utils.cache import cached_json_response, conditional_collection, entity_key
+from app.utils.pagination import is_paginated, cached_page_response, PaginationError
+from app.utils.export import ndjson_response
+from app.utils.stock import reserve_stock, reserve_stock_batch, release_stock
+from app.utils.order_history import client_orders_collection
+from app.utils.outbox import record_invalidation, record_jobs, commit_with_outbox
+from app.utils.order_events import order_created_jobs, order_deleted_jobs
+from app.utils.sales import record_sales
+from sqlalchemy import insert
+from collections import defaultdict
+from datetime import datetime
 
 bp = Blueprint('order_routes', __name__, url_prefix='/orders')
 
 @bp.route('/', methods=['GET'])
 @jwt_required()
 @admin_required  # Добавлен декоратор для проверки админских прав
+@conditional_collection('orders')  # 304 по If-None-Match без обращения к БД
 def get_orders():
     """
     Get all orders
     --- 
     tags:
       - Orders
+    parameters:
+      - name: limit
+        in: query
+        required: false
+        type: integer
+        example: 50
+        description: Page size; enables cursor pagination
+      - name: cursor
+        in: query
+        required: false
+        type: string
+        description: Value of next_cursor from the previous page
     responses:
+      304:
+        description: Not modified since the version in If-None-Match
       200:
-        description: A list of orders
+        description: A list of orders (or a page {items, next_cursor} when limit/cursor is given)
         schema:
           type: array
           items:
@@ -43,28 +68,51 @@ def get_orders():
     # Используем redis_client из текущего приложения
     redis_client = current_app.redis_client
 
-    cached_orders = redis_client.get('orders')
+    if is_paginated(request.args):
+        try:
+            return cached_page_response(redis_client, 'orders', Order, request.args, ttl=60)
+        except PaginationError as e:
+            return jsonify({'error': str(e)}), 400
 
-    if cached_orders:
-        # Если данные есть в кэше, возвращаем их
-        logger.info("Returning orders from cache.")
-        orders = json.loads(cached_orders)
-    else:
-        # Если данных нет в кэше, получаем из БД и сохраняем в кэш
+    def load_orders():
+        # Вызывается только при промахе кэша и только одним воркером
         logger.info("Fetching orders from database.")
-        orders = [{
-            'id': o.id, 
-            'client_id': o.client_id, 
-            'product_id': o.product_id, 
-            'quantity': o.quantity, 
-            'total_price': o.total_price
-        } for o in Order.query.all()]
+        return [o.to_dict() for o in Order.query.all()]
 
-        # Сохраняем в кэш с TTL 60 секунд
-        redis_client.set('orders', json.dumps(orders), ex=60)
-        logger.info("Orders data cached.")
+    # Сохраняем в кэш с TTL 60 секунд
+    return cached_json_response(redis_client, 'orders', load_orders, ttl=60, collection='orders')
+
+@bp.route('/export', methods=['GET'])
+@jwt_required()
+@admin_required  # Выгрузка всей таблицы доступна только администратору
+def export_orders():
+    """
+    Export all orders as a stream
+    --- 
+    tags:
+      - Orders
+    produces:
+      - application/x-ndjson
+    parameters:
+      - name: format
+        in: query
+        required: false
+        type: string
+        enum: [ndjson]
+        default: ndjson
+    responses:
+      200:
+        description: One JSON object per line, streamed in batches from the database
+      400:
+        description: Unsupported export format
+    """
+    export_format = request.args.get('format', 'ndjson')
+    if export_format != 'ndjson':
+        logger.error("Unsupported export format: %s", export_format)
+        return jsonify({'error': 'Unsupported export format'}), 400
 
-    return jsonify(orders), 200
+    logger.info("Streaming orders export.")
+    return ndjson_response(Order, 'orders')
 
 @bp.route('/', methods=['POST'])
 @jwt_required()
@@ -104,7 +152,7 @@ def create_order():
               type: integer
               example: 1
       400:
-        description: Invalid client or product ID or insufficient stock
+        description: Invalid client or product ID, invalid quantity or insufficient stock
         schema:
           type: object
           properties:
@@ -113,39 +161,154 @@ def create_order():
               example: "Invalid client or product ID"
     """
     data = request.get_json()
-    logger.info(f"Received order creation request: {data}")
+    logger.info("Received order creation request: %s", data)
 
-    client = Client.query.get(data['client_id'])
-    product = Product.query.get(data['product_id'])
+    quantity = data.get('quantity')
+    if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+        logger.error("Invalid order quantity.")
+        return jsonify({'error': 'Quantity must be a positive integer'}), 400
 
-    if not client or not product:
-        logger.error("Invalid client or product ID.")
-        return jsonify({'error': 'Invalid client or product ID'}), 400
+    client_exists = db.session.query(Client.id).filter_by(id=data['client_id']).first()
 
-    if product.stock < data['quantity']:
+    # Проверка остатка и списание — один условный UPDATE, без гонки между чтением и записью
+    price = reserve_stock(data['product_id'], quantity) if client_exists else None
+
+    if price is None:
+        db.session.rollback()
+        if not client_exists or db.session.get(Product, data['product_id']) is None:
+            logger.error("Invalid client or product ID.")
+            return jsonify({'error': 'Invalid client or product ID'}), 400
         logger.error("Not enough stock available.")
         return jsonify({'error': 'Not enough stock available'}), 400
 
-    total_price = product.price * data['quantity']
     order = Order(
         client_id=data['client_id'], 
         product_id=data['product_id'], 
-        quantity=data['quantity'], 
-        total_price=total_price
+        quantity=quantity, 
+        total_price=price * quantity
     )
-    product.stock -= data['quantity']
     db.session.add(order)
-    db.session.commit()
-    logger.info(f"Order created successfully with ID {order.id}")
+    db.session.flush()  # id заказа нужен событиям outbox
+    # Агрегаты продаж для отчётов обновляются в той же транзакции
+    record_sales([dict(order.to_dict(), created_at=order.created_at)])
 
-    
-    redis_client = current_app.redis_client
-    # Сбрасываем кэш, так как данные изменены
-    redis_client.delete('orders')
-    logger.info("Cleared orders cache.")
+    # Сбрасываем кэш, так как данные изменены (остаток продукта тоже изменился);
+    # история заказов сбрасывается только у этого клиента. Сброс кэша и фоновые задачи
+    # (подтверждение, аналитика, проверка остатка) фиксируются в outbox той же транзакцией
+    record_invalidation('orders', 'products_list', client_orders_collection(order.client_id),
+                        keys=[entity_key(Product, order.product_id)])
+    record_jobs(*order_created_jobs([order.to_dict()]))
+    commit_with_outbox()
+    logger.info("Order created successfully with ID %s", order.id)
 
     return jsonify({'message': 'Order created successfully', 'id': order.id}), 201
 
+@bp.route('/batch', methods=['POST'])
+@jwt_required()
+@admin_required  # Только администратор может создавать заказы
+def create_orders_batch():
+    """
+    Create several orders (a basket) in one transaction
+    --- 
+    tags:
+      - Orders
+    parameters:
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          properties:
+            client_id:
+              type: integer
+              example: 1
+            items:
+              type: array
+              items:
+                type: object
+                properties:
+                  product_id:
+                    type: integer
+                    example: 2
+                  quantity:
+                    type: integer
+                    example: 3
+    responses:
+      201:
+        description: All orders created; IDs are in the same order as items
+        schema:
+          type: object
+          properties:
+            message:
+              type: string
+              example: "Orders created successfully"
+            ids:
+              type: array
+              items:
+                type: integer
+              example: [10, 11]
+      400:
+        description: Invalid payload, client or product ID, or insufficient stock (nothing is created)
+    """
+    data = request.get_json()
+    logger.info("Received batch order creation request: %s", data)
+
+    items = data.get('items') if isinstance(data, dict) else None
+    max_lines = current_app.config['ORDER_BATCH_MAX_LINES']
+    if not isinstance(items, list) or not 1 <= len(items) <= max_lines:
+        logger.error("Invalid batch order items.")
+        return jsonify({'error': f'items must be a list of 1 to {max_lines} lines'}), 400
+
+    # Суммарное количество по каждому продукту: одинаковые строки списываются вместе
+    quantities = defaultdict(int)
+    for item in items:
+        product_id, quantity = (item.get('product_id'), item.get('quantity')) if isinstance(item, dict) else (None, None)
+        if not isinstance(product_id, int) or not isinstance(quantity, int) \
+                or isinstance(quantity, bool) or quantity < 1:
+            logger.error("Invalid batch order line: %s", item)
+            return jsonify({'error': 'Each item needs an integer product_id and a positive integer quantity'}), 400
+        quantities[product_id] += quantity
+
+    if not db.session.query(Client.id).filter_by(id=data.get('client_id')).first():
+        logger.error("Invalid client ID in batch order.")
+        return jsonify({'error': 'Invalid client or product ID'}), 400
+
+    # Один UPDATE ... WHERE id IN (...) списывает остатки и возвращает цены всех продуктов
+    prices = reserve_stock_batch(dict(quantities))
+    if len(prices) != len(quantities):
+        db.session.rollback()
+        existing = {product_id for (product_id,) in
+                    db.session.query(Product.id).filter(Product.id.in_(list(quantities)))}
+        if existing != set(quantities):
+            logger.error("Invalid product IDs in batch order: %s", sorted(set(quantities) - existing))
+            return jsonify({'error': 'Invalid client or product ID'}), 400
+        logger.error("Not enough stock available for batch order.")
+        return jsonify({'error': 'Not enough stock available'}), 400
+
+    # Все заказы вставляются одним executemany
+    rows = [{
+        'client_id': data['client_id'],
+        'product_id': item['product_id'],
+        'quantity': item['quantity'],
+        'total_price': prices[item['product_id']] * item['quantity']
+    } for item in items]
+    # Дата задаётся явно, чтобы дневной агрегат совпал с датой заказов
+    created_at = datetime.utcnow()
+    order_ids = db.session.execute(
+        insert(Order).returning(Order.id, sort_by_parameter_order=True),
+        [dict(row, created_at=created_at) for row in rows]
+    ).scalars().all()
+    record_sales([dict(row, created_at=created_at) for row in rows])
+
+    # Один сброс кэша и одна задача каждого вида на весь пакет
+    record_invalidation('orders', 'products_list', client_orders_collection(data['client_id']),
+                        keys=[entity_key(Product, product_id) for product_id in quantities])
+    record_jobs(*order_created_jobs([dict(row, id=order_id) for row, order_id in zip(rows, order_ids)]))
+    commit_with_outbox()
+    logger.info("Batch of %s orders created successfully.", len(order_ids))
+
+    return jsonify({'message': 'Orders created successfully', 'ids': order_ids}), 201
+
 @bp.route('/<int:order_id>/', methods=['DELETE'])
 @jwt_required()
 @admin_required  # Только администратор может удалять заказы
@@ -173,21 +336,19 @@ def delete_order(order_id):
       404:
         description: Order not found
     """
-    logger.info(f"Attempting to delete order with ID {order_id}")
+    logger.info("Attempting to delete order with ID %s", order_id)
     order = Order.query.get_or_404(order_id)
-    product = Product.query.get(order.product_id)
 
-    if product:
-        product.stock += order.quantity
+    # Возврат на склад атомарным UPDATE stock = stock + :q
+    release_stock(order.product_id, order.quantity)
 
     db.session.delete(order)
-    db.session.commit()
-    logger.info(f"Order with ID {order_id} deleted successfully.")
-
-    
-    redis_client = current_app.redis_client
-    # Сбрасываем кэш после удаления заказа
-    redis_client.delete('orders')
-    logger.info("Cleared orders cache.")
+    record_sales([dict(order.to_dict(), created_at=order.created_at)], sign=-1)
+    # Сбрасываем кэш после удаления заказа (остаток продукта возвращён на склад)
+    record_invalidation('orders', 'products_list', client_orders_collection(order.client_id),
+                        keys=[entity_key(Product, order.product_id)])
+    record_jobs(*order_deleted_jobs(order))
+    commit_with_outbox()
+    logger.info("Order with ID %s deleted successfully.", order_id)
 
     return jsonify({'message': 'Order deleted successfully'}), 200
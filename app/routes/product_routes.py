@@ -3,21 +3,51 @@ from flask_jwt_extended import jwt_required
 from app import db, logger
 from app.models import Product
 from app.utils.auth import admin_required  # Импортируем декоратор
-import json
+from app.utils.cache import (
+    cached_json_response, conditional_collection, entity_key, get_entities
+)
+from app.utils.outbox import record_invalidation, commit_with_outbox
+from app.utils.pagination import is_paginated, cached_page_response, PaginationError
+from app.utils.export import ndjson_response
+from app.utils.catalog_import import IMPORT_FORMATS, iter_rows, import_products
+import io
 
 bp = Blueprint('product_routes', __name__, url_prefix='/products')
 
 @bp.route('/', methods=['GET'])
 @jwt_required()
+@conditional_collection("products_list")  # 304 по If-None-Match без обращения к БД
 def get_products():
     """
     Get all products
     --- 
     tags:
       - Products
+    parameters:
+      - name: limit
+        in: query
+        required: false
+        type: integer
+        example: 50
+        description: Page size; enables cursor pagination
+      - name: cursor
+        in: query
+        required: false
+        type: string
+        description: Value of next_cursor from the previous page
+      - name: ids
+        in: query
+        required: false
+        type: string
+        example: "1,2,3"
+        description: Comma-separated product IDs; returns only these products, in this order
     responses:
+      304:
+        description: Not modified since the version in If-None-Match
+      400:
+        description: Invalid pagination parameters or product IDs
       200:
-        description: A list of products
+        description: A list of products (or a page {items, next_cursor} when limit/cursor is given)
         schema:
           type: array
           items:
@@ -26,6 +56,9 @@ def get_products():
               id:
                 type: integer
                 example: 1
+              sku:
+                type: string
+                example: "ROSE-RED-25"
               name:
                 type: string
                 example: "Rose Bouquet"
@@ -41,25 +74,114 @@ def get_products():
     """
     redis_client = current_app.redis_client
 
-    cached_products = redis_client.get("products_list")
-    if cached_products:
-        logger.info("Fetching products from cache.")
-        return jsonify(json.loads(cached_products)), 200  # Используем json.loads() вместо eval()
-
-    logger.info("Fetching all products from database.")
-    products = Product.query.all()
-    result = [{
-        'id': p.id, 
-        'name': p.name, 
-        'description': p.description, 
-        'price': p.price, 
-        'stock': p.stock
-    } for p in products]
-    
-    # Кэширование результата на 5 минут
-    redis_client.setex("products_list", 300, json.dumps(result))  # Используем json.dumps() для безопасной сериализации
-    logger.info(f"Cached {len(products)} products.")
-    return jsonify(result), 200
+    if 'ids' in request.args:
+        try:
+            ids = [int(product_id) for product_id in request.args['ids'].split(',') if product_id]
+        except ValueError:
+            return jsonify({'error': 'ids must be a comma-separated list of integers'}), 400
+        if not ids or len(ids) > current_app.config['PAGE_MAX_LIMIT']:
+            return jsonify({'error': f"ids must contain 1 to {current_app.config['PAGE_MAX_LIMIT']} values"}), 400
+
+        logger.info("Fetching products by IDs: %s", ids)
+        products = get_entities(redis_client, Product, ids, ttl=300, collection="products_list")
+        return jsonify([products[product_id] for product_id in ids if product_id in products]), 200
+
+    if is_paginated(request.args):
+        try:
+            return cached_page_response(redis_client, "products_list", Product, request.args, ttl=300)
+        except PaginationError as e:
+            return jsonify({'error': str(e)}), 400
+
+    def load_products():
+        logger.info("Fetching all products from database.")
+        products = Product.query.all()
+        logger.info("Cached %s products.", len(products))
+        return [p.to_dict() for p in products]
+
+    # Кэширование результата на 5 минут; тело хранится уже сериализованным
+    return cached_json_response(redis_client, "products_list", load_products, ttl=300,
+                                collection="products_list")
+
+@bp.route('/<int:product_id>/', methods=['GET'])
+@jwt_required()
+def get_product(product_id):
+    """
+    Get a product by ID
+    --- 
+    tags:
+      - Products
+    parameters:
+      - name: product_id
+        in: path
+        required: true
+        type: integer
+        example: 1
+    responses:
+      200:
+        description: The product
+        schema:
+          type: object
+          properties:
+            id:
+              type: integer
+              example: 1
+            sku:
+              type: string
+              example: "ROSE-RED-25"
+            name:
+              type: string
+              example: "Rose Bouquet"
+            description:
+              type: string
+              example: "A bouquet of fresh roses"
+            price:
+              type: number
+              example: 29.99
+            stock:
+              type: integer
+              example: 100
+      404:
+        description: Product not found
+    """
+    redis_client = current_app.redis_client
+    product = get_entities(redis_client, Product, [product_id], ttl=300, collection="products_list").get(product_id)
+
+    if product is None:
+        logger.error("Product with ID %s not found.", product_id)
+        return jsonify({'error': 'Product not found'}), 404
+    return jsonify(product), 200
+
+@bp.route('/export', methods=['GET'])
+@jwt_required()
+@admin_required  # Выгрузка всей таблицы доступна только администратору
+def export_products():
+    """
+    Export all products as a stream
+    --- 
+    tags:
+      - Products
+    produces:
+      - application/x-ndjson
+    parameters:
+      - name: format
+        in: query
+        required: false
+        type: string
+        enum: [ndjson]
+        default: ndjson
+    responses:
+      200:
+        description: One JSON object per line, streamed in batches from the database
+      400:
+        description: Unsupported export format
+    """
+    export_format = request.args.get('format', 'ndjson')
+    if export_format != 'ndjson':
+        logger.error("Unsupported export format: %s", export_format)
+        return jsonify({'error': 'Unsupported export format'}), 400
+
+    logger.info("Streaming products export.")
+    return ndjson_response(Product, 'products')
 
 @bp.route('/', methods=['POST'])
 @jwt_required()
@@ -77,6 +199,9 @@ def create_product():
         schema:
           type: object
           properties:
+            sku:
+              type: string
+              example: "ROSE-RED-25"
             name:
               type: string
               example: "Rose Bouquet"
@@ -103,27 +228,89 @@ def create_product():
               example: 1
     """
     data = request.get_json()
-    logger.info(f"Received product creation request: {data}")
+    logger.info("Received product creation request: %s", data)
     try:
         product = Product(
+            sku=data.get('sku'),
             name=data['name'], 
             description=data.get('description'), 
             price=data['price'], 
             stock=data.get('stock', 0)
         )
         db.session.add(product)
-        db.session.commit()
-        
-        # Используем redis_client из текущего приложения для очистки кэша
-        redis_client = current_app.redis_client
-        redis_client.delete("products_list")
+        # Сброс кэша каталога фиксируется в outbox той же транзакцией
+        record_invalidation("products_list")
+        commit_with_outbox()
         
-        logger.info(f"Product created successfully with ID {product.id}")
+        logger.info("Product created successfully with ID %s", product.id)
         return jsonify({'message': 'Product created successfully', 'id': product.id}), 201
     except Exception as e:
-        logger.error(f"Error while creating product: {e}")
+        logger.error("Error while creating product: %s", e)
         return jsonify({'error': 'Product creation failed'}), 500
 
+@bp.route('/import', methods=['POST'])
+@jwt_required()
+@admin_required  # Только администратор может импортировать каталог
+def import_catalog():
+    """
+    Bulk upsert products by SKU from CSV or JSON Lines
+    --- 
+    tags:
+      - Products
+    consumes:
+      - text/csv
+      - application/x-ndjson
+    parameters:
+      - name: format
+        in: query
+        required: false
+        type: string
+        enum: [csv, jsonl]
+        description: Input format; defaults to csv for text/csv bodies and jsonl otherwise
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: string
+          example: "sku,name,description,price,stock\nROSE-RED-25,Rose Bouquet,25 red roses,29.99,100"
+    responses:
+      200:
+        description: Import report
+        schema:
+          type: object
+          properties:
+            processed:
+              type: integer
+              example: 5000
+            upserted:
+              type: integer
+              example: 4998
+            rejected:
+              type: integer
+              example: 2
+            errors:
+              type: array
+              items:
+                type: object
+            rows_per_second:
+              type: integer
+              example: 25000
+      400:
+        description: Unsupported import format
+    """
+    fmt = request.args.get('format') or ('csv' if request.mimetype == 'text/csv' else 'jsonl')
+    if fmt not in IMPORT_FORMATS:
+        logger.error("Unsupported import format: %s", fmt)
+        return jsonify({'error': 'Unsupported import format'}), 400
+
+    logger.info("Starting catalog import (%s).", fmt)
+    # Тело читается из потока построчно, а не загружается в память целиком
+    lines = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+    report = import_products(
+        iter_rows(lines, fmt), current_app.redis_client, current_app.config['IMPORT_BATCH_SIZE']
+    )
+    return jsonify(report), 200
+
 @bp.route('/<int:product_id>/', methods=['PUT'])
 @jwt_required()
 @admin_required  # Только администратор может обновлять продукт
@@ -145,6 +332,9 @@ def update_product(product_id):
         schema:
           type: object
           properties:
+            sku:
+              type: string
+              example: "ROSE-RED-25"
             name:
               type: string
               example: "Rose Bouquet"
@@ -169,22 +359,21 @@ def update_product(product_id):
     """
     product = Product.query.get_or_404(product_id)
     data = request.get_json()
-    logger.info(f"Updating product with ID {product_id}: {data}")
+    logger.info("Updating product with ID %s: %s", product_id, data)
     try:
+        product.sku = data.get('sku', product.sku)
         product.name = data.get('name', product.name)
         product.description = data.get('description', product.description)
         product.price = data.get('price', product.price)
         product.stock = data.get('stock', product.stock)
-        db.session.commit()
+        # Очистка кэша после обновления: хэш этого продукта и версия каталога
+        record_invalidation("products_list", keys=[entity_key(Product, product_id)])
+        commit_with_outbox()
         
-        # Очистка кэша после обновления
-        redis_client = current_app.redis_client
-        redis_client.delete("products_list")
-        
-        logger.info(f"Product with ID {product_id} updated successfully.")
+        logger.info("Product with ID %s updated successfully.", product_id)
         return jsonify({'message': 'Product updated successfully'}), 200
     except Exception as e:
-        logger.error(f"Error while updating product with ID {product_id}: {e}")
+        logger.error("Error while updating product with ID %s: %s", product_id, e)
         return jsonify({'error': 'Product update failed'}), 500
 
 @bp.route('/<int:product_id>/', methods=['DELETE'])
@@ -214,18 +403,16 @@ def delete_product(product_id):
       404:
         description: Product not found
     """
-    logger.info(f"Attempting to delete product with ID {product_id}")
+    logger.info("Attempting to delete product with ID %s", product_id)
     try:
         product = Product.query.get_or_404(product_id)
         db.session.delete(product)
-        db.session.commit()
-        
-        # Очистка кэша после удаления
-        redis_client = current_app.redis_client
-        redis_client.delete("products_list")
+        # Очистка кэша после удаления: хэш этого продукта и версия каталога
+        record_invalidation("products_list", keys=[entity_key(Product, product_id)])
+        commit_with_outbox()
         
-        logger.info(f"Product with ID {product_id} deleted successfully.")
+        logger.info("Product with ID %s deleted successfully.", product_id)
         return jsonify({'message': 'Product deleted successfully'}), 200
     except Exception as e:
-        logger.error(f"Error while deleting product with ID {product_id}: {e}")
+        logger.error("Error while deleting product with ID %s: %s", product_id, e)
         return jsonify({'error': 'Product deletion failed'}), 500
@@ -0,0 +1,230 @@
+from datetime import date, datetime, timedelta
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required
+from app import db, logger
+from app.models import Client, ClientSales, DailySales, Product, ProductSales
+from app.utils.auth import admin_required
+from sqlalchemy import func
+
+bp = Blueprint('report_routes', __name__, url_prefix='/reports')
+
+# Отчёты читают только таблицы агрегатов (product_sales, client_sales, daily_sales),
+# которые обновляются в транзакции заказа, — стоимость запроса пропорциональна размеру ответа
+# (для дневного отчёта — числу дней, умноженному на SALES_DAILY_SHARDS)
+
+SORT_FIELDS = ('revenue', 'items', 'orders')
+
+
+def parse_limit(args):
+    """limit из query string в пределах REPORT_MAX_LIMIT"""
+    try:
+        limit = int(args.get('limit', current_app.config['REPORT_DEFAULT_LIMIT']))
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if not 1 <= limit <= current_app.config['REPORT_MAX_LIMIT']:
+        raise ValueError(f"limit must be between 1 and {current_app.config['REPORT_MAX_LIMIT']}")
+    return limit
+
+
+def parse_sort(args):
+    sort = args.get('sort', 'revenue')
+    if sort not in SORT_FIELDS:
+        raise ValueError(f"sort must be one of {', '.join(SORT_FIELDS)}")
+    return sort
+
+
+def totals(row):
+    return {'orders': row.orders, 'items': row.items, 'revenue': round(row.revenue, 2)}
+
+
+@bp.route('/products', methods=['GET'])
+@jwt_required()
+@admin_required  # Отчёты о продажах доступны только администратору
+def product_sales_report():
+    """
+    Top products by revenue, items sold or number of orders
+    --- 
+    tags:
+      - Reports
+    parameters:
+      - name: sort
+        in: query
+        required: false
+        type: string
+        enum: [revenue, items, orders]
+        default: revenue
+        description: Ranking field; sort=items gives the top sellers by units
+      - name: limit
+        in: query
+        required: false
+        type: integer
+        example: 10
+    responses:
+      200:
+        description: Products in descending order of the ranking field
+        schema:
+          type: array
+          items:
+            type: object
+            properties:
+              product_id:
+                type: integer
+                example: 2
+              name:
+                type: string
+                example: "Rose"
+              orders:
+                type: integer
+                example: 12
+              items:
+                type: integer
+                example: 30
+              revenue:
+                type: number
+                example: 450.5
+      400:
+        description: Invalid sort or limit
+    """
+    try:
+        sort, limit = parse_sort(request.args), parse_limit(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    rows = db.session.query(ProductSales, Product.name) \
+        .join(Product, Product.id == ProductSales.product_id) \
+        .filter(ProductSales.orders > 0) \
+        .order_by(getattr(ProductSales, sort).desc(), ProductSales.product_id) \
+        .limit(limit).all()
+    logger.info("Product sales report: top %s by %s.", limit, sort)
+    return jsonify([dict(totals(sales), product_id=sales.product_id, name=name) for sales, name in rows]), 200
+
+
+@bp.route('/clients', methods=['GET'])
+@jwt_required()
+@admin_required
+def client_sales_report():
+    """
+    Top clients by revenue, items bought or number of orders
+    --- 
+    tags:
+      - Reports
+    parameters:
+      - name: sort
+        in: query
+        required: false
+        type: string
+        enum: [revenue, items, orders]
+        default: revenue
+      - name: limit
+        in: query
+        required: false
+        type: integer
+        example: 10
+    responses:
+      200:
+        description: Clients in descending order of the ranking field
+        schema:
+          type: array
+          items:
+            type: object
+            properties:
+              client_id:
+                type: integer
+                example: 1
+              name:
+                type: string
+                example: "John Doe"
+              orders:
+                type: integer
+                example: 4
+              items:
+                type: integer
+                example: 9
+              revenue:
+                type: number
+                example: 180.0
+      400:
+        description: Invalid sort or limit
+    """
+    try:
+        sort, limit = parse_sort(request.args), parse_limit(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    rows = db.session.query(ClientSales, Client.name) \
+        .join(Client, Client.id == ClientSales.client_id) \
+        .filter(ClientSales.orders > 0) \
+        .order_by(getattr(ClientSales, sort).desc(), ClientSales.client_id) \
+        .limit(limit).all()
+    logger.info("Client sales report: top %s by %s.", limit, sort)
+    return jsonify([dict(totals(sales), client_id=sales.client_id, name=name) for sales, name in rows]), 200
+
+
+@bp.route('/daily', methods=['GET'])
+@jwt_required()
+@admin_required
+def daily_sales_report():
+    """
+    Sales per day (UTC) for a date range
+    --- 
+    tags:
+      - Reports
+    parameters:
+      - name: from
+        in: query
+        required: false
+        type: string
+        format: date
+        example: "2026-10-01"
+        description: First day, inclusive (default 30 days before to)
+      - name: to
+        in: query
+        required: false
+        type: string
+        format: date
+        example: "2026-10-18"
+        description: Last day, inclusive (default today, UTC)
+    responses:
+      200:
+        description: Days with sales in ascending order; days without sales are omitted
+        schema:
+          type: array
+          items:
+            type: object
+            properties:
+              day:
+                type: string
+                example: "2026-10-18"
+              orders:
+                type: integer
+                example: 25
+              items:
+                type: integer
+                example: 61
+              revenue:
+                type: number
+                example: 1210.25
+      400:
+        description: Invalid dates or range too long
+    """
+    try:
+        day_to = date.fromisoformat(request.args['to']) if 'to' in request.args else datetime.utcnow().date()
+        day_from = date.fromisoformat(request.args['from']) if 'from' in request.args \
+            else day_to - timedelta(days=29)
+    except ValueError:
+        return jsonify({'error': 'from and to must be dates in YYYY-MM-DD format'}), 400
+    max_days = current_app.config['REPORT_MAX_DAYS']
+    if day_from > day_to or (day_to - day_from).days >= max_days:
+        return jsonify({'error': f'from must not be after to, and the range must not exceed {max_days} days'}), 400
+
+    # Итог дня — сумма его шардов
+    rows = db.session.query(
+        DailySales.day,
+        func.sum(DailySales.orders).label('orders'),
+        func.sum(DailySales.items).label('items'),
+        func.sum(DailySales.revenue).label('revenue')
+    ).filter(DailySales.day.between(day_from, day_to)) \
+        .group_by(DailySales.day).having(func.sum(DailySales.orders) > 0) \
+        .order_by(DailySales.day).all()
+    logger.info("Daily sales report from %s to %s.", day_from, day_to)
+    return jsonify([dict(totals(sales), day=sales.day.isoformat()) for sales in rows]), 200
@@ -1,21 +1,106 @@
+import json
+from datetime import timedelta
 from functools import wraps
-from flask_jwt_extended import get_jwt_identity
-from flask import jsonify
+import redis
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from flask import jsonify, current_app
+from app import db, logger
 from app.models import Client, RoleEnum
+from app.utils.local_cache import INVALIDATION_CHANNEL, ensure_invalidation_listener
+
+# Значение в локальном кэше: «в Redis записи о роли нет», чтобы не спрашивать Redis повторно
+NO_ROLE_OVERRIDE = ''
+
+
+def role_cache_key(client_id):
+    """Ключ Redis (и локального кэша) с актуальной ролью клиента"""
+    return f"client_role:{client_id}"
+
+
+def _role_override_ttl():
+    """Запись о смене роли должна жить, пока действуют выданные до неё токены"""
+    expires = current_app.config.get('JWT_ACCESS_TOKEN_EXPIRES')
+    if isinstance(expires, timedelta):
+        return max(int(expires.total_seconds()), current_app.config['ROLE_CACHE_TTL'])
+    return None
+
+
+def _cached_role(client_id):
+    """Роль из локального кэша процесса или из Redis; None — записи нет нигде"""
+    redis_client = current_app.redis_client
+    ensure_invalidation_listener(current_app._get_current_object(), redis_client)
+    local = current_app.extensions['local_cache']
+    key = role_cache_key(client_id)
+
+    role = local.get(key)
+    if role is None:
+        role = redis_client.get(key)
+        role = role.decode() if role is not None else NO_ROLE_OVERRIDE
+        local.set(key, role)
+    return role or None
+
+
+def get_client_role(client_id, claimed_role=None):
+    """
+    Роль клиента без обращения к БД в обычном случае.
+    Порядок: запись в кэше (появляется при смене роли и перекрывает устаревший claim
+    в уже выданных токенах) -> claim role из подписанного JWT -> БД с коротким TTL в Redis.
+    """
+    try:
+        role = _cached_role(client_id)
+    except redis.RedisError:
+        # Без Redis не узнать о смене роли — claim не доверяем, роль берём из БД
+        role = db.session.query(Client.role).filter_by(id=client_id).scalar()
+        return role.value if role is not None else None
+    if role is not None:
+        return role
+    if claimed_role is not None:
+        return claimed_role
+
+    # Токен без claim (выдан до появления роли в токене) — один запрос роли и кэш
+    role = db.session.query(Client.role).filter_by(id=client_id).scalar()
+    if role is None:
+        return None
+    try:
+        current_app.redis_client.set(role_cache_key(client_id), role.value, ex=current_app.config['ROLE_CACHE_TTL'])
+        current_app.extensions['local_cache'].set(role_cache_key(client_id), role.value)
+    except redis.RedisError as e:
+        logger.warning("Failed to cache role of client %s: %s", client_id, e)
+    return role.value
+
+
+def invalidate_client_role(client_id, role):
+    """
+    Фиксирует новую роль в Redis на время жизни токенов и сбрасывает локальные кэши
+    всех воркеров, чтобы claim из ранее выданных токенов больше не учитывался.
+    """
+    key = role_cache_key(client_id)
+    current_app.extensions['local_cache'].invalidate(key)
+
+    pipe = current_app.redis_client.pipeline()
+    pipe.set(key, role.value, ex=_role_override_ttl())
+    pipe.publish(INVALIDATION_CHANNEL, json.dumps([key]))
+    try:
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.error("Failed to publish role change of client %s: %s", client_id, e)
+
 
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         # Получаем идентификатор клиента из JWT
-        client_id = get_jwt_identity()
-        # Ищем клиента по его ID
-        client = Client.query.get(client_id)
-        
-        # Если клиент не найден или его роль не "admin"
-        if not client or client.role != RoleEnum.ADMIN:
+        try:
+            client_id = int(get_jwt_identity())
+        except (TypeError, ValueError):
             return jsonify({"error": "Admin access required"}), 403
-        
+
+        # Роль берём из подписанного claim/кэша — без загрузки клиента из БД
+        role = get_client_role(client_id, get_jwt().get('role'))
+        if role != RoleEnum.ADMIN.value:
+            return jsonify({"error": "Admin access required"}), 403
+
         # Если проверка прошла, передаем управление дальше
         return f(*args, **kwargs)
-    
+
     return decorated_function
@@ -0,0 +1,416 @@
+import gzip
+import hashlib
+import json
+import math
+import random
+import time
+import uuid
+from functools import wraps
+import redis
+from flask import Response, current_app, make_response, request
+from app import logger
+from app.utils.local_cache import ensure_invalidation_listener, publish_invalidation
+from app.utils.request_metrics import record_cache
+
+JSON_MIMETYPE = 'application/json'
+
+
+def version_key(name):
+    """Ключ счётчика версии кэшируемой коллекции"""
+    return f"{name}:version"
+
+
+def _local_tier(redis_client, key):
+    """Локальный кэш процесса — только для коллекций из LOCAL_CACHE_COLLECTIONS"""
+    if key.split(':', 1)[0] not in current_app.config['LOCAL_CACHE_COLLECTIONS']:
+        return None
+    ensure_invalidation_listener(current_app._get_current_object(), redis_client)
+    return current_app.extensions['local_cache']
+
+
+def version_seed():
+    """
+    Начальное значение счётчика версии — текущее время в микросекундах. После рестарта,
+    FLUSH или вытеснения ключа счётчик начинается с нового, большего значения, поэтому
+    версии (а с ними ETag и ключи страниц) выданные до сброса не повторяются.
+    """
+    return time.time_ns() // 1000
+
+
+def collection_version(redis_client, name, cached=False):
+    """
+    Текущая версия коллекции; отсутствующий счётчик сначала заполняется version_seed().
+    cached=True разрешает брать версию из локального кэша процесса — её сбрасывает
+    то же сообщение об инвалидации, что и сами данные.
+    """
+    local = _local_tier(redis_client, name) if cached else None
+    if local is not None:
+        version = local.get(version_key(name))
+        if version is not None:
+            return version
+
+    version = redis_client.get(version_key(name))
+    if version is None:
+        pipe = redis_client.pipeline()
+        pipe.set(version_key(name), version_seed(), nx=True)
+        pipe.get(version_key(name))
+        version = pipe.execute()[1]
+    version = int(version)
+    if local is not None:
+        local.set(version_key(name), version)
+    return version
+
+
+def page_cache_key(redis_client, name, after, limit):
+    """Ключ кэша страницы; версия в ключе делает старые страницы недостижимыми"""
+    version = collection_version(redis_client, name, cached=True)
+    return f"{name}:v{version}:page:{after}:{limit}"
+
+
+def response_cache_keys(key):
+    """Тело ответа, его gzip-вариант и метаданные свежести хранятся рядом под одним префиксом"""
+    return key, f"{key}:gz", f"{key}:meta"
+
+
+def apply_invalidation(redis_client, names, keys=()):
+    """
+    Сброс полного списка и всех закэшированных страниц коллекций за один round trip.
+    keys — дополнительные ключи (например, кэш отдельных сущностей), удаляемые тем же пайплайном.
+    Локальные кэши других воркеров сбрасываются сообщением в канал инвалидации.
+    Ошибки Redis пробрасываются — outbox оставляет событие для повторной доставки.
+    """
+    current_app.extensions['local_cache'].invalidate(*names)
+
+    pipe = redis_client.pipeline()
+    for name in names:
+        pipe.delete(*response_cache_keys(name))
+        pipe.set(version_key(name), version_seed(), nx=True)
+        pipe.incr(version_key(name))
+    if keys:
+        pipe.delete(*keys)
+    publish_invalidation(pipe, *names)
+    pipe.execute()
+
+
+def invalidate_collection(redis_client, *names, keys=()):
+    """apply_invalidation без исключений — для кода вне outbox (CLI, импорт)"""
+    try:
+        apply_invalidation(redis_client, names, keys)
+    except redis.RedisError as e:
+        # Изменение в БД уже зафиксировано; устаревший кэш доживёт до своего TTL
+        logger.error("Failed to invalidate cache for %s: %s", names, e)
+
+
+def entity_key(model, entity_id):
+    """Ключ хэша с данными одной сущности, например product:42"""
+    return f"{model.__tablename__}:{entity_id}"
+
+
+def get_entities(redis_client, model, ids, ttl, collection=None):
+    """
+    Пакетное чтение сущностей по id: все хэши читаются одним пайплайном HGETALL,
+    а промахи добираются из БД одним запросом WHERE id IN (...).
+    Возвращает словарь id -> to_dict(); отсутствующих в БД id в нём нет.
+    collection — коллекция, чья версия проверяется перед записью промахов в кэш.
+    """
+    pipe = redis_client.pipeline()
+    for entity_id in ids:
+        pipe.hgetall(entity_key(model, entity_id))
+    try:
+        cached = pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("Redis unavailable (%s), loading %s from the database.", e, model.__tablename__)
+        return {row.id: row.to_dict() for row in model.query.filter(model.id.in_(ids))}
+
+    found, missing = {}, []
+    for entity_id, fields in zip(ids, cached):
+        if fields:
+            # Значения полей хранятся в JSON, чтобы сохранить типы и None
+            found[entity_id] = {field.decode(): json.loads(value) for field, value in fields.items()}
+        else:
+            missing.append(entity_id)
+
+    if missing:
+        try:
+            version = collection_version(redis_client, collection) if collection else None
+        except redis.RedisError:
+            version = None
+        rows = model.query.filter(model.id.in_(missing)).all()
+        for row in rows:
+            found[row.id] = row.to_dict()
+
+        try:
+            if collection and collection_version(redis_client, collection) != version:
+                # Сущности изменились во время чтения — не кэшируем устаревшие данные
+                return found
+
+            pipe = redis_client.pipeline()
+            for row in rows:
+                key = entity_key(model, row.id)
+                pipe.hset(key, mapping={field: json.dumps(value) for field, value in found[row.id].items()})
+                pipe.expire(key, ttl)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Failed to cache %s entities: %s", model.__tablename__, e)
+
+    return found
+
+
+def encode_json(payload):
+    return json.dumps(payload, separators=(',', ':')).encode()
+
+
+def _accepts_gzip():
+    return request.accept_encodings['gzip'] > 0
+
+
+def json_bytes_response(body, compressed=False):
+    """Готовый ответ из уже сериализованного тела, без повторного кодирования JSON"""
+    response = Response(body, mimetype=JSON_MIMETYPE)
+    response.vary.add('Accept-Encoding')
+    if compressed:
+        response.content_encoding = 'gzip'
+    return response
+
+
+def _read_cached(redis_client, key, compressed):
+    """
+    Одним round trip читает тело (сжатое, если клиент принимает gzip) и метаданные.
+    Возвращает (body, compressed, expires_at, delta); body is None при промахе.
+    """
+    body_key, gz_key, meta_key = response_cache_keys(key)
+
+    pipe = redis_client.pipeline()
+    pipe.get(gz_key if compressed else body_key)
+    pipe.get(meta_key)
+    body, meta = pipe.execute()
+
+    if body is None and compressed:
+        # Маленькие ответы не сжимаются — берём обычное тело
+        compressed = False
+        body = redis_client.get(body_key)
+
+    expires_at, delta = None, 0.0
+    if meta is not None:
+        expires_at, delta = (float(value) for value in meta.split(b' '))
+    return body, compressed, expires_at, delta
+
+
+def _is_fresh(expires_at, delta):
+    """
+    Вероятностное досрочное истечение (XFetch): чем ближе мягкий TTL и чем дольше
+    пересчёт, тем выше шанс, что этот запрос обновит значение заранее — до того,
+    как ключ истечёт у всех воркеров одновременно.
+    """
+    if expires_at is None:
+        # Значение записано без метаданных — считаем его свежим до физического TTL
+        return True
+    beta = current_app.config['CACHE_EARLY_EXPIRATION_BETA']
+    return time.time() - delta * beta * math.log(1.0 - random.random()) < expires_at
+
+
+def _acquire_lock(redis_client, key):
+    token = uuid.uuid4().hex.encode()
+    timeout_ms = int(current_app.config['CACHE_LOCK_TIMEOUT'] * 1000)
+    if redis_client.set(f"{key}:lock", token, nx=True, px=timeout_ms):
+        return token
+    return None
+
+
+def _release_lock(redis_client, key, token):
+    """Снимает блокировку, только если она всё ещё наша (могла истечь и достаться другому)"""
+    lock_key = f"{key}:lock"
+    with redis_client.pipeline() as pipe:
+        try:
+            pipe.watch(lock_key)
+            if pipe.get(lock_key) == token:
+                pipe.multi()
+                pipe.delete(lock_key)
+                pipe.execute()
+            else:
+                pipe.unwatch()
+        except redis.WatchError:
+            pass
+        except redis.RedisError as e:
+            # Блокировка истечёт сама по таймауту
+            logger.warning("Failed to release cache lock %s: %s", lock_key, e)
+
+
+def _wait_for_fill(redis_client, key):
+    """Ждём, пока держатель блокировки заполнит кэш, вместо параллельного похода в БД"""
+    deadline = time.monotonic() + current_app.config['CACHE_LOCK_TIMEOUT']
+    while time.monotonic() < deadline:
+        time.sleep(current_app.config['CACHE_LOCK_POLL_INTERVAL'])
+        body, compressed, _, _ = _read_cached(redis_client, key, _accepts_gzip())
+        if body is not None:
+            return body, compressed
+    return None, False
+
+
+def _store(redis_client, key, payload, ttl, delta, collection=None, version=None):
+    """
+    Сериализует payload один раз и кладёт в кэш тело, gzip-вариант и метаданные.
+    С collection запись выполняется в MULTI под WATCH счётчика версии: если коллекцию
+    сбросили после загрузки (даже между проверкой и записью), запись отменяется.
+    Возвращает (body, gz_body, stored).
+    """
+    body_key, gz_key, meta_key = response_cache_keys(key)
+
+    body = encode_json(payload)
+    gz_body = None
+    if current_app.config['CACHE_GZIP_ENABLED'] and len(body) >= current_app.config['CACHE_GZIP_MIN_SIZE']:
+        gz_body = gzip.compress(body, compresslevel=current_app.config['CACHE_GZIP_LEVEL'])
+
+    # Физический TTL длиннее логического: после мягкого истечения устаревшее
+    # значение ещё какое-то время отдаётся, пока один воркер его пересчитывает
+    physical_ttl = ttl + current_app.config['CACHE_STALE_TTL']
+    with redis_client.pipeline() as pipe:
+        if collection:
+            pipe.watch(version_key(collection))
+            current = pipe.get(version_key(collection))
+            if current is None or int(current) != version:
+                pipe.unwatch()
+                return body, gz_body, False
+            pipe.multi()
+        pipe.set(body_key, body, ex=physical_ttl)
+        if gz_body is not None:
+            pipe.set(gz_key, gz_body, ex=physical_ttl)
+        else:
+            pipe.delete(gz_key)
+        pipe.set(meta_key, f"{time.time() + ttl} {delta}", ex=physical_ttl)
+        try:
+            pipe.execute()
+        except redis.WatchError:
+            return body, gz_body, False
+    return body, gz_body, True
+
+
+def _fill(redis_client, key, loader, ttl, collection):
+    """Загружает данные из БД и кладёт в кэш, если коллекция не изменилась во время загрузки"""
+    version = collection_version(redis_client, collection) if collection else None
+    started = time.monotonic()
+    payload = loader()
+    delta = time.monotonic() - started
+
+    try:
+        body, gz_body, stored = _store(redis_client, key, payload, ttl, delta, collection, version)
+    except redis.RedisError as e:
+        # Данные уже загружены — отдаём их, даже если положить в кэш не удалось
+        logger.warning("Failed to cache %s: %s", key, e)
+        return encode_json(payload), None
+    if not stored:
+        # Пока мы читали БД, коллекцию изменили — не кладём в кэш заведомо устаревшие данные
+        logger.info("Collection %s changed during fill, skipping cache write for %s.", collection, key)
+        return body, None
+    return body, gz_body
+
+
+def rebuild_cached(redis_client, key, loader, ttl, collection=None):
+    """Принудительно перестраивает значение в кэше, например после массового импорта"""
+    _fill(redis_client, key, loader, ttl, collection)
+
+
+def cached_json_response(redis_client, key, loader, ttl, collection=None):
+    """
+    Cache-aside для JSON-ответов с защитой от stampede:
+      * single-flight: пересчитывает только владелец блокировки SET NX с токеном;
+      * stale-while-revalidate: остальные в это время получают предыдущее значение;
+      * вероятностное досрочное обновление до истечения TTL.
+    loader вызывается только при промахе и должен вернуть сериализуемые данные.
+    collection — имя коллекции, чья версия проверяется перед записью в кэш.
+    Если Redis недоступен (или разомкнут автомат), ответ строится прямо из БД.
+    """
+    try:
+        return _cached_json_response(redis_client, key, loader, ttl, collection)
+    except redis.RedisError as e:
+        logger.warning("Redis unavailable (%s), serving %s from the database.", e, key)
+        return json_bytes_response(encode_json(loader()))
+
+
+def _cached_json_response(redis_client, key, loader, ttl, collection):
+    accepts_gzip = _accepts_gzip()
+    stats = current_app.extensions['cache_stats']
+
+    local = _local_tier(redis_client, key)
+    if local is not None:
+        entry = local.get((key, accepts_gzip))
+        stats.record('local', entry is not None)
+        record_cache(key, 'local', entry is not None)
+        if entry is not None:
+            return json_bytes_response(*entry)
+
+    body, compressed, expires_at, delta = _read_cached(redis_client, key, accepts_gzip)
+    stats.record('redis', body is not None)
+    record_cache(key, 'redis', body is not None)
+    if body is not None and _is_fresh(expires_at, delta):
+        if local is not None:
+            # Локальная копия не должна пережить мягкий TTL значения в Redis
+            local_ttl = expires_at - time.time() if expires_at is not None else None
+            local.set((key, accepts_gzip), (body, compressed), ttl=local_ttl)
+        return json_bytes_response(body, compressed)
+
+    token = _acquire_lock(redis_client, key)
+    if token is None:
+        if body is not None:
+            # Кто-то уже пересчитывает — отдаём устаревшее значение
+            return json_bytes_response(body, compressed)
+        body, compressed = _wait_for_fill(redis_client, key)
+        if body is not None:
+            return json_bytes_response(body, compressed)
+        logger.warning("Timed out waiting for cache fill of %s, loading directly.", key)
+
+    try:
+        body, gz_body = _fill(redis_client, key, loader, ttl, collection)
+    finally:
+        if token is not None:
+            _release_lock(redis_client, key, token)
+
+    compressed = gz_body is not None and accepts_gzip
+    if compressed:
+        body = gz_body
+    if local is not None:
+        local.set((key, accepts_gzip), (body, compressed), ttl=ttl)
+    return json_bytes_response(body, compressed)
+
+
+def collection_etag(name, version, query_string):
+    """
+    ETag коллекции строится из её версии и параметров запроса (страницы, limit),
+    поэтому его можно вычислить, не читая ни базу, ни само закэшированное тело.
+    Версия начинается с version_seed(), так что после сброса Redis старые ETag не совпадут.
+    """
+    variant = hashlib.md5(query_string).hexdigest()[:12] if query_string else 'all'
+    return f"{name}-{version}-{variant}"
+
+
+def conditional_collection(name):
+    """
+    Условный GET для кэшируемой коллекции: если If-None-Match совпадает с текущей
+    версией, сразу отвечаем 304. Декоратор ставится после проверок доступа.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            redis_client = current_app.redis_client
+            try:
+                version = collection_version(redis_client, name, cached=True)
+            except redis.RedisError:
+                # Без версии нельзя построить ETag — обычный ответ без условного GET
+                return f(*args, **kwargs)
+            etag = collection_etag(name, version, request.query_string)
+
+            # ETag слабый: одно и то же содержимое отдаётся и сжатым, и несжатым
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+                response.set_etag(etag, weak=True)
+                response.vary.add('Accept-Encoding')
+                return response
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag, weak=True)
+            return response
+
+        return decorated_function
+
+    return decorator
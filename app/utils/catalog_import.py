@@ -0,0 +1,149 @@
+import csv
+import json
+import math
+import time
+import redis
+from flask import current_app
+from sqlalchemy import insert, select, update
+from app import db, logger
+from app.models import Product
+from app.utils.cache import entity_key, rebuild_cached
+from app.utils.db import on_conflict_insert
+from app.utils.outbox import record_invalidation, commit_with_outbox, relay
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+UPSERT_FIELDS = ('name', 'description', 'price', 'stock')
+MAX_REPORTED_ERRORS = 20
+
+
+class ImportRowError(ValueError):
+    """Строка импорта не прошла валидацию"""
+
+
+def iter_rows(lines, fmt):
+    """Построчное чтение CSV (с заголовком) или JSON Lines, без загрузки файла целиком"""
+    if fmt == 'csv':
+        yield from csv.DictReader(lines)
+    else:
+        for line in lines:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield None  # Отчитаемся об ошибке при валидации
+
+
+def validate_row(raw):
+    if not isinstance(raw, dict):
+        raise ImportRowError('Row is not a JSON object')
+
+    sku = str(raw.get('sku') or '').strip()
+    name = str(raw.get('name') or '').strip()
+    if not sku or len(sku) > 64:
+        raise ImportRowError('sku is required and must be at most 64 characters')
+    if not name or len(name) > 100:
+        raise ImportRowError('name is required and must be at most 100 characters')
+
+    try:
+        price = float(raw.get('price'))
+        stock_value = raw.get('stock')
+        stock = int(stock_value) if stock_value not in (None, '') else 0
+    except (TypeError, ValueError):
+        raise ImportRowError('price must be a number and stock an integer')
+    if not math.isfinite(price):
+        # float() принимает 'nan' и 'inf', а сравнение с нулём NaN не отсекает
+        raise ImportRowError('price must be a finite number')
+    if price < 0 or stock < 0:
+        raise ImportRowError('price and stock must not be negative')
+
+    return {
+        'sku': sku,
+        'name': name,
+        'description': raw.get('description') or None,
+        'price': price,
+        'stock': stock
+    }
+
+
+def _upsert_on_conflict(dialect_insert, rows):
+    stmt = dialect_insert(Product).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Product.sku],
+        set_={field: stmt.excluded[field] for field in UPSERT_FIELDS}
+    ).returning(Product.id)
+    return db.session.execute(stmt).scalars().all()
+
+
+def _upsert_portable(rows):
+    """Запасной вариант для СУБД без ON CONFLICT: одно чтение, пакетные UPDATE и INSERT"""
+    existing = dict(db.session.execute(
+        select(Product.sku, Product.id).where(Product.sku.in_([row['sku'] for row in rows]))
+    ).all())
+
+    updates = [dict(row, id=existing[row['sku']]) for row in rows if row['sku'] in existing]
+    inserts = [row for row in rows if row['sku'] not in existing]
+    if updates:
+        db.session.execute(update(Product), updates)
+    ids = [row['id'] for row in updates]
+    if inserts:
+        ids += db.session.execute(insert(Product).returning(Product.id), inserts).scalars().all()
+    return ids
+
+
+def upsert_batch(rows):
+    """Вставка или обновление пачки строк по sku одним запросом. Возвращает id продуктов"""
+    # Повтор sku внутри одного INSERT ... ON CONFLICT недопустим — оставляем последнюю версию
+    rows = list({row['sku']: row for row in rows}.values())
+    dialect_insert = on_conflict_insert()
+    ids = _upsert_on_conflict(dialect_insert, rows) if dialect_insert else _upsert_portable(rows)
+    # Сброс кэша фиксируется вместе с пачкой, а доставляется один раз в конце импорта
+    record_invalidation('products_list', keys=[entity_key(Product, product_id) for product_id in ids])
+    commit_with_outbox(eager=False)
+    return ids
+
+
+def import_products(raw_rows, redis_client, batch_size):
+    """
+    Потоковый импорт каталога: валидация, upsert пачками по batch_size строк,
+    и один сброс и прогрев кэша каталога в конце. Возвращает отчёт с rows/sec.
+    """
+    started = time.monotonic()
+    processed, rejected, errors = 0, 0, []
+    batch, product_ids = [], []
+
+    for line_number, raw in enumerate(raw_rows, start=1):
+        processed += 1
+        try:
+            batch.append(validate_row(raw))
+        except ImportRowError as e:
+            rejected += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({'row': line_number, 'error': str(e)})
+            continue
+        if len(batch) >= batch_size:
+            product_ids += upsert_batch(batch)
+            batch = []
+    if batch:
+        product_ids += upsert_batch(batch)
+
+    if product_ids:
+        # Кэш каталога перестраивается один раз на весь импорт, а не на каждую строку
+        try:
+            relay(redis_client, current_app.config['OUTBOX_BATCH_SIZE'])
+        except redis.RedisError as e:
+            logger.warning("Catalog cache invalidation left to the outbox relay: %s", e)
+        rebuild_cached(redis_client, 'products_list',
+                       lambda: [p.to_dict() for p in Product.query.all()], ttl=300, collection='products_list')
+
+    seconds = time.monotonic() - started
+    report = {
+        'processed': processed,
+        'upserted': processed - rejected,
+        'rejected': rejected,
+        'errors': errors,
+        'seconds': round(seconds, 3),
+        'rows_per_second': round(processed / seconds) if seconds else processed
+    }
+    logger.info("Catalog import finished: %s upserted, %s rejected, %s rows/s.",
+                report['upserted'], rejected, report['rows_per_second'])
+    return report
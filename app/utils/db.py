@@ -0,0 +1,16 @@
+from app import db
+
+
+def on_conflict_insert():
+    """
+    Функция insert диалекта текущей СУБД с поддержкой INSERT ... ON CONFLICT
+    (PostgreSQL, SQLite) или None, если диалект её не поддерживает
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert
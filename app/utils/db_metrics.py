@@ -0,0 +1,87 @@
+import time
+from collections import Counter
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from app import db, logger
+
+POOL_SIZING_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout')
+MAX_LOGGED_STATEMENT = 500
+
+
+def engine_options(config):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS с учётом СУБД: у SQLite (особенно :memory:) другой класс пула,
+    который не принимает параметры размера, поэтому они отбрасываются.
+    """
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    uri = config.get('SQLALCHEMY_DATABASE_URI')
+    if uri and make_url(uri).get_backend_name() == 'sqlite':
+        for option in POOL_SIZING_OPTIONS:
+            options.pop(option, None)
+    return options
+
+
+class QueryStats:
+    """Запросы к БД в рамках одного HTTP-запроса: число, суммарное время, повторы"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.statements = Counter()
+
+    def record(self, statement, elapsed_ms):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.statements[statement] += 1
+
+    def repeated(self, threshold):
+        """Запросы, выполненные threshold и более раз — типичный след N+1"""
+        return [(statement, count) for statement, count in self.statements.most_common() if count >= threshold]
+
+
+def current_query_stats():
+    """Статистика текущего HTTP-запроса (None вне запроса)"""
+    if not has_request_context():
+        return None
+    return g.get('query_stats')
+
+
+def _shorten(statement):
+    statement = ' '.join(statement.split())
+    return statement if len(statement) <= MAX_LOGGED_STATEMENT else statement[:MAX_LOGGED_STATEMENT] + '...'
+
+
+def init_query_stats(app):
+    """
+    Хуки движка SQLAlchemy: время каждого запроса, лог медленных запросов,
+    счётчики на HTTP-запрос и предупреждение о вероятном N+1 после ответа.
+    """
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context.query_started = time.perf_counter()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - context.query_started) * 1000
+        if elapsed_ms >= app.config['DB_SLOW_QUERY_MS']:
+            logger.warning("Slow query (%.1f ms): %s", elapsed_ms, _shorten(statement))
+        stats = current_query_stats()
+        if stats is not None:
+            stats.record(statement, elapsed_ms)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+
+    @app.before_request
+    def start_query_stats():
+        g.query_stats = QueryStats()
+
+    @app.after_request
+    def report_query_stats(response):
+        stats = g.get('query_stats')
+        if stats is not None:
+            for statement, count in stats.repeated(app.config['DB_N_PLUS_ONE_THRESHOLD']):
+                logger.warning("Possible N+1 in %s %s: query executed %s times: %s",
+                               request.method, request.path, count, _shorten(statement))
+        return response
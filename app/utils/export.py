@@ -0,0 +1,28 @@
+import json
+from flask import Response, current_app, stream_with_context
+from app import db
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def iter_ndjson(model, batch_size):
+    """
+    Построчная выгрузка таблицы в NDJSON.
+    yield_per включает серверный курсор (stream_results), поэтому в памяти
+    одновременно находится не больше одной пачки строк, независимо от размера таблицы.
+    """
+    stmt = db.select(model).order_by(model.id).execution_options(yield_per=batch_size)
+    result = db.session.scalars(stmt)
+    for batch in result.partitions():
+        # Одна пачка — один chunk ответа, чтобы не писать в сокет по строке
+        yield ''.join(json.dumps(row.to_dict()) + '\n' for row in batch)
+
+
+def ndjson_response(model, filename):
+    """Потоковый ответ с выгрузкой всей таблицы model"""
+    batch_size = current_app.config['EXPORT_BATCH_SIZE']
+    return Response(
+        stream_with_context(iter_ndjson(model, batch_size)),
+        mimetype=NDJSON_MIMETYPE,
+        headers={'Content-Disposition': f'attachment; filename={filename}.ndjson'}
+    )
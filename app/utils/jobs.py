@@ -0,0 +1,317 @@
+import contextvars
+import json
+import os
+import socket
+import time
+import traceback
+import uuid
+import redis
+from app import db, logger
+
+# Доля таймаута сокета, которую воркер может ждать в BLMOVE
+BLOCK_TIMEOUT_SHARE = 0.8
+
+# Значения ключа идемпотентности: захват на время выполнения и отметка о выполнении
+CLAIM_PREFIX = 'running:'
+DONE = 'done'
+
+# Ключ идемпотентности выполняемой задачи и его TTL — для mark_done в обработчике
+_current_done_key = contextvars.ContextVar('current_done_key', default=None)
+
+# Имя задачи -> обработчик; заполняется декоратором job при импорте модулей с задачами
+JOB_HANDLERS = {}
+
+
+def job(name):
+    """Регистрирует функцию как обработчик задач name (аргументы — из args задачи)"""
+    def decorator(f):
+        JOB_HANDLERS[name] = f
+        return f
+    return decorator
+
+
+def queue_key(queue):
+    return f"jobs:queue:{queue}"
+
+
+def delayed_key(queue):
+    """Sorted set задач, ожидающих повтора; score — время следующей попытки"""
+    return f"jobs:delayed:{queue}"
+
+
+def dead_key(queue):
+    return f"jobs:dead:{queue}"
+
+
+def processing_key(queue, worker_id):
+    """Задачи, взятые воркером, но ещё не подтверждённые (для восстановления после падения)"""
+    return f"jobs:processing:{queue}:{worker_id}"
+
+
+def heartbeat_key(worker_id):
+    return f"jobs:worker:{worker_id}"
+
+
+def done_key(idempotency_key):
+    return f"jobs:done:{idempotency_key}"
+
+
+def mark_done(pipe):
+    """
+    Добавляет отметку о выполнении текущей задачи в транзакцию (MULTI) обработчика.
+    Обработчик, который меняет только Redis, так фиксирует результат и отметку
+    атомарно: падение воркера после EXEC не приведёт к повторному выполнению.
+    """
+    current = _current_done_key.get()
+    if current is not None:
+        key, ttl = current
+        pipe.set(key, DONE, ex=ttl)
+
+
+def make_job(name, args=None, idempotency_key=None):
+    return {
+        'id': uuid.uuid4().hex,
+        'name': name,
+        'args': args or {},
+        'key': idempotency_key,
+        'attempts': 0,
+        'enqueued_at': time.time()
+    }
+
+
+def enqueue(redis_client, *jobs, queue='default'):
+    """
+    Ставит задачи в очередь одним round trip. Вызывать после commit: обработчик
+    должен видеть записанные данные. Повторная постановка задачи с тем же ключом
+    идемпотентности безопасна — воркер выполнит её один раз.
+    """
+    if not jobs:
+        return
+    pipe = redis_client.pipeline(transaction=False)
+    for item in jobs:
+        pipe.lpush(queue_key(queue), json.dumps(item))
+    pipe.execute()
+
+
+def retry_delay(attempts, base, cap):
+    """Экспоненциальная задержка перед повтором: base * 2^(attempts-1), не больше cap"""
+    return min(cap, base * 2 ** (attempts - 1))
+
+
+class Worker:
+    """
+    Воркер очереди. Задача переносится из очереди в список processing воркера (BLMOVE),
+    поэтому при падении процесса не теряется: другой воркер вернёт её в очередь.
+    Задача с ключом идемпотентности перед запуском захватывает его (SET NX), после
+    успеха задача удаляется из processing и ключ помечается выполненным; после ошибки — откладывается с экспоненциальной задержкой, а после
+    JOB_MAX_ATTEMPTS попыток попадает в очередь мёртвых задач.
+    """
+
+    def __init__(self, app, redis_client, queue='default', worker_id=None):
+        self.app = app
+        self.redis = redis_client
+        self.queue = queue
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.processing = processing_key(queue, self.worker_id)
+        self.config = app.config
+
+    def heartbeat(self):
+        self.redis.set(heartbeat_key(self.worker_id), int(time.time()), ex=self.config['JOB_WORKER_HEARTBEAT_TTL'])
+
+    def recover_orphans(self):
+        """Возвращает в очередь задачи воркеров, которые перестали отправлять heartbeat"""
+        recovered = 0
+        for key in self.redis.scan_iter(match=processing_key(self.queue, '*')):
+            key = key.decode() if isinstance(key, bytes) else key
+            worker_id = key[len(processing_key(self.queue, '')):]
+            if worker_id != self.worker_id and self.redis.exists(heartbeat_key(worker_id)):
+                continue
+            while self.redis.lmove(key, queue_key(self.queue), 'RIGHT', 'LEFT') is not None:
+                recovered += 1
+        if recovered:
+            logger.warning("Recovered %s unacknowledged jobs from stopped workers.", recovered)
+        return recovered
+
+    def promote_delayed(self):
+        """Переносит задачи, у которых подошло время повтора, обратно в очередь"""
+        key = delayed_key(self.queue)
+        due = self.redis.zrangebyscore(key, 0, time.time(), start=0, num=100)
+        if not due:
+            return 0
+        pipe = self.redis.pipeline(transaction=True)
+        for raw in due:
+            pipe.zrem(key, raw)
+        removed = pipe.execute()
+        # Задачу, которую успел забрать другой воркер (zrem вернул 0), не дублируем
+        ready = [raw for raw, ok in zip(due, removed) if ok]
+        if ready:
+            self.redis.rpush(queue_key(self.queue), *ready)
+        return len(ready)
+
+    def block_timeout(self, poll_timeout):
+        """
+        Время ожидания BLMOVE: меньше таймаута сокета клиента, иначе каждое ожидание
+        на пустой очереди заканчивается TimeoutError вместо пустого ответа
+        """
+        socket_timeout = self.redis.connection_pool.connection_kwargs.get('socket_timeout')
+        if socket_timeout is None:
+            return poll_timeout
+        return min(poll_timeout, socket_timeout * BLOCK_TIMEOUT_SHARE)
+
+    def fetch(self, timeout):
+        try:
+            return self.redis.blmove(queue_key(self.queue), self.processing, timeout, 'RIGHT', 'LEFT')
+        except redis.TimeoutError:
+            # Ответ не успел прийти до таймаута сокета — считаем очередь пустой
+            return None
+
+    def claim(self, key):
+        """
+        Захватывает ключ идемпотентности (SET NX) до запуска обработчика, чтобы одну
+        задачу не выполнили два воркера. Захват остановленного воркера (без heartbeat)
+        переходит к текущему. Возвращает False, если задача выполнена или выполняется.
+        """
+        claim = f"{CLAIM_PREFIX}{self.worker_id}"
+        ttl = self.config['JOB_CLAIM_TTL']
+        if self.redis.set(done_key(key), claim, nx=True, ex=ttl):
+            return True
+        value = self.redis.get(done_key(key))
+        value = value.decode() if isinstance(value, bytes) else value
+        if value is None:
+            return bool(self.redis.set(done_key(key), claim, nx=True, ex=ttl))
+        if not value.startswith(CLAIM_PREFIX):
+            return False
+        owner = value[len(CLAIM_PREFIX):]
+        if owner != self.worker_id and self.redis.exists(heartbeat_key(owner)):
+            return False
+        self.redis.set(done_key(key), claim, xx=True, ex=ttl)
+        return True
+
+    def release(self, key):
+        """Снимает захват после ошибки обработчика, чтобы повтор мог выполнить задачу"""
+        claim = f"{CLAIM_PREFIX}{self.worker_id}".encode()
+        with self.redis.pipeline(transaction=True) as pipe:
+            try:
+                pipe.watch(done_key(key))
+                if pipe.get(done_key(key)) == claim:
+                    pipe.multi()
+                    pipe.delete(done_key(key))
+                    pipe.execute()
+            except redis.WatchError:
+                pass
+
+    def process(self, raw):
+        """Выполняет одну задачу и подтверждает её; возвращает итог: done, skipped, retry или dead"""
+        item = json.loads(raw)
+        key = item.get('key')
+        if key and not self.claim(key):
+            self.redis.lrem(self.processing, 1, raw)
+            logger.info("Job %s (%s) already done or running, skipping.", item['name'], key)
+            return 'skipped'
+
+        handler = JOB_HANDLERS.get(item['name'])
+        token = _current_done_key.set((done_key(key), self.config['JOB_IDEMPOTENCY_TTL']) if key else None)
+        try:
+            if handler is None:
+                raise LookupError(f"No handler for job {item['name']}")
+            with self.app.app_context():
+                try:
+                    handler(**item['args'])
+                finally:
+                    db.session.remove()
+        except Exception as e:
+            if key:
+                self.release(key)
+            return self._fail(raw, item, e)
+        finally:
+            _current_done_key.reset(token)
+
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.lrem(self.processing, 1, raw)
+        if key:
+            pipe.set(done_key(key), DONE, ex=self.config['JOB_IDEMPOTENCY_TTL'])
+        pipe.execute()
+        return 'done'
+
+    def _fail(self, raw, item, error):
+        item['attempts'] += 1
+        item['error'] = f"{type(error).__name__}: {error}"
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.lrem(self.processing, 1, raw)
+        if item['attempts'] >= self.config['JOB_MAX_ATTEMPTS']:
+            item['traceback'] = traceback.format_exc()
+            item['failed_at'] = time.time()
+            pipe.lpush(dead_key(self.queue), json.dumps(item))
+            pipe.ltrim(dead_key(self.queue), 0, self.config['JOB_DEAD_LETTER_MAX_LEN'] - 1)
+            outcome = 'dead'
+            logger.error("Job %s %s failed %s times, moved to dead letter queue: %s",
+                         item['name'], item['id'], item['attempts'], item['error'])
+        else:
+            delay = retry_delay(item['attempts'], self.config['JOB_RETRY_BASE_DELAY'],
+                                self.config['JOB_RETRY_MAX_DELAY'])
+            pipe.zadd(delayed_key(self.queue), {json.dumps(item): time.time() + delay})
+            outcome = 'retry'
+            logger.warning("Job %s %s failed (attempt %s), retrying in %ss: %s",
+                           item['name'], item['id'], item['attempts'], delay, item['error'])
+        pipe.execute()
+        return outcome
+
+    def run(self, burst=False, poll_timeout=None, stop=None):
+        """
+        Основной цикл. В режиме burst воркер завершается, когда очередь пуста
+        (удобно для тестов и cron), иначе ждёт новые задачи до poll_timeout
+        (JOB_POLL_TIMEOUT) секунд за одно обращение. Heartbeat и возврат задач
+        остановленных воркеров выполняются при старте и каждую треть
+        JOB_WORKER_HEARTBEAT_TTL. stop (threading.Event) завершает цикл.
+        """
+        poll_timeout = poll_timeout or self.config['JOB_POLL_TIMEOUT']
+        block_timeout = self.block_timeout(poll_timeout)
+        self.heartbeat()
+        self.recover_orphans()
+        processed = 0
+        last_heartbeat = time.monotonic()
+        while stop is None or not stop.is_set():
+            try:
+                self.promote_delayed()
+                raw = self.fetch(0.01 if burst else block_timeout)
+                if raw is not None:
+                    self.process(raw)
+                    processed += 1
+                elif burst:
+                    return processed
+                if time.monotonic() - last_heartbeat >= self.config['JOB_WORKER_HEARTBEAT_TTL'] / 3:
+                    self.heartbeat()
+                    # Задачи воркеров, упавших уже во время работы, возвращаем с тем же интервалом
+                    self.recover_orphans()
+                    last_heartbeat = time.monotonic()
+            except redis.RedisError as e:
+                # Неподтверждённая задача останется в processing и будет восстановлена
+                if burst:
+                    raise
+                logger.error("Job worker lost Redis (%s), retrying in %ss.", e, poll_timeout)
+                time.sleep(poll_timeout)
+        return processed
+
+
+def requeue_dead(redis_client, queue='default', limit=None):
+    """Возвращает мёртвые задачи в очередь со сброшенным счётчиком попыток"""
+    moved = 0
+    while limit is None or moved < limit:
+        raw = redis_client.rpop(dead_key(queue))
+        if raw is None:
+            break
+        item = json.loads(raw)
+        for field in ('error', 'traceback', 'failed_at'):
+            item.pop(field, None)
+        item['attempts'] = 0
+        redis_client.lpush(queue_key(queue), json.dumps(item))
+        moved += 1
+    return moved
+
+
+def queue_stats(redis_client, queue='default'):
+    return {
+        'queued': redis_client.llen(queue_key(queue)),
+        'delayed': redis_client.zcard(delayed_key(queue)),
+        'dead': redis_client.llen(dead_key(queue))
+    }
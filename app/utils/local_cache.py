@@ -0,0 +1,124 @@
+import json
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from app import logger
+
+INVALIDATION_CHANNEL = 'cache:invalidate'
+
+
+class LocalCache:
+    """
+    Ограниченный по размеру LRU-кэш с TTL внутри процесса — первый уровень перед Redis.
+    Согласованность между воркерами поддерживается сообщениями об инвалидации через
+    Redis pub/sub, а короткий TTL ограничивает устаревание, если сообщение потерялось.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *names):
+        """Удаляет коллекции целиком: сам ключ и всё под префиксом name: (страницы, версию)"""
+        prefixes = tuple(f"{name}:" for name in names)
+        with self._lock:
+            for key in list(self._entries):
+                base = key[0] if isinstance(key, tuple) else key
+                if base in names or base.startswith(prefixes):
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CacheStats:
+    """Счётчики попаданий и промахов по уровням кэша (local, redis)"""
+
+    def __init__(self):
+        self._counts = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, tier, hit):
+        with self._lock:
+            self._counts[(tier, 'hits' if hit else 'misses')] += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self._counts)
+        return {
+            tier: {outcome: counts.get((tier, outcome), 0) for outcome in ('hits', 'misses')}
+            for tier in ('local', 'redis')
+        }
+
+
+def publish_invalidation(redis_client, *names):
+    """Сообщение другим воркерам о сбросе коллекций names; redis_client может быть пайплайном"""
+    redis_client.publish(INVALIDATION_CHANNEL, json.dumps(names))
+
+
+def _listen_for_invalidations(redis_client, local_cache):
+    while True:
+        try:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(INVALIDATION_CHANNEL)
+            for message in pubsub.listen():
+                local_cache.invalidate(*json.loads(message['data']))
+        except Exception as e:
+            # Пока подписка не восстановлена, устаревание ограничено TTL локального кэша
+            logger.error("Cache invalidation listener failed: %s", e)
+            local_cache.clear()
+            time.sleep(1)
+
+
+def ensure_invalidation_listener(app, redis_client):
+    """Лениво запускает в процессе поток, применяющий инвалидации от других воркеров"""
+    if app.extensions.get('cache_invalidation_listener') is not None:
+        return
+    with app.extensions['local_cache_lock']:
+        if app.extensions.get('cache_invalidation_listener') is not None:
+            return
+        thread = threading.Thread(
+            target=_listen_for_invalidations,
+            args=(redis_client, app.extensions['local_cache']),
+            name='cache-invalidation-listener',
+            daemon=True
+        )
+        thread.start()
+        app.extensions['cache_invalidation_listener'] = thread
+
+
+def init_local_cache(app):
+    app.extensions['local_cache'] = LocalCache(
+        max_entries=app.config['LOCAL_CACHE_MAX_ENTRIES'],
+        ttl=app.config['LOCAL_CACHE_TTL']
+    )
+    app.extensions['local_cache_lock'] = threading.Lock()
+    app.extensions['cache_stats'] = CacheStats()
@@ -1,35 +1,225 @@
+import atexit
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 from flask import current_app
+from config import Config
 
-def setup_logger():
+class JsonFormatter(logging.Formatter):
+    """Структурированный формат: одна запись — один JSON-объект в строке"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _make_formatter(log_format):
+    if log_format == 'json':
+        return JsonFormatter()
+    return logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+
+def setup_logger(config=Config):
+    """
+    Логгер приложения. Поток запроса только кладёт запись в очередь (QueueHandler),
+    а вывод в консоль и запись в файл с ротацией выполняет фоновый QueueListener.
+    Уровни и формат (text/json) берутся из конфига.
+    """
     # Создаём логгер
     logger = logging.getLogger('flower_shop')
-    logger.setLevel(logging.DEBUG)
+    logger.setLevel(config.LOG_LEVEL)
+    if any(isinstance(handler, QueueHandler) for handler in logger.handlers):
+        # Уже настроен (повторный импорт) — не запускаем второй поток
+        return logger
 
     # Форматирование логов
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
+    formatter = _make_formatter(config.LOG_FORMAT)
 
     # Консольный хендлер
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+    console_handler.setLevel(config.LOG_CONSOLE_LEVEL)
 
     # Хендлер для записи в файл с ротацией
     file_handler = RotatingFileHandler(
-        'logs/flower_shop.log', maxBytes=1000000, backupCount=3
+        config.LOG_FILE, maxBytes=config.LOG_FILE_MAX_BYTES, backupCount=config.LOG_FILE_BACKUP_COUNT
     )
     file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+    file_handler.setLevel(config.LOG_FILE_LEVEL)
 
+    # Ввод-вывод — в фоновом потоке, вне пути запроса. Очередь не ограничена:
+    # записи приложения не теряем, а переполнение возможно только при зависшем диске
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+    listener.start()
+    # При завершении процесса дописываем всё, что осталось в очереди
+    atexit.register(listener.stop)
+
+    logger.addHandler(QueueHandler(log_queue))
     return logger
 
-def log_to_redis(level, message):
-    redis_client = current_app.redis_client
-    log_message = f"{level.upper()} - {message}"  # Форматирование сообщения с уровнем логирования
-    log_key = f"log:{level}"
-    redis_client.lpush(log_key, log_message)
-    redis_client.ltrim(log_key, 0, 99)  # Храним только последние 100 сообщений
 
+class RedisLogHandler(logging.Handler):
+    """
+    Запись логов в списки Redis log:{level} (последние max_len сообщений).
+    Принимает записи пачками: все LPUSH и LTRIM пачки уходят одним пайплайном,
+    то есть один round trip на пачку вместо двух на каждое сообщение.
+    """
+
+    def __init__(self, redis_client, max_len=100, level=logging.NOTSET):
+        super().__init__(level)
+        self.redis_client = redis_client
+        self.max_len = max_len
+        self.setFormatter(logging.Formatter('%(levelname)s - %(message)s'))
+
+    def emit(self, record):
+        self.emit_batch([record])
+
+    def emit_batch(self, records):
+        messages = {}
+        for record in records:
+            if record.levelno >= self.level:
+                messages.setdefault(f"log:{record.levelname.lower()}", []).append(self.format(record))
+        if not messages:
+            return
+
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key, values in messages.items():
+                pipe.lpush(key, *values)
+                pipe.ltrim(key, 0, self.max_len - 1)
+            pipe.execute()
+        except Exception:
+            self.handleError(records[-1])
+
+
+class SamplingQueueHandler(QueueHandler):
+    """
+    QueueHandler, который никогда не блокирует поток запроса: при заполнении
+    очереди выше high_watermark записи ниже WARNING пропускаются с выборкой
+    1 из sample_rate, а при полностью заполненной очереди запись отбрасывается.
+    """
+
+    def __init__(self, log_queue, high_watermark, sample_rate):
+        super().__init__(log_queue)
+        self.high_watermark = high_watermark
+        self.sample_rate = max(1, sample_rate)
+        self.dropped = 0
+        self._sampled = 0
+
+    def enqueue(self, record):
+        if record.levelno < logging.WARNING and self.queue.qsize() >= self.high_watermark:
+            self._sampled += 1
+            if self._sampled % self.sample_rate:
+                self.dropped += 1
+                return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BatchingQueueListener(QueueListener):
+    """QueueListener, который забирает из очереди всё накопленное (до batch_size) за раз"""
+
+    def __init__(self, log_queue, *handlers, batch_size=200):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.batch_size = batch_size
+        self._stop_requested = False
+
+    def dequeue(self, block):
+        if self._stop_requested:
+            return self._sentinel
+        batch = [self.queue.get(block)]
+        if batch[0] is self._sentinel:
+            return self._sentinel
+        while len(batch) < self.batch_size:
+            try:
+                record = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if record is self._sentinel:
+                # Сначала отправляем накопленное, а остановку — следующим dequeue;
+                # task_done для сигнала вызовет базовый _monitor, когда получит его
+                self._stop_requested = True
+                break
+            # Базовый _monitor вызывает task_done один раз на dequeue — остальные отмечаем здесь
+            self.queue.task_done()
+            batch.append(record)
+        return batch
+
+    def handle(self, batch):
+        records = [self.prepare(record) for record in batch]
+        for handler in self.handlers:
+            if hasattr(handler, 'emit_batch'):
+                handler.emit_batch(records)
+            else:
+                for record in records:
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+
+    def enqueue_sentinel(self):
+        # Очередь ограничена — при остановке ждём места, а не теряем сигнал
+        self.queue.put(self._sentinel)
+
+
+_redis_log_lock = threading.Lock()
+
+
+def get_redis_log_handler(app):
+    """
+    Лениво создаёт для приложения очередь и поток, отправляющий логи в Redis.
+    Возвращает QueueHandler: его handle() только кладёт запись в очередь.
+    """
+    handler = app.extensions.get('redis_log_handler')
+    if handler is not None:
+        return handler
+    with _redis_log_lock:
+        handler = app.extensions.get('redis_log_handler')
+        if handler is None:
+            queue_size = app.config['LOG_REDIS_QUEUE_SIZE']
+            log_queue = queue.Queue(maxsize=queue_size)
+            listener = BatchingQueueListener(
+                log_queue,
+                RedisLogHandler(app.redis_client, max_len=app.config['LOG_REDIS_MAX_LEN']),
+                batch_size=app.config['LOG_REDIS_BATCH_SIZE']
+            )
+            listener.start()
+            atexit.register(listener.stop)
+
+            handler = SamplingQueueHandler(
+                log_queue,
+                high_watermark=int(queue_size * 0.8),
+                sample_rate=app.config['LOG_REDIS_SAMPLE_RATE']
+            )
+            app.extensions['redis_log_listener'] = listener
+            app.extensions['redis_log_handler'] = handler
+    return handler
+
+
+def init_redis_logging(app, logger):
+    """Если LOG_TO_REDIS включён, записи logger от LOG_REDIS_LEVEL и выше дублируются в Redis"""
+    if app.config['LOG_TO_REDIS']:
+        handler = get_redis_log_handler(app)
+        handler.setLevel(app.config['LOG_REDIS_LEVEL'])
+        if handler not in logger.handlers:
+            logger.addHandler(handler)
+
+
+def log_to_redis(level, message):
+    """Сообщение в Redis без ожидания: запись только ставится в очередь отправки"""
+    handler = get_redis_log_handler(current_app._get_current_object())
+    levelno = logging.getLevelName(level.upper())
+    record = logging.LogRecord('flower_shop', levelno if isinstance(levelno, int) else logging.INFO,
+                               __name__, 0, message, None, None)
+    # Мимо фильтра уровня хендлера: явный вызов пишет в Redis всегда
+    handler.enqueue(handler.prepare(record))
@@ -0,0 +1,91 @@
+from datetime import datetime
+from flask import current_app
+from app import db, logger
+from app.models import Order, Product
+from app.utils.jobs import job, make_job, mark_done
+
+
+def order_created_jobs(orders):
+    """
+    Фоновые задачи после оформления заказов (одного или корзины): подтверждение клиенту,
+    счётчики аналитики и проверка низкого остатка. orders — словари с client_id,
+    product_id, quantity и total_price, включая id созданного заказа.
+    """
+    first_id = orders[0]['id']
+    today = datetime.utcnow().date().isoformat()
+    return [
+        make_job('order_confirmation', {'order_ids': [order['id'] for order in orders]},
+                 idempotency_key=f"order_confirmation:{first_id}"),
+        make_job('order_analytics', {'rows': [dict(order, date=today) for order in orders], 'sign': 1},
+                 idempotency_key=f"order_analytics:created:{first_id}"),
+        make_job('low_stock_check', {'product_ids': sorted({order['product_id'] for order in orders})})
+    ]
+
+
+def order_deleted_jobs(order):
+    """
+    Задачи после удаления заказа: откат аналитики и пересмотр предупреждения об остатке.
+    У старых заказов без created_at дня продаж нет — откатывать в аналитике нечего
+    """
+    jobs = [make_job('low_stock_check', {'product_ids': [order.product_id]})]
+    if order.created_at is not None:
+        row = dict(order.to_dict(), date=order.created_at.date().isoformat())
+        jobs.insert(0, make_job('order_analytics', {'rows': [row], 'sign': -1},
+                                idempotency_key=f"order_analytics:deleted:{order.id}"))
+    return jobs
+
+
+@job('order_confirmation')
+def send_order_confirmation(order_ids):
+    """
+    Подтверждение заказа клиенту. Почтового сервиса у магазина пока нет, поэтому
+    уведомление кладётся в ленту notifications:{client_id}, откуда его забирает рассылка.
+    """
+    orders = Order.query.filter(Order.id.in_(order_ids)).all()
+    if not orders:
+        logger.info("Orders %s no longer exist, confirmation skipped.", order_ids)
+        return
+    client = orders[0].client
+    total = sum(order.total_price for order in orders)
+    message = f"Order {', '.join(str(order.id) for order in orders)} confirmed, total {total:.2f}"
+
+    key = f"notifications:{client.id}"
+    pipe = current_app.redis_client.pipeline(transaction=False)
+    pipe.lpush(key, message)
+    pipe.ltrim(key, 0, current_app.config['NOTIFICATIONS_MAX_LEN'] - 1)
+    pipe.execute()
+    logger.info("Order confirmation queued for %s: %s", client.email, message)
+
+
+@job('order_analytics')
+def update_order_analytics(rows, sign):
+    """
+    Счётчики продаж в Redis: analytics:daily:{date} (orders, items, revenue) и рейтинг
+    продуктов по проданным штукам analytics:product_sales. sign = -1 при удалении заказа.
+    """
+    pipe = current_app.redis_client.pipeline(transaction=True)
+    for row in rows:
+        daily = f"analytics:daily:{row['date']}"
+        pipe.hincrby(daily, 'orders', sign)
+        pipe.hincrby(daily, 'items', sign * row['quantity'])
+        pipe.hincrbyfloat(daily, 'revenue', sign * row['total_price'])
+        pipe.zincrby('analytics:product_sales', sign * row['quantity'], row['product_id'])
+    # Отметка о выполнении в той же транзакции: повторная доставка не удвоит счётчики
+    mark_done(pipe)
+    pipe.execute()
+
+
+@job('low_stock_check')
+def check_low_stock(product_ids):
+    """Поддерживает хэш alerts:low_stock (product_id -> остаток) для продуктов ниже порога"""
+    threshold = current_app.config['LOW_STOCK_THRESHOLD']
+    rows = db.session.query(Product.id, Product.name, Product.stock).filter(Product.id.in_(product_ids)).all()
+    redis_client = current_app.redis_client
+    pipe = redis_client.pipeline(transaction=False)
+    for product_id, name, stock in rows:
+        if stock < threshold:
+            logger.warning("Low stock for product %s (%s): %s left.", product_id, name, stock)
+            pipe.hset('alerts:low_stock', product_id, stock)
+        else:
+            pipe.hdel('alerts:low_stock', product_id)
+    pipe.execute()
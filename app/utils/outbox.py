@@ -0,0 +1,172 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+import redis
+from flask import current_app
+from sqlalchemy import delete, event, inspect, or_, update
+from sqlalchemy.orm import Session
+from app import db, logger
+from app.models import OutboxEvent
+from app.utils.cache import apply_invalidation
+from app.utils.jobs import enqueue
+
+# События, добавленные в текущую транзакцию сессии: после commit их можно доставить сразу
+PENDING_KEY = 'outbox_pending'
+
+
+def _add(kind, payload):
+    outbox_event = OutboxEvent(kind=kind, payload=json.dumps(payload))
+    db.session.add(outbox_event)
+    db.session.info.setdefault(PENDING_KEY, []).append((outbox_event, kind, payload))
+
+
+def record_invalidation(*names, keys=()):
+    """Сброс кэша коллекций names и ключей keys — фиксируется вместе с текущей транзакцией"""
+    _add('invalidate', {'names': list(names), 'keys': list(keys)})
+
+
+def record_jobs(*jobs, queue='default'):
+    """Постановка фоновых задач в очередь — только если текущая транзакция зафиксирована"""
+    if jobs:
+        _add('jobs', {'queue': queue, 'jobs': list(jobs)})
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_pending(session, previous_transaction):
+    # События откаченной транзакции не должны быть доставлены
+    session.info.pop(PENDING_KEY, None)
+
+
+def deliver(redis_client, payloads):
+    """
+    Доставка пачки событий в Redis: все сбросы кэша объединяются в один пайплайн,
+    задачи — в одну постановку на очередь. Ошибка Redis пробрасывается.
+    """
+    names, keys, jobs = set(), set(), {}
+    for kind, payload in payloads:
+        if kind == 'invalidate':
+            names.update(payload['names'])
+            keys.update(payload['keys'])
+        elif kind == 'jobs':
+            jobs.setdefault(payload['queue'], []).extend(payload['jobs'])
+        else:
+            logger.error("Unknown outbox event kind %s, dropping it.", kind)
+    if names or keys:
+        apply_invalidation(redis_client, sorted(names), sorted(keys))
+    for queue, items in jobs.items():
+        enqueue(redis_client, *items, queue=queue)
+
+
+def commit_with_outbox(eager=True):
+    """
+    db.session.commit() с доставкой событий outbox этой транзакции. Commit от Redis не
+    зависит: при eager события сразу отправляются (best effort, через автомат Redis),
+    а при ошибке или eager=False их доставит relay. Немедленно доставляемые события
+    помечаются claimed_at в той же транзакции, поэтому relay не отправит их второй раз.
+    """
+    pending = db.session.info.pop(PENDING_KEY, [])
+    eager = bool(pending) and eager and current_app.config['OUTBOX_EAGER']
+    if eager:
+        claimed_at = datetime.utcnow()
+        for outbox_event, _, _ in pending:
+            outbox_event.claimed_at = claimed_at
+    db.session.commit()
+    if not eager:
+        return
+    ids = [inspect(outbox_event).identity[0] for outbox_event, _, _ in pending]
+    try:
+        deliver(current_app.redis_client, [(kind, payload) for _, kind, payload in pending])
+    except redis.RedisError as e:
+        logger.warning("Outbox delivery deferred to relay: %s", e)
+        _release(ids)
+        return
+    try:
+        db.session.execute(delete(OutboxEvent).where(OutboxEvent.id.in_(ids)))
+        db.session.commit()
+    except Exception as e:
+        # Данные уже зафиксированы; relay повторит доставку после OUTBOX_CLAIM_TIMEOUT
+        db.session.rollback()
+        logger.error("Failed to delete delivered outbox events %s: %s", ids, e)
+
+
+def _release(ids):
+    """Снимает захват недоставленных событий, чтобы relay отправил их без ожидания"""
+    try:
+        db.session.execute(update(OutboxEvent).where(OutboxEvent.id.in_(ids)).values(claimed_at=None))
+        db.session.commit()
+    except Exception as e:
+        # Захват истечёт сам через OUTBOX_CLAIM_TIMEOUT
+        db.session.rollback()
+        logger.error("Failed to release outbox events %s: %s", ids, e)
+
+
+def relay_batch(redis_client, batch_size):
+    """
+    Доставляет до batch_size самых старых незахваченных событий одним обращением к Redis
+    и удаляет их.
+    На PostgreSQL строки блокируются с SKIP LOCKED, поэтому relay можно запускать
+    в нескольких процессах. Возвращает число доставленных событий.
+    """
+    # События, которые сейчас доставляет запрос, пропускаем, пока захват не истёк
+    claim_expired = datetime.utcnow() - timedelta(seconds=current_app.config['OUTBOX_CLAIM_TIMEOUT'])
+    events = db.session.execute(
+        db.select(OutboxEvent.id, OutboxEvent.kind, OutboxEvent.payload)
+        .where(or_(OutboxEvent.claimed_at.is_(None), OutboxEvent.claimed_at < claim_expired))
+        .order_by(OutboxEvent.id).limit(batch_size).with_for_update(skip_locked=True)
+    ).all()
+    if not events:
+        db.session.rollback()
+        return 0
+    try:
+        deliver(redis_client, [(kind, json.loads(payload)) for _, kind, payload in events])
+    except redis.RedisError:
+        db.session.rollback()
+        raise
+    db.session.execute(delete(OutboxEvent).where(OutboxEvent.id.in_([event_id for event_id, _, _ in events])))
+    db.session.commit()
+    return len(events)
+
+
+def relay(redis_client, batch_size):
+    """Доставляет все накопившиеся события; возвращает их число"""
+    total = 0
+    while True:
+        delivered = relay_batch(redis_client, batch_size)
+        total += delivered
+        if delivered < batch_size:
+            return total
+
+
+def run_relay(app, interval, stop=None):
+    """Цикл relay: раз в interval секунд доставляет накопившиеся события"""
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        with app.app_context():
+            try:
+                delivered = relay(app.redis_client, app.config['OUTBOX_BATCH_SIZE'])
+                if delivered:
+                    logger.info("Outbox relay delivered %s events.", delivered)
+            except redis.RedisError as e:
+                logger.warning("Outbox relay cannot reach Redis: %s", e)
+            except Exception:
+                logger.exception("Outbox relay failed.")
+            finally:
+                db.session.remove()
+        stop.wait(interval)
+
+
+def init_outbox_relay(app):
+    """Фоновый поток relay в каждом процессе приложения (запускается после fork)"""
+    lock = threading.Lock()
+
+    @app.before_request
+    def ensure_outbox_relay():
+        if not app.config['OUTBOX_RELAY_THREAD'] or app.extensions.get('outbox_relay_pid') == os.getpid():
+            return
+        with lock:
+            if app.extensions.get('outbox_relay_pid') == os.getpid():
+                return
+            threading.Thread(target=run_relay, args=(app, app.config['OUTBOX_RELAY_INTERVAL']),
+                             name='outbox-relay', daemon=True).start()
+            app.extensions['outbox_relay_pid'] = os.getpid()
@@ -0,0 +1,80 @@
+import base64
+import json
+import redis
+from flask import current_app
+from app.utils.cache import page_cache_key, cached_json_response, json_bytes_response, encode_json
+
+
+class PaginationError(ValueError):
+    """Некорректные параметры limit/cursor"""
+
+
+def is_paginated(args):
+    """Клиент запросил постраничную выдачу"""
+    return 'limit' in args or 'cursor' in args
+
+
+def encode_cursor(values):
+    """Непрозрачный курсор: base64 от JSON со значениями ключа последней строки"""
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise PaginationError('Invalid cursor')
+    if not isinstance(values, dict):
+        raise PaginationError('Invalid cursor')
+    return values
+
+
+def parse_page_args(args):
+    """Разбор limit/cursor из query string. Возвращает (limit, after_id)"""
+    default_limit = current_app.config['PAGE_DEFAULT_LIMIT']
+    max_limit = current_app.config['PAGE_MAX_LIMIT']
+
+    try:
+        limit = int(args.get('limit', default_limit))
+    except ValueError:
+        raise PaginationError('limit must be an integer')
+    if limit < 1 or limit > max_limit:
+        raise PaginationError(f'limit must be between 1 and {max_limit}')
+
+    after = 0
+    cursor = args.get('cursor')
+    if cursor:
+        after = decode_cursor(cursor).get('id')
+        if not isinstance(after, int):
+            raise PaginationError('Invalid cursor')
+
+    return limit, after
+
+
+def paginate(model, limit, after):
+    """
+    Keyset-пагинация по первичному ключу: WHERE id > :after ORDER BY id LIMIT :limit + 1.
+    Лишняя строка нужна только для того, чтобы понять, есть ли следующая страница,
+    поэтому стоимость запроса не зависит от размера таблицы и глубины страницы.
+    """
+    rows = model.query.filter(model.id > after).order_by(model.id).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        'items': [row.to_dict() for row in rows],
+        'next_cursor': encode_cursor({'id': rows[-1].id}) if has_more else None
+    }
+
+
+def cached_page_response(redis_client, name, model, args, ttl):
+    """Страница коллекции, закэшированная в Redis в виде готового тела ответа"""
+    limit, after = parse_page_args(args)
+    try:
+        cache_key = page_cache_key(redis_client, name, after, limit)
+    except redis.RedisError:
+        # Без версии коллекции ключ не построить — страница из БД (она дешёвая)
+        return json_bytes_response(encode_json(paginate(model, limit, after)))
+    # Версия уже входит в ключ страницы, поэтому дополнительная проверка не нужна
+    return cached_json_response(redis_client, cache_key, lambda: paginate(model, limit, after), ttl)
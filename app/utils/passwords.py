@@ -0,0 +1,105 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from flask import current_app
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash, check_password_hash
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Очередь на хэширование заполнена или ответ не пришёл вовремя"""
+
+
+_executor = None
+_executor_pid = None
+_slots = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """
+    Пул процессов на воркер приложения, создаётся лениво (после fork сервера).
+    pbkdf2/scrypt занимают CPU на сотни миллисекунд — в отдельных процессах они не
+    блокируют поток запроса и не конкурируют за GIL с остальными эндпоинтами.
+    """
+    global _executor, _executor_pid, _slots
+    if _executor is not None and _executor_pid == os.getpid():
+        return _executor, _slots
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            # spawn: дочерним процессам не нужна копия приложения и потоков родителя
+            _executor = ProcessPoolExecutor(
+                max_workers=current_app.config['PASSWORD_HASH_WORKERS'],
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            _executor_pid = os.getpid()
+            # Ограничение очереди: при всплеске входов лишние запросы получают отказ,
+            # а не копятся в памяти, увеличивая задержку для всех
+            _slots = threading.BoundedSemaphore(
+                current_app.config['PASSWORD_HASH_WORKERS'] + current_app.config['PASSWORD_HASH_MAX_PENDING']
+            )
+            atexit.register(_executor.shutdown, wait=False, cancel_futures=True)
+    return _executor, _slots
+
+
+def _run(fn, *args):
+    if current_app.config['PASSWORD_HASH_WORKERS'] < 1:
+        # Пул отключён (например, в тестах) — считаем в текущем потоке
+        return fn(*args)
+
+    timeout = current_app.config['PASSWORD_HASH_TIMEOUT']
+    executor, slots = _get_executor()
+    if not slots.acquire(timeout=timeout):
+        raise PasswordHasherBusy('Password hashing queue is full')
+    try:
+        return executor.submit(fn, *args).result(timeout=timeout)
+    except FutureTimeoutError:
+        raise PasswordHasherBusy('Password hashing timed out')
+    finally:
+        slots.release()
+
+
+def hash_password(password):
+    """Хэш пароля с алгоритмом и стоимостью из PASSWORD_HASH_METHOD"""
+    return _run(generate_password_hash, password, current_app.config['PASSWORD_HASH_METHOD'])
+
+
+def verify_password(pwhash, password):
+    return _run(check_password_hash, pwhash, password)
+
+
+def _normalized_method(method):
+    """
+    Префикс хэша для метода из конфига с подставленными параметрами Werkzeug
+    по умолчанию, например pbkdf2:sha256 -> pbkdf2:sha256:1000000
+    """
+    name, *params = method.split(':')
+    if name == 'pbkdf2':
+        defaults = ['sha256', str(DEFAULT_PBKDF2_ITERATIONS)]
+    elif name == 'scrypt':
+        defaults = [str(2 ** 15), '8', '1']
+    else:
+        return method
+    return ':'.join([name] + params + defaults[len(params):])
+
+
+def _cost(params):
+    return [int(param) for param in params if param.isdigit()]
+
+
+def needs_rehash(pwhash):
+    """
+    Хэш нужно пересчитать по PASSWORD_HASH_METHOD: сменился алгоритм или хэш-функция
+    без снижения стоимости либо стоимость выросла. Понижать стоимость уже сохранённых
+    хэшей нельзя — иначе откат конфига тихо ослабит пароли всех пользователей.
+    """
+    stored_name, *stored = pwhash.split('$', 1)[0].split(':')
+    target_name, *target = _normalized_method(current_app.config['PASSWORD_HASH_METHOD']).split(':')
+    if stored_name != target_name:
+        return True
+    stored_cost, target_cost = _cost(stored), _cost(target)
+    if len(stored_cost) != len(target_cost) or any(t < s for s, t in zip(stored_cost, target_cost)):
+        return False
+    return stored != target
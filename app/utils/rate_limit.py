@@ -0,0 +1,99 @@
+import time
+import uuid
+from functools import wraps
+import redis
+from flask import current_app, jsonify, make_response, request
+from app import logger
+
+
+def _setting(value):
+    """Лимит и окно можно задать числом или именем параметра конфига"""
+    return current_app.config[value] if isinstance(value, str) else value
+
+
+def by_ip():
+    return request.remote_addr
+
+
+def by_json_field(field):
+    """Ключ по полю JSON-тела запроса, например email при входе"""
+    def key_func():
+        data = request.get_json(silent=True) or {}
+        value = data.get(field)
+        return str(value).strip().lower() if value else None
+    return key_func
+
+
+def hit(redis_client, key, limit, window):
+    """
+    Скользящее окно на sorted set: одна транзакция MULTI удаляет устаревшие отметки,
+    добавляет текущую, считает отметки в окне и продлевает TTL ключа.
+    Возвращает (allowed, member, retry_after); member нужен, чтобы отменить отметку.
+    """
+    now = time.time()
+    member = f"{now}:{uuid.uuid4().hex}"
+
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.zremrangebyscore(key, 0, now - window)
+    pipe.zadd(key, {member: now})
+    pipe.zcard(key)
+    pipe.zrange(key, 0, 0, withscores=True)
+    pipe.expire(key, int(window) + 1)
+    _, _, count, oldest, _ = pipe.execute()
+
+    retry_after = 0
+    if count > limit:
+        retry_after = max(1, int(oldest[0][1] + window - now) + 1) if oldest else int(window)
+    return count <= limit, member, retry_after
+
+
+def cancel_hit(redis_client, key, member):
+    """Отменяет отметку, которая не должна учитываться в лимите"""
+    redis_client.zrem(key, member)
+
+
+def rate_limit(name, limit, window, key_func=by_ip, count_status=None, reset_on_success=False,
+               message='Too many requests. Please try again later.'):
+    """
+    Ограничение частоты запросов к маршруту в скользящем окне window секунд.
+    Ключ: {name}:{key_func()}. count_status — учитывать только ответы с этими кодами
+    (например, 401 для неудачных входов); reset_on_success — сбрасывать счётчик
+    после успешного ответа. Место под запрос резервируется до вызова view,
+    поэтому параллельные запросы не могут обойти лимит.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            identity = key_func()
+            if not identity:
+                return f(*args, **kwargs)
+
+            redis_client = current_app.redis_client
+            key = f"{name}:{identity}"
+            try:
+                allowed, member, retry_after = hit(redis_client, key, _setting(limit), _setting(window))
+            except redis.RedisError as e:
+                # Лимит без Redis не посчитать — пропускаем запрос, а не роняем маршрут
+                logger.warning("Rate limit %s skipped, Redis unavailable: %s", name, e)
+                return f(*args, **kwargs)
+            if not allowed:
+                # Отклонённые запросы не продлевают блокировку
+                cancel_hit(redis_client, key, member)
+                logger.warning("Rate limit %s exceeded for %s.", name, identity)
+                response = make_response(jsonify({'error': message}), 429)
+                response.headers['Retry-After'] = str(retry_after)
+                return response
+
+            response = make_response(f(*args, **kwargs))
+            try:
+                if reset_on_success and 200 <= response.status_code < 300:
+                    redis_client.delete(key)
+                elif count_status is not None and response.status_code not in count_status:
+                    cancel_hit(redis_client, key, member)
+            except redis.RedisError as e:
+                logger.warning("Failed to update rate limit %s: %s", name, e)
+            return response
+
+        return decorated_function
+
+    return decorator
@@ -0,0 +1,189 @@
+import threading
+import time
+import redis
+from redis.backoff import ExponentialBackoff
+from redis.client import Pipeline
+from redis.retry import Retry
+from app import logger
+from app.utils.request_metrics import add_redis_time
+
+
+# Блокирующие команды: таймаут сокета во время ожидания означает пустую очередь, а не сбой Redis
+BLOCKING_COMMANDS = frozenset({'BLMOVE', 'BRPOPLPUSH', 'BLPOP', 'BRPOP', 'BLMPOP', 'BZPOPMIN', 'BZPOPMAX', 'BZMPOP'})
+
+
+class RedisUnavailable(redis.ConnectionError):
+    """Автомат разомкнут: Redis недавно не отвечал, запрос не отправляется"""
+
+
+class CircuitBreaker:
+    """
+    Автоматический выключатель для Redis. После failure_threshold ошибок соединения
+    подряд размыкается, и все вызовы сразу получают RedisUnavailable вместо ожидания
+    таймаутов. Через reset_timeout секунд пропускает один пробный вызов: успех
+    замыкает цепь, ошибка снова размыкает.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            self.rejected += 1
+        raise RedisUnavailable('Redis circuit breaker is open')
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("Redis is reachable again, closing circuit breaker.")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                logger.error("Redis failed %s times, opening circuit breaker for %ss.",
+                             self.failures, self.reset_timeout)
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def record_neutral(self):
+        """Вызов не показал ни доступность, ни сбой Redis — освобождаем пробный вызов"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def call(self, fn, *args, timeout_is_failure=True, **kwargs):
+        self.before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except redis.TimeoutError:
+            if timeout_is_failure:
+                self.record_failure()
+            else:
+                self.record_neutral()
+            raise
+        except redis.ConnectionError:
+            self.record_failure()
+            raise
+        except BaseException:
+            # Ошибка не связана с доступностью Redis (например, WatchError) — пробный вызов завершён
+            self.record_success()
+            raise
+        self.record_success()
+        return result
+
+    def snapshot(self):
+        with self._lock:
+            return {'state': self.state, 'failures': self.failures, 'rejected': self.rejected}
+
+
+def _timed_call(breaker, fn, *args, **kwargs):
+    """Вызов через автомат с учётом времени в метриках текущего HTTP-запроса"""
+    started = time.perf_counter()
+    try:
+        return breaker.call(fn, *args, **kwargs)
+    finally:
+        add_redis_time(time.perf_counter() - started)
+
+
+class CircuitBreakerPipeline(Pipeline):
+    """Пайплайн, отправка которого проходит через автомат клиента"""
+
+    def __init__(self, *args, breaker, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.breaker = breaker
+
+    def immediate_execute_command(self, *args, **options):
+        return _timed_call(self.breaker, super().immediate_execute_command, *args, **options)
+
+    def execute(self, raise_on_error=True):
+        if not self.command_stack and not self.watching:
+            return []
+        return _timed_call(self.breaker, super().execute, raise_on_error)
+
+
+class CircuitBreakerRedis(redis.StrictRedis):
+    """Клиент Redis, все команды и пайплайны которого защищены CircuitBreaker"""
+
+    def __init__(self, *args, breaker, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.breaker = breaker
+
+    def execute_command(self, *args, **options):
+        blocking = str(args[0]).upper() in BLOCKING_COMMANDS
+        return _timed_call(self.breaker, super().execute_command, *args, timeout_is_failure=not blocking, **options)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return CircuitBreakerPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint,
+                                      breaker=self.breaker)
+
+
+def create_redis_client(config):
+    """
+    Клиент Redis с ограниченным пулом соединений, таймаутами, проверкой живости
+    соединений и автоматическим выключателем. С REDIS_POOL_BLOCKING запрос ждёт
+    свободное соединение не дольше REDIS_POOL_TIMEOUT, иначе сразу получает ошибку.
+    """
+    options = {
+        'max_connections': config['REDIS_MAX_CONNECTIONS'],
+        'socket_timeout': config['REDIS_SOCKET_TIMEOUT'],
+        'socket_connect_timeout': config['REDIS_SOCKET_CONNECT_TIMEOUT'],
+        'health_check_interval': config['REDIS_HEALTH_CHECK_INTERVAL'],
+        'retry': Retry(ExponentialBackoff(cap=0.1, base=0.01), config['REDIS_RETRY_ATTEMPTS']),
+        'retry_on_timeout': config['REDIS_RETRY_ATTEMPTS'] > 0
+    }
+    if config['REDIS_POOL_BLOCKING']:
+        pool = redis.BlockingConnectionPool.from_url(config['REDIS_URL'], timeout=config['REDIS_POOL_TIMEOUT'],
+                                                     **options)
+    else:
+        pool = redis.ConnectionPool.from_url(config['REDIS_URL'], **options)
+
+    breaker = CircuitBreaker(config['REDIS_BREAKER_FAILURE_THRESHOLD'], config['REDIS_BREAKER_RESET_TIMEOUT'])
+    return CircuitBreakerRedis(connection_pool=pool, breaker=breaker)
+
+
+def pool_stats(redis_client):
+    """Заполненность пула соединений и состояние автомата для /metrics/redis"""
+    pool = redis_client.connection_pool
+    if isinstance(pool, redis.BlockingConnectionPool):
+        created = len(pool._connections)
+        idle = sum(1 for connection in list(pool.pool.queue) if connection is not None)
+    else:
+        created = getattr(pool, '_created_connections', 0)
+        idle = len(getattr(pool, '_available_connections', []))
+    max_connections = pool.max_connections
+    in_use = created - idle
+
+    stats = {
+        'pool': {
+            'class': type(pool).__name__,
+            'max_connections': max_connections,
+            'created': created,
+            'in_use': in_use,
+            'idle': idle,
+            'utilization': round(in_use / max_connections, 3) if max_connections else None
+        }
+    }
+    breaker = getattr(redis_client, 'breaker', None)
+    if breaker is not None:
+        stats['circuit_breaker'] = breaker.snapshot()
+    return stats
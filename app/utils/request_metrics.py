@@ -0,0 +1,214 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+import redis
+from flask import g, has_request_context, request
+from app import logger
+
+# Имя метрики -> (тип, описание) для строк # HELP / # TYPE
+METRICS = {
+    'flower_shop_http_requests_total': ('counter', 'HTTP requests by endpoint, method and status'),
+    'flower_shop_http_request_duration_seconds': ('histogram', 'HTTP request latency'),
+    'flower_shop_http_response_size_bytes': ('histogram', 'HTTP response body size'),
+    'flower_shop_db_queries_total': ('counter', 'SQL statements executed while serving requests'),
+    'flower_shop_db_time_seconds_total': ('counter', 'Time spent in SQL statements while serving requests'),
+    'flower_shop_redis_time_seconds_total': ('counter', 'Time spent in Redis commands while serving requests'),
+    'flower_shop_cache_requests_total': ('counter', 'Cache lookups by key family, tier and result'),
+}
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _bucket_label(bound):
+    return '+Inf' if math.isinf(bound) else repr(float(bound))
+
+
+class MetricsRegistry:
+    """
+    Метрики процесса в памяти: на горячем пути только сложение в словаре под
+    блокировкой. Фоновый поток периодически переносит накопленные приращения
+    в общий хэш Redis (HINCRBYFLOAT одним пайплайном), где они суммируются по воркерам.
+    """
+
+    def __init__(self, latency_buckets):
+        self.latency_buckets = tuple(latency_buckets) + (math.inf,)
+        self.size_buckets = SIZE_BUCKETS + (math.inf,)
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, name, labels, amount=1.0):
+        with self._lock:
+            self._values[(name, labels)] += amount
+
+    def _observe(self, name, labels, value, buckets):
+        # Вызывается под блокировкой; бакеты кумулятивные, как в формате Prometheus
+        for bound in buckets:
+            if value <= bound:
+                self._values[(f"{name}_bucket", labels + (('le', _bucket_label(bound)),))] += 1
+        self._values[(f"{name}_sum", labels)] += value
+        self._values[(f"{name}_count", labels)] += 1
+
+    def record_request(self, endpoint, method, status, seconds, size, db_queries, db_seconds, redis_seconds):
+        labels = (('endpoint', endpoint), ('method', method))
+        with self._lock:
+            self._values[('flower_shop_http_requests_total', labels + (('status', str(status)),))] += 1
+            self._observe('flower_shop_http_request_duration_seconds', labels, seconds, self.latency_buckets)
+            if size is not None:
+                self._observe('flower_shop_http_response_size_bytes', labels, size, self.size_buckets)
+            self._values[('flower_shop_db_queries_total', labels)] += db_queries
+            self._values[('flower_shop_db_time_seconds_total', labels)] += db_seconds
+            self._values[('flower_shop_redis_time_seconds_total', labels)] += redis_seconds
+
+    def record_cache(self, family, tier, hit):
+        labels = (('family', family), ('tier', tier), ('result', 'hit' if hit else 'miss'))
+        self.inc('flower_shop_cache_requests_total', labels)
+
+    def drain(self):
+        """Забирает накопленные приращения (для отправки в Redis)"""
+        with self._lock:
+            values, self._values = self._values, defaultdict(float)
+        return values
+
+    def merge(self, values):
+        """Возвращает приращения, которые не удалось отправить"""
+        with self._lock:
+            for key, value in values.items():
+                self._values[key] += value
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+
+def _field(key):
+    name, labels = key
+    return json.dumps([name, [list(label) for label in labels]], separators=(',', ':'))
+
+
+def _parse_field(field):
+    name, labels = json.loads(field)
+    return name, tuple(tuple(label) for label in labels)
+
+
+def flush_metrics(registry, redis_client, key):
+    """Отправляет приращения процесса в общий хэш Redis одним round trip"""
+    values = registry.drain()
+    if not values:
+        return
+    pipe = redis_client.pipeline(transaction=False)
+    for series, value in values.items():
+        pipe.hincrbyfloat(key, _field(series), value)
+    try:
+        pipe.execute()
+    except redis.RedisError as e:
+        registry.merge(values)
+        logger.warning("Failed to flush request metrics: %s", e)
+
+
+def read_metrics(redis_client, key):
+    """Суммарные значения всех воркеров из Redis"""
+    return {_parse_field(field): float(value) for field, value in redis_client.hgetall(key).items()}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    return repr(int(value)) if float(value).is_integer() else repr(value)
+
+
+def _sort_key(item):
+    (name, labels), _ = item
+    plain = tuple(label for label in labels if label[0] != 'le')
+    le = next((float(v) for k, v in labels if k == 'le'), 0.0)
+    return name.rsplit('_', 1)[0] if name.endswith(('_bucket', '_sum', '_count')) else name, plain, name, le
+
+
+def render_prometheus(values):
+    """Текстовый формат экспозиции Prometheus 0.0.4"""
+    lines, described = [], set()
+    for (name, labels), value in sorted(values.items(), key=_sort_key):
+        base = name
+        for suffix in ('_bucket', '_sum', '_count'):
+            if name.endswith(suffix) and name[:-len(suffix)] in METRICS:
+                base = name[:-len(suffix)]
+        if base not in described and base in METRICS:
+            metric_type, help_text = METRICS[base]
+            lines.append(f"# HELP {base} {help_text}")
+            lines.append(f"# TYPE {base} {metric_type}")
+            described.add(base)
+        label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels)
+        lines.append(f"{name}{{{label_text}}} {_format_value(value)}" if labels else f"{name} {_format_value(value)}")
+    return '\n'.join(lines) + '\n'
+
+
+def current_registry():
+    from flask import current_app
+    return current_app.extensions.get('request_metrics')
+
+
+def add_redis_time(seconds):
+    """Время команды Redis в счёт текущего HTTP-запроса (вызывается клиентом Redis)"""
+    if has_request_context():
+        g.redis_seconds = g.get('redis_seconds', 0.0) + seconds
+
+
+def record_cache(key, tier, hit):
+    """Попадание/промах кэша; семейство — префикс ключа до первого двоеточия"""
+    registry = current_registry()
+    if registry is not None:
+        registry.record_cache(key.split(':', 1)[0], tier, hit)
+
+
+def _ensure_flusher(app, registry):
+    """Фоновый поток отправки метрик, по одному на процесс (запускается после fork)"""
+    if app.extensions.get('request_metrics_flusher_pid') == os.getpid():
+        return
+    with app.extensions['request_metrics_lock']:
+        if app.extensions.get('request_metrics_flusher_pid') == os.getpid():
+            return
+
+        def run():
+            while True:
+                time.sleep(app.config['METRICS_FLUSH_INTERVAL'])
+                flush_metrics(registry, app.redis_client, app.config['METRICS_REDIS_KEY'])
+
+        threading.Thread(target=run, name='request-metrics-flusher', daemon=True).start()
+        app.extensions['request_metrics_flusher_pid'] = os.getpid()
+
+
+def init_request_metrics(app):
+    """Middleware: задержка, размер ответа, время в БД и Redis на каждый запрос"""
+    if not app.config['METRICS_ENABLED']:
+        return
+    registry = MetricsRegistry(app.config['METRICS_LATENCY_BUCKETS'])
+    app.extensions['request_metrics'] = registry
+    app.extensions['request_metrics_lock'] = threading.Lock()
+
+    @app.before_request
+    def start_request_timer():
+        _ensure_flusher(app, registry)
+        g.request_started = time.perf_counter()
+        g.redis_seconds = 0.0
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.get('request_started')
+        if started is None:
+            return response
+        query_stats = g.get('query_stats')
+        registry.record_request(
+            endpoint=request.url_rule.rule if request.url_rule is not None else 'unmatched',
+            method=request.method,
+            status=response.status_code,
+            seconds=time.perf_counter() - started,
+            # У потоковых ответов размер заранее неизвестен
+            size=None if response.is_streamed else response.calculate_content_length(),
+            db_queries=query_stats.count if query_stats else 0,
+            db_seconds=query_stats.total_ms / 1000 if query_stats else 0.0,
+            redis_seconds=g.get('redis_seconds', 0.0)
+        )
+        return response
@@ -0,0 +1,106 @@
+import random
+from collections import defaultdict
+from flask import current_app
+from sqlalchemy import Date, cast, delete, func, insert, literal, select, true, update
+from app import db, logger
+from app.models import ClientSales, DailySales, Order, ProductSales
+from app.utils.db import on_conflict_insert
+
+COUNTERS = ('orders', 'items', 'revenue')
+
+
+def _aggregates():
+    """
+    Агрегат -> столбцы ключа и функция, извлекающая ключ из строки заказа.
+    Строки продукта и клиента блокируются вместе со строками, которые заказ и так
+    меняет (остаток продукта, заказы клиента), а общий для всех заказов счётчик дня
+    разбит на SALES_DAILY_SHARDS строк: транзакция берёт случайную, отчёт их суммирует.
+    """
+    shard = random.randrange(current_app.config['SALES_DAILY_SHARDS'])
+    return (
+        (ProductSales, ('product_id',), lambda row: (row['product_id'],)),
+        (ClientSales, ('client_id',), lambda row: (row['client_id'],)),
+        (DailySales, ('day', 'shard'), lambda row: (row['created_at'].date(), shard) if row['created_at'] else None),
+    )
+
+
+def _increments(rows, key_func, sign):
+    totals = defaultdict(lambda: {'orders': 0, 'items': 0, 'revenue': 0.0})
+    for row in rows:
+        key = key_func(row)
+        if key is None:
+            continue
+        total = totals[key]
+        total['orders'] += sign
+        total['items'] += sign * row['quantity']
+        total['revenue'] += sign * row['total_price']
+    # Ключи по возрастанию: параллельные транзакции блокируют строки в одном порядке, без deadlock
+    return [(key, total) for key, total in sorted(totals.items())]
+
+
+def _apply(model, key_names, increments):
+    params = [dict(zip(key_names, key), **total) for key, total in increments]
+    dialect_insert = on_conflict_insert()
+    if dialect_insert is not None:
+        stmt = dialect_insert(model)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[getattr(model, name) for name in key_names],
+            set_={field: getattr(model, field) + stmt.excluded[field] for field in COUNTERS}
+        )
+        db.session.execute(stmt, params)
+        return
+    # Запасной вариант без ON CONFLICT: UPDATE, а для новых ключей INSERT
+    for item in params:
+        result = db.session.execute(
+            update(model).where(*(getattr(model, name) == item[name] for name in key_names))
+            .values({field: getattr(model, field) + item[field] for field in COUNTERS})
+        )
+        if result.rowcount == 0:
+            db.session.execute(insert(model).values(item))
+
+
+def record_sales(rows, sign=1):
+    """
+    Обновляет агрегаты продаж в текущей транзакции: по продукту, клиенту и дню.
+    rows — строки заказов (client_id, product_id, quantity, total_price, created_at);
+    sign = -1 при удалении заказов. Каждая таблица — один INSERT ... ON CONFLICT
+    DO UPDATE на все ключи пакета, поэтому стоимость не зависит от объёма истории.
+    """
+    if not rows:
+        return
+    for model, key_names, key_func in _aggregates():
+        increments = _increments(rows, key_func, sign)
+        if increments:
+            _apply(model, key_names, increments)
+
+
+def rebuild_sales():
+    """
+    Полный пересчёт агрегатов по таблице заказов: для данных, загруженных в обход
+    обработчиков (flask seed, миграции), и для проверки расхождений. Выполняется
+    в одной транзакции, поэтому отчёты не видят наполовину пересчитанные таблицы.
+    Итог дня пишется в шард 0.
+    """
+    day = cast(Order.created_at, Date) if db.session.get_bind().dialect.name != 'sqlite' \
+        else func.date(Order.created_at)
+    sources = (
+        (ProductSales, {'product_id': Order.product_id}, Order.product_id),
+        (ClientSales, {'client_id': Order.client_id}, Order.client_id),
+        (DailySales, {'day': day, 'shard': literal(0)}, day),
+    )
+    # Заказы без даты (созданные до появления created_at) в дневные продажи не попадают
+    day_known = {DailySales: Order.created_at.isnot(None)}
+    counts = {}
+    for model, keys, group_expr in sources:
+        db.session.execute(delete(model))
+        query = select(
+            *(expr.label(name) for name, expr in keys.items()),
+            func.count(Order.id).label('orders'),
+            func.sum(Order.quantity).label('items'),
+            func.sum(Order.total_price).label('revenue')
+        ).where(day_known.get(model, true())).group_by(group_expr)
+        db.session.execute(insert(model).from_select([*keys, *COUNTERS], query))
+        counts[model.__tablename__] = db.session.query(model).count()
+    db.session.commit()
+    logger.info("Sales aggregates rebuilt: %s", counts)
+    return counts
@@ -0,0 +1,137 @@
+import csv
+import io
+import itertools
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import insert, select, text
+from app import db, logger
+from app.models import Client, ClientSales, DailySales, Order, Product, ProductSales, RoleEnum
+from app.utils.cache import invalidate_collection
+from app.utils.passwords import hash_password
+from app.utils.sales import rebuild_sales
+
+# Распределение количества в строке заказа: чаще всего берут один букет
+QUANTITIES = (1, 2, 3, 4, 5)
+QUANTITY_WEIGHTS = (60, 20, 10, 6, 4)
+
+
+class ZipfSampler:
+    """
+    Выбор значений с вероятностью 1/rank^s. Ранги назначаются значениям в случайном
+    порядке, чтобы популярные продукты и клиенты не совпадали с первыми id.
+    """
+
+    def __init__(self, values, s, rng):
+        self.values = list(values)
+        rng.shuffle(self.values)
+        self.cum_weights = list(itertools.accumulate(1 / rank ** s for rank in range(1, len(self.values) + 1)))
+        self.rng = rng
+
+    def sample(self, k):
+        return self.rng.choices(self.values, cum_weights=self.cum_weights, k=k)
+
+
+def _copy_rows(table, columns, rows):
+    """COPY ... FROM STDIN (PostgreSQL + psycopg2): на порядок быстрее INSERT"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    preparer = db.engine.dialect.identifier_preparer
+    statement = (f"COPY {preparer.quote(table.name)} ({', '.join(preparer.quote(c) for c in columns)}) "
+                 f"FROM STDIN WITH (FORMAT csv)")
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(statement, buffer)
+    finally:
+        cursor.close()
+
+
+def bulk_insert(table, columns, rows):
+    """
+    Вставка пачки строк (кортежей в порядке columns) одной командой: COPY на PostgreSQL,
+    executemany для остальных СУБД. ORM-объекты не создаются.
+    """
+    if db.engine.dialect.name == 'postgresql' and db.engine.dialect.driver == 'psycopg2':
+        _copy_rows(table, columns, rows)
+    else:
+        db.session.execute(insert(table), [dict(zip(columns, row)) for row in rows])
+    db.session.commit()
+
+
+def _batches(total, batch_size):
+    for start in range(0, total, batch_size):
+        yield start, min(batch_size, total - start)
+
+
+def seed_database(clients, products, orders, batch_size, zipf_s=1.1, days=365, seed=None,
+                  password='password', redis_client=None, progress=None):
+    """
+    Синтетические данные для нагрузочных тестов: клиенты, продукты и заказы с популярностью
+    по закону Ципфа (немного продуктов и клиентов дают большую часть заказов) и датами
+    за последние days дней. Пишет пачками по batch_size строк с commit после каждой пачки.
+    """
+    rng = random.Random(seed)
+    # Метка не зависит от seed: повторный запуск с тем же seed не повторит email и sku
+    tag = uuid.uuid4().hex[:8]
+    started = time.monotonic()
+    report = {'clients': clients, 'products': products, 'orders': orders}
+
+    def step(name, done, total):
+        if progress is not None:
+            progress(name, done, total, time.monotonic() - started)
+
+    # Один хэш на всех: считать миллионы хэшей pbkdf2 бессмысленно и долго
+    password_hash = hash_password(password)
+    now = datetime.utcnow()
+    for start, size in _batches(clients, batch_size):
+        bulk_insert(Client.__table__, ('name', 'email', 'password', 'role', 'created_at'), [
+            (f"Client {i}", f"seed-{tag}-{i}@example.com", password_hash, RoleEnum.CLIENT.name,
+             now - timedelta(days=rng.random() * days))
+            for i in range(start, start + size)
+        ])
+        step('clients', start + size, clients)
+
+    for start, size in _batches(products, batch_size):
+        bulk_insert(Product.__table__, ('sku', 'name', 'description', 'price', 'stock', 'created_at'), [
+            (f"SEED-{tag}-{i}", f"Bouquet {i}", None, round(rng.uniform(5, 150), 2), 10 ** 6, now)
+            for i in range(start, start + size)
+        ])
+        step('products', start + size, products)
+
+    client_ids = db.session.scalars(select(Client.id).where(Client.email.like(f"seed-{tag}-%"))).all()
+    product_rows = db.session.execute(select(Product.id, Product.price).where(Product.sku.like(f"SEED-{tag}-%"))).all()
+    if orders and (not client_ids or not product_rows):
+        raise ValueError('Orders need at least one client and one product')
+
+    client_sampler = ZipfSampler(client_ids, zipf_s, rng)
+    product_sampler = ZipfSampler(product_rows, zipf_s, rng)
+    span = days * 86400
+    for start, size in _batches(orders, batch_size):
+        quantities = rng.choices(QUANTITIES, weights=QUANTITY_WEIGHTS, k=size)
+        bulk_insert(Order.__table__, ('client_id', 'product_id', 'quantity', 'total_price', 'created_at'), [
+            (client_id, product_id, quantity, round(price * quantity, 2), now - timedelta(seconds=rng.random() * span))
+            for client_id, (product_id, price), quantity
+            in zip(client_sampler.sample(size), product_sampler.sample(size), quantities)
+        ])
+        step('orders', start + size, orders)
+
+    # Заказы вставлены в обход обработчиков — агрегаты для отчётов пересчитываются целиком
+    rebuild_sales()
+
+    if db.engine.dialect.name == 'postgresql':
+        # Свежая статистика, иначе планировщик строит планы по пустым таблицам
+        preparer = db.engine.dialect.identifier_preparer
+        tables = ', '.join(preparer.quote(model.__table__.name) for model in (Client, Product, Order, ProductSales, ClientSales, DailySales))
+        db.session.execute(text(f'ANALYZE {tables}'))
+        db.session.commit()
+
+    if redis_client is not None:
+        invalidate_collection(redis_client, 'products_list', 'orders', 'clients')
+
+    seconds = time.monotonic() - started
+    report['seconds'] = round(seconds, 3)
+    report['rows_per_second'] = round((clients + products + orders) / seconds) if seconds else 0
+    logger.info("Seeded %s clients, %s products, %s orders in %.1fs.", clients, products, orders, seconds)
+    return report
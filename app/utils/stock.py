@@ -0,0 +1,48 @@
+from sqlalchemy import case, update
+from app import db
+from app.models import Product
+
+
+def reserve_stock(product_id, quantity):
+    """
+    Атомарное списание остатка одним запросом:
+    UPDATE product SET stock = stock - :q WHERE id = :id AND stock >= :q RETURNING price.
+    Проверка и списание происходят в БД, поэтому параллельные заказы не могут продать
+    больше, чем есть на складе, и не требуют предварительного SELECT ... FOR UPDATE.
+    Возвращает цену продукта или None, если продукта нет или остатка не хватает.
+    Транзакцию фиксирует вызывающий код.
+    """
+    return db.session.execute(
+        update(Product)
+        .where(Product.id == product_id, Product.stock >= quantity)
+        .values(stock=Product.stock - quantity)
+        .returning(Product.price)
+    ).scalar()
+
+
+def release_stock(product_id, quantity):
+    """Атомарный возврат остатка на склад (без чтения текущего значения в Python)"""
+    db.session.execute(
+        update(Product)
+        .where(Product.id == product_id)
+        .values(stock=Product.stock + quantity)
+    )
+
+
+def reserve_stock_batch(quantities):
+    """
+    Списание остатков сразу для нескольких продуктов одним UPDATE:
+    stock = stock - CASE id WHEN ... END WHERE id IN (...) AND stock >= CASE ...
+    quantities — словарь product_id -> суммарное количество.
+    Возвращает словарь product_id -> price для списанных продуктов; если их меньше,
+    чем запрошено, вызывающий код должен откатить транзакцию.
+    """
+    quantity = case(quantities, value=Product.id)
+    rows = db.session.execute(
+        update(Product)
+        .where(Product.id.in_(list(quantities)), Product.stock >= quantity)
+        .values(stock=Product.stock - quantity)
+        .returning(Product.id, Product.price)
+        .execution_options(synchronize_session=False)
+    ).all()
+    return {product_id: price for product_id, price in rows}
@@ -0,0 +1,50 @@
+"""
+Общая обвязка для бенчмарков.
+
+По умолчанию бенчмарки работают с локальной SQLite-базой и fakeredis, чтобы их можно
+было запустить без инфраструктуры. Для замеров на PostgreSQL/Redis задайте
+BENCH_DATABASE_URL и BENCH_REDIS_URL.
+"""
+import os
+import statistics
+import time
+
+os.environ.setdefault('DATABASE_URL', os.getenv('BENCH_DATABASE_URL', 'sqlite:////tmp/flower_shop_bench.db'))
+
+from fakeredis import FakeRedis
+from flask_jwt_extended import create_access_token
+import redis
+
+from app import create_app, db
+from app.models import Client, RoleEnum
+
+
+def make_app():
+    """Приложение с пустой схемой и клиентом Redis для замеров"""
+    app = create_app()
+    bench_redis_url = os.getenv('BENCH_REDIS_URL')
+    app.redis_client = redis.StrictRedis.from_url(bench_redis_url) if bench_redis_url else FakeRedis()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+def admin_headers():
+    """Заголовки с токеном администратора (вызывать внутри app_context)"""
+    admin = Client(name="Bench Admin", email="bench-admin@example.com", password="x", role=RoleEnum.ADMIN)
+    db.session.add(admin)
+    db.session.commit()
+    token = create_access_token(identity=str(admin.id))
+    return {"Authorization": f"Bearer {token}"}
+
+
+def measure(fn, repeat=20):
+    """Медиана и p95 времени выполнения fn в миллисекундах"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
@@ -0,0 +1,63 @@
+"""
+Стоимость проверки прав администратора на один запрос: старый путь
+(Client.query.get по identity) против роли из claim JWT и локального кэша.
+
+Запуск: python -m benchmarks.bench_admin_check [число повторов]
+"""
+import sys
+
+from benchmarks._common import make_app, measure
+from flask_jwt_extended import create_access_token, get_jwt_identity, verify_jwt_in_request
+from sqlalchemy import event
+
+from app import db
+from app.models import Client, RoleEnum
+from app.utils.auth import admin_required
+
+
+def legacy_admin_check():
+    """Прежняя реализация admin_required: загрузка клиента через ORM"""
+    client = db.session.get(Client, int(get_jwt_identity()))
+    return client is not None and client.role == RoleEnum.ADMIN
+
+
+@admin_required
+def protected():
+    return 'ok'
+
+
+def main(repeat):
+    app = make_app()
+    queries = []
+    with app.app_context():
+        admin = Client(name="Bench Admin", email="bench-admin@example.com", password="x", role=RoleEnum.ADMIN)
+        db.session.add(admin)
+        db.session.commit()
+        token = create_access_token(identity=str(admin.id), additional_claims={'role': admin.role.value})
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: queries.append(args[2]))
+
+    headers = {"Authorization": f"Bearer {token}"}
+    results = {}
+    for name, check in (('Client.query.get', legacy_admin_check), ('claim + local cache', protected)):
+        with app.test_request_context('/', headers=headers):
+            verify_jwt_in_request()
+            check()  # прогрев: соединение с БД, локальный кэш роли
+            queries.clear()
+
+            def run():
+                # Сессия сбрасывается между запросами, как в реальном приложении
+                check()
+                db.session.remove()
+
+            median, p95 = measure(run, repeat=repeat)
+            results[name] = (median, p95, len(queries) / repeat)
+
+    print(f"{'path':<22} {'median, ms':>12} {'p95, ms':>10} {'queries/req':>12}")
+    for name, (median, p95, per_request) in results.items():
+        print(f"{name:<22} {median:>12.3f} {p95:>10.3f} {per_request:>12.1f}")
+    old, new = results['Client.query.get'][0], results['claim + local cache'][0]
+    print(f"speedup: {old / new:.1f}x")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
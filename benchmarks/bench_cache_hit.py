@@ -0,0 +1,46 @@
+"""
+Стоимость попадания в кэш списка продуктов: старый путь (json.loads + jsonify)
+против отдачи готового тела из кэша.
+
+Запуск: python -m benchmarks.bench_cache_hit [число продуктов]
+"""
+import json
+import sys
+
+from benchmarks._common import make_app, measure
+from flask import jsonify
+
+from app.utils.cache import cached_json_response
+
+
+def main(count):
+    app = make_app()
+    redis_client = app.redis_client
+    payload = [
+        {'id': i, 'name': f"Bouquet {i}", 'description': "Fresh flowers", 'price': 10.0 + i % 50, 'stock': 100}
+        for i in range(count)
+    ]
+
+    with app.test_request_context('/products/'):
+        # Старый формат: строка JSON под ключом, которую нужно распарсить и сериализовать заново
+        redis_client.set('bench_old', json.dumps(payload))
+        cached_json_response(redis_client, 'bench_new', lambda: payload, ttl=300)
+
+        def old_hit():
+            jsonify(json.loads(redis_client.get('bench_old'))).get_data()
+
+        def new_hit():
+            cached_json_response(redis_client, 'bench_new', lambda: payload, ttl=300).get_data()
+
+        old_median, old_p95 = measure(old_hit, repeat=200)
+        new_median, new_p95 = measure(new_hit, repeat=200)
+
+    print(f"products: {count}")
+    print(f"{'path':<28} {'median, ms':>12} {'p95, ms':>10}")
+    print(f"{'json.loads + jsonify':<28} {old_median:>12.3f} {old_p95:>10.3f}")
+    print(f"{'pre-encoded bytes':<28} {new_median:>12.3f} {new_p95:>10.3f}")
+    print(f"speedup: {old_median / new_median:.1f}x")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
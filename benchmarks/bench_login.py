@@ -0,0 +1,86 @@
+"""
+Пропускная способность входа под нагрузкой и задержка соседнего лёгкого эндпоинта:
+хэширование в потоке запроса (PASSWORD_HASH_WORKERS=0) против пула процессов.
+
+Запуск: python -m benchmarks.bench_login [число потоков] [входов на поток]
+"""
+import os
+import statistics
+import sys
+import threading
+import time
+
+from benchmarks._common import make_app, admin_headers
+
+from app import db
+from app.models import Client
+from app.utils.passwords import hash_password
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def run(app, headers, threads, logins_per_thread):
+    """Потоки входят в систему, параллельно один поток опрашивает лёгкий эндпоинт"""
+    login_samples, probe_samples = [], []
+    done = threading.Event()
+
+    def login_worker(index):
+        client = app.test_client()
+        body = {"email": f"user{index}@example.com", "password": "password123"}
+        for _ in range(logins_per_thread):
+            start = time.perf_counter()
+            response = client.post('/auth/login', json=body)
+            login_samples.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, response.json
+
+    def probe_worker():
+        client = app.test_client()
+        while not done.is_set():
+            start = time.perf_counter()
+            client.get('/metrics/cache', headers=headers)
+            probe_samples.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.005)
+
+    probe = threading.Thread(target=probe_worker)
+    workers = [threading.Thread(target=login_worker, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    probe.start()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    probe.join()
+    return len(login_samples) / elapsed, login_samples, probe_samples
+
+
+def main(threads, logins_per_thread):
+    app = make_app()
+    with app.app_context():
+        app.config['PASSWORD_HASH_WORKERS'] = 0
+        password = hash_password("password123")
+        db.session.add_all([
+            Client(name=f"User {i}", email=f"user{i}@example.com", password=password) for i in range(threads)
+        ])
+        db.session.commit()
+        headers = admin_headers()
+
+    print(f"threads: {threads}, logins per thread: {logins_per_thread}, cpus: {os.cpu_count()}, "
+          f"method: {app.config['PASSWORD_HASH_METHOD']}")
+    print(f"{'hashing':<16} {'logins/s':>9} {'login p50':>10} {'login p99':>10} {'probe p50':>10} {'probe p99':>10}")
+    for name, workers in (('inline', 0), ('process pool', os.cpu_count() or 1)):
+        app.config['PASSWORD_HASH_WORKERS'] = workers
+        with app.app_context():
+            hash_password("warm-up")  # запуск процессов пула не входит в замер
+        throughput, logins, probes = run(app, headers, threads, logins_per_thread)
+        print(f"{name:<16} {throughput:>9.1f} {statistics.median(logins):>10.1f} {percentile(logins, 0.99):>10.1f} "
+              f"{statistics.median(probes):>10.1f} {percentile(probes, 0.99):>10.1f}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 8,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 5)
@@ -0,0 +1,50 @@
+"""
+Пропускная способность оформления заказов: N запросов POST /orders/ против
+одного POST /orders/batch с N строками.
+
+Запуск: python -m benchmarks.bench_orders [строк в корзине] [повторов]
+"""
+import sys
+import time
+
+from benchmarks._common import make_app, admin_headers
+from sqlalchemy import insert
+
+from app import db
+from app.models import Client, Product
+
+
+def main(lines, repeat):
+    app = make_app()
+    with app.app_context():
+        headers = admin_headers()
+        client_id = db.session.query(Client.id).scalar()
+        db.session.execute(insert(Product), [
+            {'name': f"Bouquet {i}", 'price': 10.0, 'stock': 10 ** 9} for i in range(lines)
+        ])
+        db.session.commit()
+        product_ids = [product_id for (product_id,) in db.session.query(Product.id)]
+
+        with app.test_client() as client:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                for product_id in product_ids:
+                    client.post('/orders/', headers=headers,
+                                json={'client_id': client_id, 'product_id': product_id, 'quantity': 1})
+            single = repeat * lines / (time.perf_counter() - start)
+
+            items = [{'product_id': product_id, 'quantity': 1} for product_id in product_ids]
+            start = time.perf_counter()
+            for _ in range(repeat):
+                client.post('/orders/batch', headers=headers, json={'client_id': client_id, 'items': items})
+            batch = repeat * lines / (time.perf_counter() - start)
+
+    print(f"lines per basket: {lines}, baskets: {repeat}")
+    print(f"{'endpoint':<20} {'order lines/s':>14}")
+    print(f"{'POST /orders/':<20} {single:>14.0f}")
+    print(f"{'POST /orders/batch':<20} {batch:>14.0f}")
+    print(f"speedup: {batch / single:.1f}x")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10, int(sys.argv[2]) if len(sys.argv) > 2 else 20)
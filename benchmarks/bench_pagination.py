@@ -0,0 +1,61 @@
+"""
+Латентность GET /products/ без кэша: полный список против курсорной страницы.
+
+Запуск: python -m benchmarks.bench_pagination [размеры таблицы...]
+
+Ожидаемый результат: время полной выдачи растёт линейно с размером таблицы,
+а время первой и «глубокой» страницы остаётся практически постоянным.
+"""
+import sys
+
+from benchmarks._common import make_app, admin_headers, measure
+from sqlalchemy import insert
+
+from app import db
+from app.models import Product
+from app.utils.pagination import encode_cursor
+
+PAGE_LIMIT = 50
+
+
+def seed_products(count):
+    rows = [
+        {'name': f"Bouquet {i}", 'description': "Bench", 'price': 10.0 + i % 50, 'stock': 100}
+        for i in range(count)
+    ]
+    for start in range(0, count, 10000):
+        db.session.execute(insert(Product), rows[start:start + 10000])
+    db.session.commit()
+
+
+def main(sizes):
+    print(f"{'rows':>10} {'full list, ms':>16} {'first page, ms':>16} {'deep page, ms':>16}")
+    for size in sizes:
+        app = make_app()
+        with app.app_context():
+            headers = admin_headers()
+            seed_products(size)
+            with app.test_client() as client:
+                # Курсор на середину таблицы: keyset не платит за «пропущенные» строки
+                deep_cursor = encode_cursor({'id': size // 2})
+
+                def full():
+                    app.redis_client.flushall()
+                    client.get('/products/', headers=headers)
+
+                def first_page():
+                    app.redis_client.flushall()
+                    client.get(f'/products/?limit={PAGE_LIMIT}', headers=headers)
+
+                def deep_page():
+                    app.redis_client.flushall()
+                    client.get(f'/products/?limit={PAGE_LIMIT}&cursor={deep_cursor}', headers=headers)
+
+                full_ms = measure(full, repeat=5)[0]
+                first_ms = measure(first_page)[0]
+                deep_ms = measure(deep_page)[0]
+            print(f"{size:>10} {full_ms:>16.2f} {first_ms:>16.2f} {deep_ms:>16.2f}")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000])
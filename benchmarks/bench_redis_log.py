@@ -0,0 +1,53 @@
+"""
+Доставка логов в Redis: прежний log_to_redis (LPUSH + LTRIM на каждое сообщение
+в потоке запроса) против очереди с фоновой отправкой пачками одним пайплайном.
+
+Запуск: python -m benchmarks.bench_redis_log [число сообщений]
+"""
+import sys
+import time
+
+from benchmarks._common import make_app
+
+from app.utils.logger import log_to_redis
+
+
+def legacy_log_to_redis(redis_client, level, message):
+    """Прежняя реализация: два синхронных round trip на сообщение"""
+    log_message = f"{level.upper()} - {message}"
+    log_key = f"log:{level}"
+    redis_client.lpush(log_key, log_message)
+    redis_client.ltrim(log_key, 0, 99)
+
+
+def main(count):
+    app = make_app()
+    redis_client = app.redis_client
+    app.config['LOG_REDIS_QUEUE_SIZE'] = count  # замеряем отправку, а не прореживание
+
+    with app.test_request_context():
+        started = time.perf_counter()
+        for i in range(count):
+            legacy_log_to_redis(redis_client, 'info', f"legacy message {i}")
+        legacy_seconds = time.perf_counter() - started
+
+        log_to_redis('info', "warm-up")  # запуск фонового потока не входит в замер
+        started = time.perf_counter()
+        for i in range(count):
+            log_to_redis('info', f"queued message {i}")
+        enqueue_seconds = time.perf_counter() - started
+        last_message = f"INFO - queued message {count - 1}".encode()
+        while redis_client.lindex('log:info', 0) != last_message:
+            time.sleep(0.001)
+        delivered_seconds = time.perf_counter() - started
+
+    print(f"messages: {count}")
+    print(f"{'path':<34} {'total, s':>9} {'msgs/s':>10} {'us/msg on caller':>17}")
+    print(f"{'LPUSH + LTRIM per message':<34} {legacy_seconds:>9.3f} {count / legacy_seconds:>10.0f} "
+          f"{legacy_seconds / count * 1e6:>17.1f}")
+    print(f"{'queue + batched pipeline':<34} {delivered_seconds:>9.3f} {count / delivered_seconds:>10.0f} "
+          f"{enqueue_seconds / count * 1e6:>17.1f}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
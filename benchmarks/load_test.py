@@ -0,0 +1,356 @@
+"""
+Нагрузочный прогон всех маршрутов auth, products, orders и clients.
+
+Заполняет базу N клиентами, продуктами и заказами (фиксированный seed), затем для
+каждого сценария отправляет заданное число запросов из нескольких потоков через
+test_client и печатает req/s и p50/p95/p99. Результаты можно сохранить как базовые
+(--save-baseline) и сравнивать с ними: ухудшение p50/p95 или req/s больше допуска,
+а также новые ошибки дают код выхода 1, поэтому прогон можно ставить в CI.
+
+Базовые значения зависят от машины и окружения: перезаписывайте их на той же машине,
+где выполняется сравнение. Окружение задаётся так же, как у остальных бенчмарков
+(BENCH_DATABASE_URL, BENCH_REDIS_URL).
+
+Базовые значения сохраняются только при прогоне без ошибок.
+
+Запуск: python -m benchmarks.load_test [--workers 8] [--requests 200] [--save-baseline]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Лог каждого запроса в консоль искажает замеры; уровень можно переопределить через LOG_LEVEL
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+from benchmarks._common import make_app, admin_headers
+from sqlalchemy import insert
+
+from app import db
+from app.models import Client, Order, Product
+from app.utils.passwords import hash_password
+
+DEFAULT_BASELINE = Path(__file__).with_name('baselines.json')
+BENCH_PASSWORD = 'bench-password'
+
+
+class Scenario:
+    """Один маршрут под нагрузкой: метод, построение запроса и ожидаемые коды ответа"""
+
+    def __init__(self, name, method, build, expected=(200,), weight=1.0):
+        self.name = name
+        self.method = method
+        self.build = build  # (rng, state) -> (path, kwargs для test_client.open)
+        self.expected = expected
+        self.weight = weight  # доля от --requests (дорогим маршрутам меньше запросов)
+
+
+def seed(app, clients, products, orders, rng):
+    """Детерминированное заполнение базы; возвращает общее состояние сценариев"""
+    with app.app_context():
+        headers = admin_headers()
+        password = hash_password(BENCH_PASSWORD)
+        db.session.execute(insert(Client), [
+            {'name': f"Client {i}", 'email': f"client{i}@example.com", 'password': password}
+            for i in range(clients)
+        ])
+        db.session.execute(insert(Product), [
+            {'sku': f"SKU-{i}", 'name': f"Bouquet {i}", 'price': round(rng.uniform(5, 100), 2), 'stock': 10 ** 9}
+            for i in range(products)
+        ])
+        client_ids = [client_id for (client_id,) in db.session.query(Client.id)]
+        product_ids = [product_id for (product_id,) in db.session.query(Product.id)]
+        now = datetime.utcnow()
+        db.session.execute(insert(Order), [
+            {'client_id': rng.choice(client_ids), 'product_id': rng.choice(product_ids),
+             'quantity': 1, 'total_price': 10.0, 'created_at': now - timedelta(minutes=i)}
+            for i in range(orders)
+        ])
+        db.session.commit()
+
+    return {
+        'headers': headers,
+        'client_ids': client_ids,
+        'product_ids': product_ids,
+        # Объекты, созданные сценариями create и удаляемые сценариями delete
+        'created_products': [],
+        'created_orders': [],
+        'lock': threading.Lock(),
+        'counter': iter(range(10 ** 9))
+    }
+
+
+def _next(state):
+    with state['lock']:
+        return next(state['counter'])
+
+
+def _pop(state, key):
+    with state['lock']:
+        return state[key].pop() if state[key] else 0
+
+
+def _remember(state, key):
+    def callback(response):
+        if response.status_code in (200, 201) and response.is_json and 'id' in response.json:
+            with state['lock']:
+                state[key].append(response.json['id'])
+    return callback
+
+
+def build_scenarios():
+    """Сценарии в порядке прогона: create выполняются раньше соответствующих delete"""
+    def auth(state, **kwargs):
+        return dict(kwargs, headers=state['headers'])
+
+    def import_body(rng, state):
+        n = _next(state)
+        rows = '\n'.join(f"IMPORT-{n}-{i},Imported {i},,{rng.randint(5, 100)}.00,10" for i in range(20))
+        return '/products/import', auth(state, data=f"sku,name,description,price,stock\n{rows}",
+                                        content_type='text/csv')
+
+    def order_body(rng, state):
+        return '/orders/', auth(state, json={'client_id': rng.choice(state['client_ids']),
+                                             'product_id': rng.choice(state['product_ids']), 'quantity': 1})
+
+    def batch_body(rng, state):
+        items = [{'product_id': product_id, 'quantity': 1} for product_id in rng.sample(state['product_ids'], 10)]
+        return '/orders/batch', auth(state, json={'client_id': rng.choice(state['client_ids']), 'items': items})
+
+    return [
+        Scenario('auth.register', 'POST', lambda rng, state: ('/auth/register', {'json': {
+            'name': "Load Test", 'email': f"load{_next(state)}@example.com", 'password': BENCH_PASSWORD
+        }}), expected=(201,), weight=0.1),
+        Scenario('auth.login', 'POST', lambda rng, state: ('/auth/login', {'json': {
+            'email': f"client{rng.randrange(len(state['client_ids']))}@example.com", 'password': BENCH_PASSWORD
+        }}), weight=0.1),
+        Scenario('products.list', 'GET', lambda rng, state: ('/products/', auth(state))),
+        Scenario('products.page', 'GET', lambda rng, state: ('/products/?limit=50', auth(state))),
+        Scenario('products.by_ids', 'GET', lambda rng, state: (
+            '/products/?ids=' + ','.join(map(str, rng.sample(state['product_ids'], 20))), auth(state))),
+        Scenario('products.get', 'GET', lambda rng, state: (
+            f"/products/{rng.choice(state['product_ids'])}/", auth(state))),
+        Scenario('products.export', 'GET', lambda rng, state: ('/products/export', auth(state)), weight=0.2),
+        Scenario('products.create', 'POST', lambda rng, state: ('/products/', auth(state, json={
+            'name': f"New bouquet {_next(state)}", 'price': 25.0, 'stock': 10
+        })), expected=(201,)),
+        Scenario('products.import', 'POST', import_body, weight=0.2),
+        Scenario('products.update', 'PUT', lambda rng, state: (
+            f"/products/{rng.choice(state['product_ids'])}/", auth(state, json={'stock': 10 ** 9}))),
+        Scenario('products.delete', 'DELETE', lambda rng, state: (
+            f"/products/{_pop(state, 'created_products')}/", auth(state))),
+        Scenario('orders.list', 'GET', lambda rng, state: ('/orders/', auth(state)), weight=0.2),
+        Scenario('orders.page', 'GET', lambda rng, state: ('/orders/?limit=50', auth(state))),
+        Scenario('orders.export', 'GET', lambda rng, state: ('/orders/export', auth(state)), weight=0.2),
+        Scenario('orders.create', 'POST', order_body, expected=(201,)),
+        Scenario('orders.batch', 'POST', batch_body, expected=(201,), weight=0.5),
+        Scenario('orders.delete', 'DELETE', lambda rng, state: (
+            f"/orders/{_pop(state, 'created_orders')}/", auth(state))),
+        Scenario('clients.list', 'GET', lambda rng, state: ('/clients/', auth(state)), weight=0.2),
+        Scenario('clients.page', 'GET', lambda rng, state: ('/clients/?limit=50', auth(state))),
+        Scenario('clients.orders', 'GET', lambda rng, state: (
+            f"/clients/{rng.choice(state['client_ids'])}/orders?limit=20", auth(state))),
+        Scenario('clients.export', 'GET', lambda rng, state: ('/clients/export', auth(state)), weight=0.2),
+        Scenario('clients.create', 'POST', lambda rng, state: ('/clients/', auth(state, json={
+            'name': "Load Test", 'email': f"created{_next(state)}@example.com", 'password': BENCH_PASSWORD
+        })), expected=(201,), weight=0.1),
+    ]
+
+
+CALLBACKS = {'products.create': 'created_products', 'orders.create': 'created_orders'}
+
+
+def percentile(samples, q):
+    """Перцентиль по методу ближайшего ранга (samples отсортирован)"""
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, max(0, int(round(q / 100 * len(samples))) - 1))]
+
+
+def run_scenario(app, scenario, state, requests, workers, seed_value, warmup):
+    """Гонит requests запросов из workers потоков; у каждого потока свой клиент и ГПСЧ"""
+    callback = _remember(state, CALLBACKS[scenario.name]) if scenario.name in CALLBACKS else None
+    per_worker = [requests // workers + (1 if i < requests % workers else 0) for i in range(workers)]
+    latencies, errors = [], []
+    results_lock = threading.Lock()
+    start_barrier = threading.Barrier(workers + 1)
+
+    def worker(index, count):
+        rng = random.Random(f"{seed_value}:{scenario.name}:{index}")
+        local_latencies, local_errors = [], 0
+        with app.test_client() as client:
+            for _ in range(warmup):
+                path, kwargs = scenario.build(rng, state)
+                response = client.open(path, method=scenario.method, **kwargs)
+                if callback is not None:
+                    callback(response)
+                response.close()
+            start_barrier.wait()
+            for _ in range(count):
+                path, kwargs = scenario.build(rng, state)
+                started = time.perf_counter()
+                response = client.open(path, method=scenario.method, **kwargs)
+                response.get_data()  # потоковые ответы (export) читаются целиком
+                local_latencies.append((time.perf_counter() - started) * 1000)
+                if response.status_code not in scenario.expected:
+                    local_errors += 1
+                if callback is not None:
+                    callback(response)
+                response.close()
+        with results_lock:
+            latencies.extend(local_latencies)
+            errors.append(local_errors)
+
+    threads = [threading.Thread(target=worker, args=(i, count)) for i, count in enumerate(per_worker)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': sum(errors),
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3)
+    }
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    """
+    Список регрессий относительно базовых значений. Для задержек нужен и относительный
+    рост больше tolerance, и абсолютный больше min_delta_ms: на быстрых маршрутах
+    (около 1 мс) разница в доли миллисекунды — это шум планировщика, а не регрессия.
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms'):
+            if (result[metric] > base[metric] * (1 + tolerance)
+                    and result[metric] - base[metric] > min_delta_ms):
+                regressions.append(f"{name}: {metric[:3]} {base[metric]:.2f} -> {result[metric]:.2f} ms")
+        if result['rps'] < base['rps'] * (1 - tolerance) and result['p50_ms'] - base['p50_ms'] > min_delta_ms:
+            regressions.append(f"{name}: throughput {base['rps']:.1f} -> {result['rps']:.1f} req/s")
+        if result['errors'] > base['errors']:
+            regressions.append(f"{name}: errors {base['errors']} -> {result['errors']}")
+    return regressions
+
+
+def summarize(rounds):
+    """Медиана метрик по раундам сглаживает разовые паузы (GC, сброс страниц на диск)"""
+    summary = {key: round(statistics.median(result[key] for result in rounds), 3)
+               for key in ('rps', 'p50_ms', 'p95_ms', 'p99_ms')}
+    summary['requests'] = sum(result['requests'] for result in rounds)
+    summary['errors'] = max(result['errors'] for result in rounds)
+    return summary
+
+
+def environment(app, args):
+    """Параметры прогона: сравнение с базой, снятой в другом окружении, бессмысленно"""
+    with app.app_context():
+        dialect = db.engine.dialect.name
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'database': dialect,
+        'redis': 'redis' if os.getenv('BENCH_REDIS_URL') else 'fakeredis',
+        'clients': args.clients,
+        'products': args.products,
+        'orders': args.orders,
+        'workers': args.workers,
+        'requests': args.requests,
+        'rounds': args.rounds,
+        'seed': args.seed
+    }
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--products', type=int, default=500)
+    parser.add_argument('--orders', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=8, help='concurrent client threads')
+    parser.add_argument('--requests', type=int, default=200, help='requests per scenario (scaled by its weight)')
+    parser.add_argument('--warmup', type=int, default=2, help='unmeasured requests per worker')
+    parser.add_argument('--rounds', type=int, default=3, help='runs of every scenario; the median is reported')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--only', help='comma-separated scenario name prefixes, e.g. products,auth.login')
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='overwrite the baseline with this run')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative slowdown')
+    # Два интервала переключения GIL (sys.getswitchinterval() = 5 мс): меньшие сдвиги — очередь потоков
+    parser.add_argument('--min-delta-ms', type=float, default=10.0, help='ignore latency changes below this')
+    parser.add_argument('--json', dest='json_output', type=Path, help='also write results to this file')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rng = random.Random(args.seed)
+    app = make_app()
+    state = seed(app, args.clients, args.products, args.orders, rng)
+
+    scenarios = build_scenarios()
+    if args.only:
+        prefixes = tuple(args.only.split(','))
+        scenarios = [scenario for scenario in scenarios if scenario.name.startswith(prefixes)]
+
+    # Раунды чередуют сценарии целиком, чтобы delete каждый раз находил созданные записи
+    samples = {scenario.name: [] for scenario in scenarios}
+    for _ in range(args.rounds):
+        for scenario in scenarios:
+            requests = max(args.workers, int(args.requests * scenario.weight))
+            samples[scenario.name].append(
+                run_scenario(app, scenario, state, requests, args.workers, args.seed, args.warmup))
+
+    results = {name: summarize(rounds) for name, rounds in samples.items()}
+    print(f"{'scenario':<18} {'requests':>8} {'errors':>6} {'req/s':>9} {'p50, ms':>9} {'p95, ms':>9} {'p99, ms':>9}")
+    for name, result in results.items():
+        print(f"{name:<18} {result['requests']:>8} {result['errors']:>6} {result['rps']:>9.1f} "
+              f"{result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f}")
+
+    report = {'environment': environment(app, args), 'scenarios': results}
+    if args.json_output:
+        args.json_output.write_text(json.dumps(report, indent=2) + '\n')
+
+    if args.save_baseline:
+        failing = [name for name, result in results.items() if result['errors']]
+        if failing:
+            # Базовые значения с ошибками закрепили бы сломанный маршрут как норму
+            print(f"not saving baseline: errors in {', '.join(failing)}", file=sys.stderr)
+            return 1
+        args.baseline.write_text(json.dumps(report, indent=2) + '\n')
+        print(f"baseline saved to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print(f"no baseline at {args.baseline}, run with --save-baseline to create one")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text())
+    if baseline['environment'] != report['environment']:
+        print("warning: baseline was recorded in a different environment:", file=sys.stderr)
+        print(json.dumps(baseline['environment'], indent=2), file=sys.stderr)
+    regressions = compare(results, baseline['scenarios'], args.tolerance, args.min_delta_ms)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    print(f"{len(regressions)} regression(s) against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
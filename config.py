@@ -20,9 +20,168 @@ class Config:
         raise ValueError("DATABASE_URL не задан. Укажите его в .env файле.")
     
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Пул соединений с БД. pool_pre_ping отбрасывает разорванные соединения,
+    # pool_recycle — соединения старше N секунд (до таймаута на стороне сервера/прокси).
+    # Для SQLite параметры размера пула не применяются (см. app.utils.db_metrics.engine_options)
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', 5)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    }
+
+    # Инструментирование запросов: запросы дольше DB_SLOW_QUERY_MS пишутся в лог,
+    # один и тот же запрос DB_N_PLUS_ONE_THRESHOLD и более раз за HTTP-запрос — признак N+1
+    DB_SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', 200))
+    DB_N_PLUS_ONE_THRESHOLD = int(os.getenv('DB_N_PLUS_ONE_THRESHOLD', 10))
     
     # Redis
     REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+    # Пул соединений: с REDIS_POOL_BLOCKING запрос ждёт свободное соединение
+    # до REDIS_POOL_TIMEOUT секунд, без него сразу получает ошибку при исчерпании пула
+    REDIS_MAX_CONNECTIONS = int(os.getenv('REDIS_MAX_CONNECTIONS', 50))
+    REDIS_POOL_BLOCKING = os.getenv('REDIS_POOL_BLOCKING', 'true').lower() == 'true'
+    REDIS_POOL_TIMEOUT = float(os.getenv('REDIS_POOL_TIMEOUT', 0.5))
+    # Таймауты в секундах: медленный Redis не должен держать поток запроса
+    REDIS_SOCKET_TIMEOUT = float(os.getenv('REDIS_SOCKET_TIMEOUT', 0.5))
+    REDIS_SOCKET_CONNECT_TIMEOUT = float(os.getenv('REDIS_SOCKET_CONNECT_TIMEOUT', 0.5))
+    REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv('REDIS_HEALTH_CHECK_INTERVAL', 30))
+    REDIS_RETRY_ATTEMPTS = int(os.getenv('REDIS_RETRY_ATTEMPTS', 1))
+    # Автоматический выключатель: после N ошибок подряд запросы идут мимо Redis (в БД)
+    # и только через REDIS_BREAKER_RESET_TIMEOUT секунд делается пробный вызов
+    REDIS_BREAKER_FAILURE_THRESHOLD = int(os.getenv('REDIS_BREAKER_FAILURE_THRESHOLD', 5))
+    REDIS_BREAKER_RESET_TIMEOUT = float(os.getenv('REDIS_BREAKER_RESET_TIMEOUT', 10))
+
+    # Хэширование паролей: метод и стоимость в формате Werkzeug (pbkdf2:sha256:1000000,
+    # scrypt:32768:8:1); без числа итераций — значение Werkzeug по умолчанию. При повышении
+    # стоимости или смене алгоритма хэш пересчитывается при следующем входе.
+    # Хэширование идёт в пуле из PASSWORD_HASH_WORKERS процессов (0 — в потоке запроса),
+    # в очереди ждут не больше PASSWORD_HASH_MAX_PENDING запросов
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256')
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 32))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 10))
+
+    # Ограничение неудачных входов: не больше LOGIN_MAX_ATTEMPTS на email
+    # и LOGIN_IP_MAX_ATTEMPTS на IP за скользящее окно LOGIN_ATTEMPTS_WINDOW секунд
+    LOGIN_MAX_ATTEMPTS = int(os.getenv('LOGIN_MAX_ATTEMPTS', 5))
+    LOGIN_IP_MAX_ATTEMPTS = int(os.getenv('LOGIN_IP_MAX_ATTEMPTS', 50))
+    LOGIN_ATTEMPTS_WINDOW = int(os.getenv('LOGIN_ATTEMPTS_WINDOW', 300))
+
+    # Сколько секунд Redis хранит роль клиента, прочитанную из БД (для токенов без claim role)
+    ROLE_CACHE_TTL = int(os.getenv('ROLE_CACHE_TTL', 60))
+
+    # Курсорная пагинация списков
+    PAGE_DEFAULT_LIMIT = int(os.getenv('PAGE_DEFAULT_LIMIT', 50))
+    PAGE_MAX_LIMIT = int(os.getenv('PAGE_MAX_LIMIT', 500))
+
+    # История заказов клиента: сколько первых страниц без фильтра по датам держать в кэше
+    CLIENT_ORDERS_CACHED_PAGES = int(os.getenv('CLIENT_ORDERS_CACHED_PAGES', 3))
+    CLIENT_ORDERS_CACHE_TTL = int(os.getenv('CLIENT_ORDERS_CACHE_TTL', 60))
+
+    # Максимум строк в одном пакетном заказе
+    ORDER_BATCH_MAX_LINES = int(os.getenv('ORDER_BATCH_MAX_LINES', 500))
+
+    # Отчёты о продажах (/reports): размер топа по умолчанию и максимум,
+    # наибольший диапазон дневного отчёта в днях
+    REPORT_DEFAULT_LIMIT = int(os.getenv('REPORT_DEFAULT_LIMIT', 10))
+    REPORT_MAX_LIMIT = int(os.getenv('REPORT_MAX_LIMIT', 100))
+    REPORT_MAX_DAYS = int(os.getenv('REPORT_MAX_DAYS', 366))
+    # На сколько строк разбит счётчик продаж за день: заказ обновляет случайную,
+    # поэтому параллельные заказы не ждут блокировку одной строки до commit
+    SALES_DAILY_SHARDS = int(os.getenv('SALES_DAILY_SHARDS', 16))
+
+    # Импорт каталога: сколько строк отправлять в БД одним upsert
+    IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', 1000))
+
+    # Transactional outbox: сброс кэша и фоновые задачи пишутся в таблицу outbox_event
+    # в транзакции изменения. OUTBOX_EAGER — доставлять сразу после commit (best effort),
+    # недоставленное отправляет relay: поток в каждом процессе приложения раз в
+    # OUTBOX_RELAY_INTERVAL секунд (OUTBOX_RELAY_THREAD) или flask outbox relay
+    OUTBOX_EAGER = os.getenv('OUTBOX_EAGER', 'true').lower() == 'true'
+    OUTBOX_RELAY_THREAD = os.getenv('OUTBOX_RELAY_THREAD', 'true').lower() == 'true'
+    OUTBOX_RELAY_INTERVAL = float(os.getenv('OUTBOX_RELAY_INTERVAL', 1))
+    OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', 500))
+    # События, которые доставляет сам запрос после commit, relay пропускает столько секунд
+    OUTBOX_CLAIM_TIMEOUT = float(os.getenv('OUTBOX_CLAIM_TIMEOUT', 30))
+
+    # Фоновые задачи (flask jobs worker): после JOB_MAX_ATTEMPTS неудач задача уходит
+    # в очередь мёртвых задач, повторы — с экспоненциальной задержкой от JOB_RETRY_BASE_DELAY
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 5))
+    JOB_RETRY_BASE_DELAY = float(os.getenv('JOB_RETRY_BASE_DELAY', 2))
+    JOB_RETRY_MAX_DELAY = float(os.getenv('JOB_RETRY_MAX_DELAY', 300))
+    JOB_IDEMPOTENCY_TTL = int(os.getenv('JOB_IDEMPOTENCY_TTL', 7 * 24 * 3600))
+    # Сколько держится захват задачи с ключом идемпотентности, пока она выполняется
+    JOB_CLAIM_TTL = int(os.getenv('JOB_CLAIM_TTL', 600))
+    JOB_DEAD_LETTER_MAX_LEN = int(os.getenv('JOB_DEAD_LETTER_MAX_LEN', 10000))
+    JOB_WORKER_HEARTBEAT_TTL = int(os.getenv('JOB_WORKER_HEARTBEAT_TTL', 30))
+    # Ожидание новой задачи за одно обращение; ограничено 80% REDIS_SOCKET_TIMEOUT
+    JOB_POLL_TIMEOUT = float(os.getenv('JOB_POLL_TIMEOUT', 1))
+
+    # Побочные эффекты заказов: порог предупреждения о низком остатке
+    # и длина ленты уведомлений клиента
+    LOW_STOCK_THRESHOLD = int(os.getenv('LOW_STOCK_THRESHOLD', 10))
+    NOTIFICATIONS_MAX_LEN = int(os.getenv('NOTIFICATIONS_MAX_LEN', 50))
+
+    # Генератор синтетических данных (flask seed): строк в одной пачке COPY/executemany
+    SEED_BATCH_SIZE = int(os.getenv('SEED_BATCH_SIZE', 50000))
+
+    # Потоковая выгрузка: сколько строк читать из курсора БД за раз
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+
+    # Кэш готовых ответов: тела больше порога дополнительно хранятся в gzip
+    CACHE_GZIP_ENABLED = os.getenv('CACHE_GZIP_ENABLED', 'true').lower() == 'true'
+    CACHE_GZIP_MIN_SIZE = int(os.getenv('CACHE_GZIP_MIN_SIZE', 1024))
+    CACHE_GZIP_LEVEL = int(os.getenv('CACHE_GZIP_LEVEL', 6))
+
+    # Защита от cache stampede: блокировка на пересчёт, отдача устаревшего значения
+    # в течение CACHE_STALE_TTL секунд и вероятностное досрочное обновление
+    CACHE_LOCK_TIMEOUT = float(os.getenv('CACHE_LOCK_TIMEOUT', 5))
+    CACHE_LOCK_POLL_INTERVAL = float(os.getenv('CACHE_LOCK_POLL_INTERVAL', 0.05))
+    CACHE_STALE_TTL = int(os.getenv('CACHE_STALE_TTL', 60))
+    CACHE_EARLY_EXPIRATION_BETA = float(os.getenv('CACHE_EARLY_EXPIRATION_BETA', 1.0))
+
+    # Локальный (в памяти процесса) уровень кэша перед Redis для горячих коллекций.
+    # Сбрасывается через Redis pub/sub, TTL ограничивает устаревание при потере сообщений
+    LOCAL_CACHE_COLLECTIONS = [
+        name for name in os.getenv('LOCAL_CACHE_COLLECTIONS', 'products_list').split(',') if name
+    ]
+    LOCAL_CACHE_MAX_ENTRIES = int(os.getenv('LOCAL_CACHE_MAX_ENTRIES', 256))
+    LOCAL_CACHE_TTL = float(os.getenv('LOCAL_CACHE_TTL', 5))
+
+    # Логирование: уровни логгера, консоли и файла, формат text или json (одна запись — JSON-строка)
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+    LOG_CONSOLE_LEVEL = os.getenv('LOG_CONSOLE_LEVEL', 'DEBUG').upper()
+    LOG_FILE_LEVEL = os.getenv('LOG_FILE_LEVEL', 'DEBUG').upper()
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()
+    LOG_FILE = os.getenv('LOG_FILE', 'logs/flower_shop.log')
+    LOG_FILE_MAX_BYTES = int(os.getenv('LOG_FILE_MAX_BYTES', 1000000))
+    LOG_FILE_BACKUP_COUNT = int(os.getenv('LOG_FILE_BACKUP_COUNT', 3))
+
+    # Копия логов в Redis (списки log:{level}): отправка пачками из фонового потока,
+    # при переполнении очереди записи ниже WARNING прореживаются 1 из LOG_REDIS_SAMPLE_RATE
+    LOG_TO_REDIS = os.getenv('LOG_TO_REDIS', 'false').lower() == 'true'
+    LOG_REDIS_LEVEL = os.getenv('LOG_REDIS_LEVEL', 'WARNING')
+    LOG_REDIS_MAX_LEN = int(os.getenv('LOG_REDIS_MAX_LEN', 100))
+    LOG_REDIS_QUEUE_SIZE = int(os.getenv('LOG_REDIS_QUEUE_SIZE', 10000))
+    LOG_REDIS_BATCH_SIZE = int(os.getenv('LOG_REDIS_BATCH_SIZE', 200))
+    LOG_REDIS_SAMPLE_RATE = int(os.getenv('LOG_REDIS_SAMPLE_RATE', 10))
+
+    # Метрики запросов в формате Prometheus (/metrics): каждый воркер копит их в памяти
+    # и раз в METRICS_FLUSH_INTERVAL секунд добавляет в общий хэш METRICS_REDIS_KEY.
+    # /metrics требует заголовок Authorization: Bearer <METRICS_TOKEN>; пока токен не задан,
+    # эндпоинт отвечает 404. Токен указывается в scrape-конфигурации Prometheus
+    # (authorization.credentials)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+    METRICS_REDIS_KEY = os.getenv('METRICS_REDIS_KEY', 'metrics:prometheus')
+    METRICS_LATENCY_BUCKETS = [
+        float(bound) for bound in
+        os.getenv('METRICS_LATENCY_BUCKETS', '0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10').split(',')
+    ]
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
 
 class TestConfig(Config):
     """Конфигурация для тестирования."""
@@ -32,3 +191,5 @@ class TestConfig(Config):
         raise ValueError("TEST_DATABASE_URL не задан. Укажите его в .env файле.")
     
     TESTING = True
+    # Доставку outbox тесты проверяют явно, без фонового потока
+    OUTBOX_RELAY_THREAD = False
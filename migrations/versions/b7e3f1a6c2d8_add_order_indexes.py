@@ -0,0 +1,42 @@
+"""Add indexes for order history and reporting queries
+
+Revision ID: b7e3f1a6c2d8
+Revises: 5a1c7e2d9b40
+Create Date: 2026-10-18 11:03:27.541802
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e3f1a6c2d8'
+down_revision = '5a1c7e2d9b40'
+branch_labels = None
+depends_on = None
+
+ORDER_INDEXES = (
+    ('ix_order_client_id_created_at', ['client_id', 'created_at']),
+    ('ix_order_product_id', ['product_id']),
+    ('ix_order_created_at', ['created_at']),
+)
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        # На большой таблице обычный CREATE INDEX блокирует запись — строим конкурентно,
+        # а это возможно только вне транзакции
+        with op.get_context().autocommit_block():
+            for name, columns in ORDER_INDEXES:
+                op.create_index(name, 'order', columns, unique=False,
+                                postgresql_concurrently=True, if_not_exists=True)
+        return
+
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        for name, columns in ORDER_INDEXES:
+            batch_op.create_index(name, columns, unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        for name, _ in reversed(ORDER_INDEXES):
+            batch_op.drop_index(name)
@@ -41,5 +41,5 @@ def admin_user():
 
 @pytest.fixture
 def auth_headers(admin_user):
-    token = create_access_token(identity=admin_user.id)
+    token = create_access_token(identity=str(admin_user.id))
     return {"Authorization": f"Bearer {token}"}
@@ -1,4 +1,5 @@
 import pytest
+from sqlalchemy import event
 from app import create_app, db
 from app.models import Client, RoleEnum
 from werkzeug.security import check_password_hash
@@ -123,3 +124,105 @@ def test_missing_fields_in_login(client, existing_user_data):
     response = client.post('/auth/login', json=incomplete_data)
     assert response.status_code == 400
     assert response.json['error'] == 'Email and password are required'
+
+
+@pytest.fixture
+def statements(app):
+    """Список SQL-запросов, выполненных во время теста"""
+    executed = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    yield executed
+    event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def test_admin_required_uses_role_claim_without_db(client, redis_client, admin_user, statements):
+    """Проверка прав администратора по claim role не обращается к БД"""
+    token = create_access_token(identity=str(admin_user.id), additional_claims={'role': 'admin'})
+    statements.clear()
+
+    response = client.get('/metrics/cache', headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert statements == []
+
+
+def test_admin_required_falls_back_to_cached_role(client, redis_client, admin_user, statements):
+    """Токен без claim: роль читается из БД один раз, дальше — из кэша"""
+    headers = {"Authorization": f"Bearer {create_access_token(identity=str(admin_user.id))}"}
+    statements.clear()
+
+    assert client.get('/metrics/cache', headers=headers).status_code == 200
+    assert len(statements) == 1
+    assert redis_client.get(f"client_role:{admin_user.id}") == b'admin'
+
+    assert client.get('/metrics/cache', headers=headers).status_code == 200
+    assert len(statements) == 1
+
+
+def test_set_role_overrides_claim_in_issued_tokens(client, redis_client, admin_user):
+    """После смены роли claim в ранее выданном токене больше не даёт прав администратора"""
+    token = create_access_token(identity=str(admin_user.id), additional_claims={'role': 'admin'})
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get('/metrics/cache', headers=headers).status_code == 200
+
+    admin_user.set_role(RoleEnum.CLIENT)
+
+    response = client.get('/metrics/cache', headers=headers)
+    assert response.status_code == 403
+    assert redis_client.ttl(f"client_role:{admin_user.id}") > 0
+
+
+def test_login_rehashes_password_when_parameters_change(app, client):
+    """При входе хэш пароля пересчитывается с текущими параметрами из конфига"""
+    from werkzeug.security import generate_password_hash
+    user = Client(name="Old Hash", email="old-hash@example.com",
+                  password=generate_password_hash("password123", method="pbkdf2:sha256:1000"))
+    db.session.add(user)
+    db.session.commit()
+    app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:2000'
+
+    response = client.post('/auth/login', json={"email": "old-hash@example.com", "password": "password123"})
+    assert response.status_code == 200
+    db.session.refresh(user)
+    assert user.password.startswith('pbkdf2:sha256:2000$')
+
+    # Повторный вход с тем же паролем проходит и хэш больше не меняется
+    stored = user.password
+    response = client.post('/auth/login', json={"email": "old-hash@example.com", "password": "password123"})
+    assert response.status_code == 200
+    db.session.refresh(user)
+    assert user.password == stored
+
+
+def test_login_does_not_lower_hash_cost(app, client):
+    """Снижение стоимости в конфиге не пересчитывает уже сохранённые, более стойкие хэши"""
+    from werkzeug.security import generate_password_hash
+    stored = generate_password_hash("password123", method="pbkdf2:sha256:2000")
+    user = Client(name="Strong Hash", email="strong-hash@example.com", password=stored)
+    db.session.add(user)
+    db.session.commit()
+    app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+
+    response = client.post('/auth/login', json={"email": "strong-hash@example.com", "password": "password123"})
+    assert response.status_code == 200
+    db.session.refresh(user)
+    assert user.password == stored
+
+
+def test_login_returns_503_when_hashing_pool_is_busy(app, client, monkeypatch, existing_user_data):
+    """Переполненная очередь хэширования даёт 503, а не растущую задержку"""
+    from app.routes import auth_routes
+    from app.utils.passwords import PasswordHasherBusy
+
+    def busy(*args):
+        raise PasswordHasherBusy('Password hashing queue is full')
+
+    monkeypatch.setattr(auth_routes, 'verify_password', busy)
+    db.session.add(Client(name="Busy", email=existing_user_data['email'], password="x"))
+    db.session.commit()
+
+    response = client.post('/auth/login', json={"email": existing_user_data['email'], "password": "password123"})
+    assert response.status_code == 503
@@ -0,0 +1,245 @@
+import gzip
+import json
+import threading
+import time
+import pytest
+from app import db
+from app.models import Product
+from app.utils.cache import cached_json_response, collection_version, version_key
+from app.utils.local_cache import LocalCache, publish_invalidation
+
+
+def test_products_cached_as_encoded_body(client, redis_client, auth_headers):
+    """Тестируем, что кэш хранит готовое тело ответа и отдаёт его без изменений."""
+    db.session.add(Product(name="Rose", price=10.0, stock=5))
+    db.session.commit()
+
+    response = client.get('/products/', headers=auth_headers)
+    assert response.status_code == 200
+
+    # В Redis лежит ровно то тело, которое получил клиент
+    assert redis_client.get('products_list') == response.get_data()
+
+    cached = client.get('/products/', headers=auth_headers)
+    assert cached.get_data() == response.get_data()
+    assert json.loads(cached.get_data()) == [
+        {'id': 1, 'sku': None, 'name': "Rose", 'description': None, 'price': 10.0, 'stock': 5}
+    ]
+
+
+def test_products_cache_gzip(app, client, redis_client, auth_headers):
+    """Тестируем отдачу сжатого варианта клиентам, поддерживающим gzip."""
+    app.config['CACHE_GZIP_MIN_SIZE'] = 0
+    db.session.add(Product(name="Rose", price=10.0, stock=5))
+    db.session.commit()
+
+    headers = dict(auth_headers, **{'Accept-Encoding': 'gzip'})
+    for _ in range(2):  # промах и попадание в кэш
+        response = client.get('/products/', headers=headers)
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert json.loads(gzip.decompress(response.get_data()))[0]['name'] == "Rose"
+
+    # Клиенту без gzip отдаётся обычное тело
+    response = client.get('/products/', headers=auth_headers)
+    assert 'Content-Encoding' not in response.headers
+    assert response.json[0]['name'] == "Rose"
+
+
+def test_invalidation_drops_encoded_variants(client, redis_client, auth_headers):
+    """Тестируем, что при изменении каталога удаляются тело и gzip-вариант."""
+    client.get('/products/', headers=auth_headers)
+    assert redis_client.get('products_list') is not None
+
+    client.post('/products/', json={"name": "Tulip", "price": 5.0}, headers=auth_headers)
+    assert redis_client.get('products_list') is None
+    assert redis_client.get('products_list:gz') is None
+
+
+def test_conditional_get_products(client, redis_client, auth_headers):
+    """Тестируем ответ 304 на If-None-Match и смену ETag после изменения каталога."""
+    response = client.get('/products/', headers=auth_headers)
+    etag = response.headers['ETag']
+
+    not_modified = client.get('/products/', headers=dict(auth_headers, **{'If-None-Match': etag}))
+    assert not_modified.status_code == 304
+    assert not_modified.get_data() == b''
+    assert not_modified.headers['ETag'] == etag
+
+    client.post('/products/', json={"name": "Tulip", "price": 5.0}, headers=auth_headers)
+
+    response = client.get('/products/', headers=dict(auth_headers, **{'If-None-Match': etag}))
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.json[0]['name'] == "Tulip"
+
+
+def test_etag_does_not_repeat_after_redis_reset(client, redis_client, auth_headers):
+    """Тестируем, что после сброса Redis старый ETag не даёт ложный 304."""
+    etag = client.get('/orders/', headers=auth_headers).headers['ETag']
+    redis_client.flushall()
+
+    response = client.get('/orders/', headers=dict(auth_headers, **{'If-None-Match': etag}))
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_conditional_get_pages_have_own_etag(client, redis_client, auth_headers):
+    """Тестируем, что у разных страниц коллекции разные ETag."""
+    full = client.get('/products/', headers=auth_headers)
+    page = client.get('/products/?limit=1', headers=auth_headers)
+    assert full.headers['ETag'] != page.headers['ETag']
+
+    response = client.get('/products/?limit=1', headers=dict(auth_headers, **{'If-None-Match': page.headers['ETag']}))
+    assert response.status_code == 304
+
+
+def test_order_changes_products_etag(client, redis_client, auth_headers, admin_user):
+    """Тестируем, что создание заказа меняет версию каталога (изменился остаток)."""
+    product = Product(name="Rose", price=10.0, stock=5)
+    db.session.add(product)
+    db.session.commit()
+    etag = client.get('/products/', headers=auth_headers).headers['ETag']
+
+    client.post('/orders/', json={"client_id": admin_user.id, "product_id": product.id, "quantity": 2},
+                headers=auth_headers)
+
+    response = client.get('/products/', headers=dict(auth_headers, **{'If-None-Match': etag}))
+    assert response.status_code == 200
+    assert response.json[0]['stock'] == 3
+
+
+@pytest.fixture
+def concurrent_fill(app, redis_client):
+    """Запускает cached_json_response одновременно из нескольких потоков и считает обращения к «БД»."""
+    app.config['CACHE_EARLY_EXPIRATION_BETA'] = 0  # без досрочного обновления — детерминированно
+    loads = []
+
+    def loader():
+        loads.append(1)
+        time.sleep(0.2)  # медленный запрос к БД
+        return [{'id': 1, 'name': "Rose"}]
+
+    def run(threads=20):
+        barrier = threading.Barrier(threads)
+        bodies = []
+
+        def worker():
+            with app.test_request_context('/products/'):
+                barrier.wait()
+                bodies.append(cached_json_response(redis_client, 'stampede', loader, ttl=60).get_data())
+
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        return bodies
+
+    run.loads = loads
+    return run
+
+
+def test_single_flight_on_cold_cache(concurrent_fill):
+    """Тестируем, что при пустом кэше БД опрашивает только один поток из многих."""
+    bodies = concurrent_fill()
+    assert len(concurrent_fill.loads) == 1
+    assert len(bodies) == 20
+    assert set(bodies) == {b'[{"id":1,"name":"Rose"}]'}
+
+
+def test_single_flight_on_expiry_serves_stale(concurrent_fill, redis_client):
+    """Тестируем, что после истечения TTL пересчёт один, а остальные получают старое значение."""
+    concurrent_fill()
+    assert len(concurrent_fill.loads) == 1
+
+    # Имитируем истечение мягкого TTL: значение ещё лежит в Redis, но уже устарело
+    redis_client.set('stampede:meta', f"{time.time() - 1} 0.2")
+
+    bodies = concurrent_fill()
+    assert len(concurrent_fill.loads) == 2
+    assert len(bodies) == 20
+    assert not redis_client.exists('stampede:lock')
+
+
+def test_early_expiration_refreshes_before_ttl(app, redis_client):
+    """Тестируем вероятностное досрочное обновление для долгих пересчётов у границы TTL."""
+    loads = []
+    with app.test_request_context('/products/'):
+        cached_json_response(redis_client, 'early', lambda: loads.append(1) or [], ttl=60)
+        # До истечения секунда, а пересчёт «занимает» час — обновление почти гарантировано
+        redis_client.set('early:meta', f"{time.time() + 1} 3600")
+        cached_json_response(redis_client, 'early', lambda: loads.append(1) or [], ttl=60)
+    assert len(loads) == 2
+
+
+def test_fill_skips_write_when_invalidated_before_exec(app, redis_client):
+    """Тестируем, что сброс коллекции между проверкой версии и записью отменяет запись в кэш."""
+    collection_version(redis_client, 'race')
+    pipeline = redis_client.pipeline
+
+    def racing_pipeline(*args, **kwargs):
+        pipe = pipeline(*args, **kwargs)
+        multi = pipe.multi
+
+        def invalidate_then_multi():
+            # Другой воркер сбрасывает коллекцию сразу после проверки версии
+            redis_client.incr(version_key('race'))
+            multi()
+        pipe.multi = invalidate_then_multi
+        return pipe
+
+    redis_client.pipeline = racing_pipeline
+    with app.test_request_context('/products/'):
+        response = cached_json_response(redis_client, 'race', lambda: [{'id': 1}], ttl=60, collection='race')
+    assert response.get_data() == b'[{"id":1}]'
+    assert redis_client.get('race') is None
+
+
+def test_local_tier_serves_catalog_without_redis(app, client, redis_client, auth_headers):
+    """Тестируем, что повторный запрос каталога обслуживается из памяти процесса."""
+    db.session.add(Product(name="Rose", price=10.0, stock=5))
+    db.session.commit()
+    client.get('/products/', headers=auth_headers)
+
+    # Данные в Redis пропали, но локальный уровень ещё держит ответ
+    redis_client.delete('products_list')
+    response = client.get('/products/', headers=auth_headers)
+    assert response.json[0]['name'] == "Rose"
+
+    stats = client.get('/metrics/cache', headers=auth_headers).json
+    # В локальном кэше: ответ, версия каталога и роль администратора
+    assert stats['local'] == {'hits': 1, 'misses': 1, 'size': 3}
+    assert stats['redis'] == {'hits': 0, 'misses': 1}
+
+
+def test_local_tier_invalidated_by_other_worker(app, client, redis_client, auth_headers):
+    """Тестируем сброс локального уровня по сообщению pub/sub от другого воркера."""
+    client.get('/products/', headers=auth_headers)
+    local_cache = app.extensions['local_cache']
+    assert len(local_cache) > 0
+
+    # Другой воркер изменил каталог и опубликовал инвалидацию
+    publish_invalidation(redis_client, 'products_list')
+    deadline = time.monotonic() + 2
+    while len(local_cache) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(local_cache) == 0
+
+
+def test_local_cache_lru_and_ttl():
+    """Тестируем вытеснение самых старых записей и истечение TTL."""
+    cache = LocalCache(max_entries=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+
+    cache.set('short', 4, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get('short') is None
+
+    cache.set(('products_list:v1:page:0:10', False), 5)
+    cache.invalidate('products_list')
+    assert cache.get(('products_list:v1:page:0:10', False)) is None
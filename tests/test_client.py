@@ -1,7 +1,9 @@
 import json
+from datetime import datetime, timedelta
 from flask_jwt_extended import create_access_token
+from sqlalchemy import update
 from app import db
-from app.models import Client
+from app.models import Client, Order, Product
 
 def test_get_clients(client, redis_client, auth_headers):
     # Добавляем клиентов в базу данных
@@ -47,3 +49,112 @@ def test_create_client(client, redis_client, auth_headers):
     response = client.post("/clients/", headers=auth_headers, json=payload)
     assert response.status_code == 400
     assert response.get_json()["error"] == "Name and email are required"
+
+
+def test_create_client_with_password(client, redis_client, auth_headers):
+    # Клиент, созданный администратором с паролем, может войти
+    payload = {"name": "Client New", "email": "client.new@example.com", "password": "secret123"}
+    response = client.post("/clients/", headers=auth_headers, json=payload)
+    assert response.status_code == 201
+
+    response = client.post("/auth/login", json={"email": "client.new@example.com", "password": "secret123"})
+    assert response.status_code == 200
+    assert "access_token" in response.get_json()
+
+
+def _client_with_orders(name, email, count, start):
+    """Клиент с count заказами, созданными с интервалом в день начиная с start"""
+    customer = Client(name=name, email=email, password="secret")
+    product = Product(name=f"{name} product", price=10.0, stock=1000)
+    db.session.add_all([customer, product])
+    db.session.commit()
+    db.session.add_all([
+        Order(client_id=customer.id, product_id=product.id, quantity=1, total_price=10.0,
+              created_at=start + timedelta(days=i))
+        for i in range(count)
+    ])
+    db.session.commit()
+    return customer, product
+
+
+def test_get_client_orders_paginated(client, redis_client, auth_headers):
+    customer, _ = _client_with_orders("Buyer", "buyer@example.com", 5, datetime(2024, 1, 1))
+    _client_with_orders("Other", "other@example.com", 3, datetime(2024, 1, 1))
+
+    response = client.get(f"/clients/{customer.id}/orders?limit=2", headers=auth_headers)
+    assert response.status_code == 200
+    first = response.get_json()
+    assert [o["created_at"] for o in first["items"]] == ["2024-01-05T00:00:00", "2024-01-04T00:00:00"]
+    assert all(o["client_id"] == customer.id for o in first["items"])
+
+    seen = [o["id"] for o in first["items"]]
+    cursor = first["next_cursor"]
+    while cursor:
+        page = client.get(f"/clients/{customer.id}/orders?limit=2&cursor={cursor}", headers=auth_headers).get_json()
+        seen += [o["id"] for o in page["items"]]
+        cursor = page["next_cursor"]
+    assert len(seen) == len(set(seen)) == 5
+
+
+def test_get_client_orders_skips_undated_orders(client, redis_client, auth_headers):
+    # Заказ без даты не ломает сериализацию и курсор
+    customer, product = _client_with_orders("Buyer", "buyer@example.com", 3, datetime(2024, 1, 1))
+    undated = Order(client_id=customer.id, product_id=product.id, quantity=1, total_price=10.0)
+    db.session.add(undated)
+    db.session.commit()
+    db.session.execute(update(Order).where(Order.id == undated.id).values(created_at=None))
+    db.session.commit()
+
+    response = client.get(f"/clients/{customer.id}/orders?limit=2", headers=auth_headers)
+    assert response.status_code == 200
+    first = response.get_json()
+    assert [o["created_at"] for o in first["items"]] == ["2024-01-03T00:00:00", "2024-01-02T00:00:00"]
+    last = client.get(f"/clients/{customer.id}/orders?limit=2&cursor={first['next_cursor']}",
+                      headers=auth_headers).get_json()
+    assert [o["created_at"] for o in last["items"]] == ["2024-01-01T00:00:00"]
+    assert last["next_cursor"] is None
+    # Заказ без даты не считается следующей страницей
+    response = client.get(f"/clients/{customer.id}/orders?limit=3", headers=auth_headers)
+    assert len(response.get_json()["items"]) == 3
+    assert response.get_json()["next_cursor"] is None
+
+
+def test_get_client_orders_date_filter(client, redis_client, auth_headers):
+    customer, _ = _client_with_orders("Buyer", "buyer@example.com", 10, datetime(2024, 1, 1))
+
+    response = client.get(f"/clients/{customer.id}/orders?from=2024-01-03&to=2024-01-06", headers=auth_headers)
+    assert response.status_code == 200
+    dates = [o["created_at"][:10] for o in response.get_json()["items"]]
+    assert dates == ["2024-01-05", "2024-01-04", "2024-01-03"]
+
+    response = client.get(f"/clients/{customer.id}/orders?from=yesterday", headers=auth_headers)
+    assert response.status_code == 400
+
+
+def test_get_client_orders_not_found(client, redis_client, auth_headers):
+    response = client.get("/clients/999/orders", headers=auth_headers)
+    assert response.status_code == 404
+
+
+def test_client_orders_cache_invalidated_per_client(client, redis_client, auth_headers):
+    """Новый заказ сбрасывает кэш истории только своего клиента"""
+    buyer, product = _client_with_orders("Buyer", "buyer@example.com", 2, datetime(2024, 1, 1))
+    other, _ = _client_with_orders("Other", "other@example.com", 2, datetime(2024, 1, 1))
+
+    client.get(f"/clients/{buyer.id}/orders", headers=auth_headers)
+    client.get(f"/clients/{other.id}/orders", headers=auth_headers)
+    other_keys = set(redis_client.keys(f"client_orders:{other.id}:*"))
+    assert other_keys
+    buyer_version = redis_client.get(f"client_orders:{buyer.id}:version")
+    other_version = redis_client.get(f"client_orders:{other.id}:version")
+
+    response = client.post("/orders/", headers=auth_headers,
+                           json={"client_id": buyer.id, "product_id": product.id, "quantity": 1})
+    assert response.status_code == 201
+
+    assert int(redis_client.get(f"client_orders:{buyer.id}:version")) == int(buyer_version) + 1
+    assert redis_client.get(f"client_orders:{other.id}:version") == other_version
+    assert set(redis_client.keys(f"client_orders:{other.id}:*")) == other_keys
+
+    response = client.get(f"/clients/{buyer.id}/orders", headers=auth_headers)
+    assert len(response.get_json()["items"]) == 3
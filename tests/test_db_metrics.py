@@ -0,0 +1,50 @@
+import logging
+from flask import g, jsonify
+from app import db
+from app.models import Product
+from app.utils.db_metrics import engine_options
+
+
+def test_engine_options_strip_pool_size_for_sqlite():
+    """Тестируем, что для SQLite параметры размера пула не передаются."""
+    options = {'pool_size': 10, 'max_overflow': 20, 'pool_timeout': 5, 'pool_recycle': 1800, 'pool_pre_ping': True}
+
+    sqlite = engine_options({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'SQLALCHEMY_ENGINE_OPTIONS': options})
+    assert sqlite == {'pool_recycle': 1800, 'pool_pre_ping': True}
+
+    postgres = engine_options({'SQLALCHEMY_DATABASE_URI': 'postgresql://user@localhost/shop',
+                               'SQLALCHEMY_ENGINE_OPTIONS': options})
+    assert postgres == options
+
+
+def test_query_stats_flag_n_plus_one(app, client, caplog):
+    """Тестируем подсчёт запросов за HTTP-запрос и предупреждение о повторяющемся запросе."""
+    products = [Product(name=f"Rose {i}", price=10.0, stock=5) for i in range(12)]
+    db.session.add_all(products)
+    db.session.commit()
+    ids = [product.id for product in products]
+    seen = {}
+
+    def n_plus_one():
+        # Классический N+1: по запросу на каждую строку
+        names = [db.session.get(Product, product_id).name for product_id in ids]
+        seen['count'] = g.query_stats.count
+        return jsonify(names)
+
+    app.add_url_rule('/n-plus-one', 'n_plus_one', n_plus_one)
+    db.session.expunge_all()
+
+    with caplog.at_level(logging.WARNING, logger='flower_shop'):
+        response = client.get('/n-plus-one')
+    assert response.status_code == 200
+    assert seen['count'] == 12
+    assert any("Possible N+1 in GET /n-plus-one" in message for message in caplog.messages)
+
+
+def test_slow_queries_are_logged(app, client, auth_headers, caplog):
+    """Тестируем запись в лог запросов дольше порога."""
+    app.config['DB_SLOW_QUERY_MS'] = 0
+
+    with caplog.at_level(logging.WARNING, logger='flower_shop'):
+        client.get('/products/', headers=auth_headers)
+    assert any(message.startswith("Slow query") for message in caplog.messages)
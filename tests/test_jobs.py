@@ -0,0 +1,198 @@
+import json
+import threading
+import time
+import pytest
+import redis
+from app import db
+from app.models import Client, Product
+from app.utils.jobs import (
+    JOB_HANDLERS, Worker, done_key, enqueue, heartbeat_key, make_job, processing_key, queue_stats, requeue_dead
+)
+from app.utils.order_events import update_order_analytics
+from app.utils.redis_client import CircuitBreaker, CircuitBreakerRedis
+
+
+def run_worker(app, redis_client, **kwargs):
+    return Worker(app, redis_client, worker_id='test-worker', **kwargs).run(burst=True)
+
+
+def test_order_side_effects_run_in_worker(app, client, redis_client, auth_headers):
+    """Тестируем, что заказ ставит задачи в очередь, а воркер выполняет подтверждение, аналитику и проверку остатка."""
+    customer = Client(name="Jane", email="jane@example.com", password="x")
+    product = Product(name="Rose", price=10.0, stock=12)
+    db.session.add_all([customer, product])
+    db.session.commit()
+
+    response = client.post('/orders/', headers=auth_headers,
+                           json={'client_id': customer.id, 'product_id': product.id, 'quantity': 3})
+    assert response.status_code == 201
+    # В запросе только постановка в очередь, побочные эффекты ещё не выполнены
+    assert queue_stats(redis_client)['queued'] == 3
+    assert redis_client.llen(f"notifications:{customer.id}") == 0
+
+    assert run_worker(app, redis_client) == 3
+    assert b"confirmed, total 30.00" in redis_client.lindex(f"notifications:{customer.id}", 0)
+    assert redis_client.zscore('analytics:product_sales', product.id) == 3
+    assert redis_client.hget('alerts:low_stock', product.id) == b"9"
+
+    # Удаление заказа откатывает аналитику и снимает предупреждение об остатке
+    client.delete(f"/orders/{response.json['id']}/", headers=auth_headers)
+    run_worker(app, redis_client)
+    assert redis_client.zscore('analytics:product_sales', product.id) == 0
+    assert redis_client.hget('alerts:low_stock', product.id) is None
+
+
+def test_failing_job_is_retried_then_dead_lettered(app, redis_client):
+    """Тестируем повторы с задержкой и перенос в очередь мёртвых задач после исчерпания попыток."""
+    app.config.update(JOB_MAX_ATTEMPTS=3, JOB_RETRY_BASE_DELAY=0)
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        raise RuntimeError("smtp down")
+
+    JOB_HANDLERS['test_flaky'] = flaky
+    try:
+        enqueue(redis_client, make_job('test_flaky'))
+        run_worker(app, redis_client)
+    finally:
+        del JOB_HANDLERS['test_flaky']
+
+    assert len(calls) == 3
+    assert queue_stats(redis_client) == {'queued': 0, 'delayed': 0, 'dead': 1}
+    dead = json.loads(redis_client.lindex('jobs:dead:default', 0))
+    assert dead['attempts'] == 3 and dead['error'] == "RuntimeError: smtp down"
+
+    assert requeue_dead(redis_client) == 1
+    assert queue_stats(redis_client) == {'queued': 1, 'delayed': 0, 'dead': 0}
+
+
+def test_idempotency_key_runs_job_once(app, redis_client):
+    """Тестируем, что задача с тем же ключом идемпотентности выполняется один раз."""
+    calls = []
+    JOB_HANDLERS['test_once'] = lambda value: calls.append(value)
+    try:
+        enqueue(redis_client, make_job('test_once', {'value': 1}, idempotency_key='once:1'))
+        enqueue(redis_client, make_job('test_once', {'value': 1}, idempotency_key='once:1'))
+        run_worker(app, redis_client)
+    finally:
+        del JOB_HANDLERS['test_once']
+
+    assert calls == [1]
+
+
+def test_jobs_of_stopped_worker_are_recovered(app, redis_client):
+    """Тестируем возврат в очередь задач воркера, который упал, не подтвердив их."""
+    calls = []
+    JOB_HANDLERS['test_recover'] = lambda: calls.append(1)
+    redis_client.lpush(processing_key('default', 'crashed-worker'), json.dumps(make_job('test_recover')))
+    try:
+        result = app.test_cli_runner().invoke(args=['jobs', 'worker', '--burst'])
+    finally:
+        del JOB_HANDLERS['test_recover']
+
+    assert result.exit_code == 0, result.output
+    assert calls == [1]
+    assert redis_client.llen(processing_key('default', 'crashed-worker')) == 0
+
+
+def test_idle_polling_does_not_trip_circuit_breaker(app):
+    """Тестируем, что ожидание короче таймаута сокета, а таймаут блокирующей команды не размыкает автомат."""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    client = CircuitBreakerRedis(host='127.0.0.1', port=1, socket_timeout=0.5, breaker=breaker)
+    assert Worker(app, client).block_timeout(1) == pytest.approx(0.4)
+
+    def blocked(*args, **kwargs):
+        raise redis.TimeoutError('Timeout reading from socket')
+
+    for _ in range(3):
+        with pytest.raises(redis.TimeoutError):
+            breaker.call(blocked, timeout_is_failure=False)
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0
+
+    with pytest.raises(redis.TimeoutError):
+        breaker.call(blocked)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_job_claimed_by_live_worker_is_not_run_twice(app, redis_client):
+    """Тестируем, что задачу, захваченную работающим воркером, другой воркер не выполняет."""
+    calls = []
+    JOB_HANDLERS['test_claimed'] = lambda: calls.append(1)
+    redis_client.set(heartbeat_key('other-worker'), 1)
+    redis_client.set(done_key('claimed:1'), 'running:other-worker')
+    try:
+        enqueue(redis_client, make_job('test_claimed', idempotency_key='claimed:1'))
+        run_worker(app, redis_client)
+    finally:
+        del JOB_HANDLERS['test_claimed']
+
+    assert calls == []
+    assert redis_client.llen(processing_key('default', 'test-worker')) == 0
+
+
+def test_failed_job_releases_claim_for_retry(app, redis_client):
+    """Тестируем, что после ошибки захват снимается и повтор выполняет задачу."""
+    app.config.update(JOB_RETRY_BASE_DELAY=0)
+    calls = []
+
+    def flaky_once():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("temporary")
+
+    JOB_HANDLERS['test_flaky_once'] = flaky_once
+    try:
+        enqueue(redis_client, make_job('test_flaky_once', idempotency_key='flaky:1'))
+        run_worker(app, redis_client)
+    finally:
+        del JOB_HANDLERS['test_flaky_once']
+
+    assert len(calls) == 2
+    assert redis_client.get(done_key('flaky:1')) == b"done"
+
+
+def test_analytics_are_not_double_counted_after_crash(app, redis_client):
+    """Тестируем, что падение после записи счётчиков не приводит к повторному начислению."""
+    app.config.update(JOB_RETRY_BASE_DELAY=0)
+
+    def analytics_then_crash(**kwargs):
+        update_order_analytics(**kwargs)
+        raise RuntimeError("worker killed before ack")
+
+    JOB_HANDLERS['test_analytics_crash'] = analytics_then_crash
+    row = {'client_id': 1, 'product_id': 7, 'quantity': 2, 'total_price': 20.0, 'date': '2026-10-18'}
+    try:
+        enqueue(redis_client, make_job('test_analytics_crash', {'rows': [row], 'sign': 1},
+                                       idempotency_key='analytics:crash'))
+        run_worker(app, redis_client)
+    finally:
+        del JOB_HANDLERS['test_analytics_crash']
+
+    assert redis_client.zscore('analytics:product_sales', 7) == 2
+    assert redis_client.hget('analytics:daily:2026-10-18', 'orders') == b"1"
+
+
+def test_running_worker_recovers_jobs_of_worker_that_died_later(app, redis_client):
+    """Тестируем, что работающий воркер периодически возвращает задачи упавшего соседа."""
+    app.config.update(JOB_WORKER_HEARTBEAT_TTL=1)
+    calls = []
+    JOB_HANDLERS['test_late_orphan'] = lambda: calls.append(1)
+    stop = threading.Event()
+    worker = threading.Thread(target=Worker(app, redis_client, worker_id='live-worker').run,
+                              kwargs={'poll_timeout': 0.05, 'stop': stop})
+    try:
+        worker.start()
+        time.sleep(0.1)  # начальный recover_orphans уже прошёл
+        # Сосед упал уже после старта воркера: heartbeat истёк, задача осталась в processing
+        redis_client.lpush(processing_key('default', 'dead-worker'), json.dumps(make_job('test_late_orphan')))
+        deadline = time.monotonic() + 3
+        while not calls and time.monotonic() < deadline:
+            time.sleep(0.02)
+    finally:
+        stop.set()
+        worker.join(timeout=2)
+        del JOB_HANDLERS['test_late_orphan']
+
+    assert calls == [1]
+    assert redis_client.llen(processing_key('default', 'dead-worker')) == 0
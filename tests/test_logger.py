@@ -0,0 +1,97 @@
+import json
+import logging
+import queue
+import threading
+import time
+from app.utils.logger import (
+    RedisLogHandler, SamplingQueueHandler, BatchingQueueListener, JsonFormatter, log_to_redis
+)
+
+
+def _record(level, message):
+    return logging.LogRecord('flower_shop', level, __name__, 0, message, None, None)
+
+
+def _wait_for(predicate, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_log_to_redis_is_shipped_in_background(app, redis_client):
+    """Тестируем, что log_to_redis ставит запись в очередь, а фоновый поток пишет её в Redis."""
+    with app.test_request_context():
+        for i in range(150):
+            log_to_redis('info', f"message {i}")
+
+    assert _wait_for(lambda: redis_client.lindex('log:info', 0) == b'INFO - message 149')
+    # Храним только последние LOG_REDIS_MAX_LEN сообщений
+    assert _wait_for(lambda: redis_client.llen('log:info') == app.config['LOG_REDIS_MAX_LEN'])
+
+
+def test_listener_flushes_batches_and_pending_records_on_stop(redis_client):
+    """Тестируем, что слушатель отправляет накопленные записи пачкой и дописывает их при остановке."""
+    log_queue = queue.Queue()
+    for i in range(10):
+        log_queue.put(_record(logging.WARNING, f"warn {i}"))
+    log_queue.put(_record(logging.ERROR, "boom"))
+
+    listener = BatchingQueueListener(log_queue, RedisLogHandler(redis_client, max_len=5), batch_size=100)
+    listener.start()
+    listener.stop()
+
+    assert redis_client.llen('log:warning') == 5
+    assert redis_client.lindex('log:warning', 0) == b'WARNING - warn 9'
+    assert redis_client.lrange('log:error', 0, -1) == [b'ERROR - boom']
+
+
+def test_listener_stops_cleanly_when_sentinel_is_in_batch(redis_client, monkeypatch):
+    """Тестируем остановку, когда сигнал остановки попадает в пачку вместе с записями."""
+    errors = []
+    monkeypatch.setattr(threading, 'excepthook', lambda args: errors.append(args.exc_value))
+    log_queue = queue.Queue()
+    listener = BatchingQueueListener(log_queue, RedisLogHandler(redis_client, max_len=5), batch_size=100)
+    for i in range(3):
+        log_queue.put(_record(logging.WARNING, f"warn {i}"))
+    listener.enqueue_sentinel()
+
+    listener.start()
+    listener._thread.join(timeout=2)
+
+    assert errors == []
+    assert log_queue.unfinished_tasks == 0
+    assert redis_client.llen('log:warning') == 3
+
+
+def test_queue_handler_never_blocks_when_full():
+    """Тестируем, что при заполненной очереди записи отбрасываются, а не блокируют поток."""
+    handler = SamplingQueueHandler(queue.Queue(maxsize=3), high_watermark=2, sample_rate=2)
+
+    started = time.monotonic()
+    for i in range(10):
+        handler.handle(_record(logging.INFO, f"info {i}"))
+    handler.handle(_record(logging.ERROR, "error"))
+    assert time.monotonic() - started < 0.5
+
+    # Две записи до порога, затем прореживание 1 из 2, а при полной очереди — отброс
+    assert handler.queue.qsize() == 3
+    assert handler.dropped == 8
+
+
+def test_app_logger_writes_through_queue():
+    """Тестируем, что поток запроса только ставит запись в очередь, а вывод делает фоновый поток."""
+    from logging.handlers import QueueHandler
+    from app import logger
+
+    assert logger.handlers
+    assert all(isinstance(handler, QueueHandler) for handler in logger.handlers)
+
+
+def test_json_formatter():
+    """Тестируем структурированный JSON-формат с ленивой подстановкой аргументов."""
+    record = logging.LogRecord('flower_shop', logging.INFO, __name__, 0, "Order %s created", (42,), None)
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry['message'] == "Order 42 created"
+    assert entry['level'] == "INFO"
+    assert entry['logger'] == "flower_shop"
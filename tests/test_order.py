@@ -1,6 +1,8 @@
+import json
+import threading
 import pytest
 from app import create_app, db
-from app.models import Order, Client, Product
+from app.models import Order, Client, Product, ProductSales
 from flask_jwt_extended import create_access_token
 from app.utils.auth import RoleEnum
 
@@ -50,14 +52,14 @@ def product():
 @pytest.fixture
 def auth_headers(admin_user):
     """Создаем заголовки с токеном для авторизации администратора."""
-    token = create_access_token(identity=admin_user.id)
+    token = create_access_token(identity=str(admin_user.id))
     return {"Authorization": f"Bearer {token}"}
 
 
 @pytest.fixture
 def client_auth_headers(client_user):
     """Создаем заголовки с токеном для обычного пользователя."""
-    token = create_access_token(identity=client_user.id)
+    token = create_access_token(identity=str(client_user.id))
     return {"Authorization": f"Bearer {token}"}
 
 
@@ -129,8 +131,175 @@ def test_delete_order(client, auth_headers, client_user, product):
     assert deleted_order is None
 
 
+def test_delete_legacy_order_without_date(client, auth_headers, client_user, product):
+    """Тестируем удаление старого заказа без created_at: остаток возвращается, ответ 200."""
+    order_id = client.post('/orders/', json={"client_id": client_user.id, "product_id": product.id, "quantity": 2},
+                           headers=auth_headers).json['id']
+    db.session.execute(db.update(Order).where(Order.id == order_id).values(created_at=None))
+    db.session.commit()
+
+    response = client.delete(f'/orders/{order_id}/', headers=auth_headers)
+    assert response.status_code == 200
+    db.session.refresh(product)
+    assert product.stock == 100
+    assert db.session.get(ProductSales, product.id).orders == 0
+
+
 def test_delete_order_not_found(client, auth_headers):
     """Тестируем удаление заказа, которого нет в базе данных."""
     response = client.delete('/orders/99999/', headers=auth_headers)
     assert response.status_code == 404
     assert response.json['error'] == 'Order not found'
+
+
+def test_export_orders_ndjson(client, auth_headers, client_user, product):
+    """Тестируем потоковую выгрузку заказов в NDJSON."""
+    for quantity in (1, 2, 3):
+        client.post('/orders/', json={
+            "client_id": client_user.id,
+            "product_id": product.id,
+            "quantity": quantity
+        }, headers=auth_headers)
+
+    response = client.get('/orders/export', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.is_streamed
+
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [o['quantity'] for o in lines] == [1, 2, 3]
+    assert all(o['client_id'] == client_user.id for o in lines)
+
+
+def test_export_orders_unsupported_format(client, auth_headers):
+    """Тестируем ошибку при неподдерживаемом формате выгрузки."""
+    response = client.get('/orders/export?format=xml', headers=auth_headers)
+    assert response.status_code == 400
+    assert response.json['error'] == 'Unsupported export format'
+
+
+def test_create_order_invalid_quantity(client, auth_headers, client_user, product):
+    """Тестируем отказ при неположительном количестве (иначе остаток бы увеличился)."""
+    order_data = {"client_id": client_user.id, "product_id": product.id, "quantity": -5}
+    response = client.post('/orders/', json=order_data, headers=auth_headers)
+    assert response.status_code == 400
+    assert response.json['error'] == 'Quantity must be a positive integer'
+
+
+def test_create_order_concurrent_no_overselling(app, auth_headers, client_user, product):
+    """Нагрузочный тест: параллельные заказы не продают больше, чем есть на складе."""
+    product.stock = 10
+    db.session.commit()
+    order_data = {"client_id": client_user.id, "product_id": product.id, "quantity": 1}
+
+    threads_count = 30
+    barrier = threading.Barrier(threads_count)
+    statuses = []
+
+    def checkout():
+        # Каждый поток — отдельный запрос со своим контекстом приложения и сессией БД
+        with app.test_client() as thread_client:
+            barrier.wait()
+            statuses.append(thread_client.post('/orders/', json=order_data, headers=auth_headers).status_code)
+
+    threads = [threading.Thread(target=checkout) for _ in range(threads_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses.count(201) == 10
+    assert statuses.count(400) == threads_count - 10
+
+    db.session.expire_all()
+    assert db.session.get(Product, product.id).stock == 0
+    assert Order.query.filter_by(product_id=product.id).count() == 10
+
+
+def test_delete_order_returns_stock(client, auth_headers, client_user, product):
+    """Тестируем возврат товара на склад при удалении заказа."""
+    order_data = {"client_id": client_user.id, "product_id": product.id, "quantity": 4}
+    order_id = client.post('/orders/', json=order_data, headers=auth_headers).json['id']
+    assert db.session.get(Product, product.id).stock == 96
+
+    client.delete(f'/orders/{order_id}/', headers=auth_headers)
+    db.session.expire_all()
+    assert db.session.get(Product, product.id).stock == 100
+
+
+@pytest.fixture
+def second_product():
+    """Второй продукт для пакетных заказов."""
+    product = Product(name="Second Product", price=5.0, stock=10)
+    db.session.add(product)
+    db.session.commit()
+    return product
+
+
+def test_create_orders_batch(client, auth_headers, client_user, product, second_product):
+    """Тестируем создание корзины из нескольких строк одним запросом."""
+    batch = {
+        "client_id": client_user.id,
+        "items": [
+            {"product_id": product.id, "quantity": 2},
+            {"product_id": second_product.id, "quantity": 3},
+            {"product_id": product.id, "quantity": 1}
+        ]
+    }
+    response = client.post('/orders/batch', json=batch, headers=auth_headers)
+    assert response.status_code == 201
+    assert response.json['message'] == 'Orders created successfully'
+
+    orders = [db.session.get(Order, order_id) for order_id in response.json['ids']]
+    assert [(o.product_id, o.quantity, o.total_price) for o in orders] == [
+        (product.id, 2, 40.0), (second_product.id, 3, 15.0), (product.id, 1, 20.0)
+    ]
+
+    db.session.expire_all()
+    assert db.session.get(Product, product.id).stock == 97
+    assert db.session.get(Product, second_product.id).stock == 7
+
+
+def test_create_orders_batch_is_atomic(client, auth_headers, client_user, product, second_product):
+    """Тестируем, что при нехватке одного товара не создаётся ни один заказ."""
+    batch = {
+        "client_id": client_user.id,
+        "items": [
+            {"product_id": product.id, "quantity": 2},
+            {"product_id": second_product.id, "quantity": 11}
+        ]
+    }
+    response = client.post('/orders/batch', json=batch, headers=auth_headers)
+    assert response.status_code == 400
+    assert response.json['error'] == 'Not enough stock available'
+
+    db.session.expire_all()
+    assert db.session.get(Product, product.id).stock == 100
+    assert db.session.get(Product, second_product.id).stock == 10
+    assert Order.query.count() == 0
+
+
+def test_create_orders_batch_invalid_product(client, auth_headers, client_user, product):
+    """Тестируем пакетный заказ с несуществующим продуктом."""
+    batch = {
+        "client_id": client_user.id,
+        "items": [{"product_id": product.id, "quantity": 1}, {"product_id": 9999, "quantity": 1}]
+    }
+    response = client.post('/orders/batch', json=batch, headers=auth_headers)
+    assert response.status_code == 400
+    assert response.json['error'] == 'Invalid client or product ID'
+
+    response = client.post('/orders/batch', json={"client_id": client_user.id, "items": []}, headers=auth_headers)
+    assert response.status_code == 400
+
+
+def test_create_orders_batch_malformed_payload(client, auth_headers, client_user):
+    """Тестируем ответ 400, а не 500, когда тело или строки пакетного заказа не объекты."""
+    for items in ([1], [None], ["rose"]):
+        response = client.post('/orders/batch', json={"client_id": client_user.id, "items": items},
+                               headers=auth_headers)
+        assert response.status_code == 400
+        assert response.json['error'].startswith('Each item needs')
+
+    response = client.post('/orders/batch', json=[{"product_id": 1, "quantity": 1}], headers=auth_headers)
+    assert response.status_code == 400
@@ -0,0 +1,104 @@
+import threading
+import pytest
+from app import db
+from app.models import OutboxEvent, Product
+from app.utils.cache import collection_version, version_key
+from app.utils.jobs import make_job, queue_stats
+import app.utils.outbox as outbox
+from app.utils.outbox import commit_with_outbox, record_invalidation, record_jobs, relay, relay_batch
+from app.utils.redis_client import CircuitBreaker, CircuitBreakerRedis
+
+
+@pytest.fixture
+def dead_redis():
+    """Клиент Redis, который не может подключиться (порт закрыт)"""
+    return CircuitBreakerRedis(host='127.0.0.1', port=1, socket_connect_timeout=0.1,
+                               breaker=CircuitBreaker(failure_threshold=1, reset_timeout=60))
+
+
+def test_commit_delivers_events_eagerly(app, client, redis_client, auth_headers):
+    """Тестируем доставку сразу после commit: кэш сброшен, таблица outbox пуста."""
+    response = client.post('/products/', headers=auth_headers, json={'name': "Rose", 'price': 10.0})
+    assert response.status_code == 201
+    assert redis_client.get(version_key('products_list')) is not None
+    assert OutboxEvent.query.count() == 0
+
+
+def test_relay_delivers_events_after_redis_outage(app, client, redis_client, auth_headers, dead_redis):
+    """Тестируем, что при недоступном Redis изменение фиксируется, а relay доставляет сброс позже."""
+    app.redis_client = dead_redis
+    response = client.post('/products/', headers=auth_headers, json={'name': "Rose", 'price': 10.0})
+    assert response.status_code == 201
+    assert Product.query.count() == 1
+    assert OutboxEvent.query.count() == 1
+
+    app.redis_client = redis_client
+    result = app.test_cli_runner().invoke(args=['outbox', 'relay', '--once'])
+    assert result.exit_code == 0, result.output
+    assert 'Delivered 1 outbox events' in result.output
+    assert redis_client.get(version_key('products_list')) is not None
+    assert OutboxEvent.query.count() == 0
+
+
+def test_rolled_back_events_are_not_delivered(app, redis_client):
+    """Тестируем, что события откаченной транзакции не сохраняются и не доставляются."""
+    record_invalidation('products_list')
+    db.session.rollback()
+    db.session.add(Product(name="Rose", price=10.0))
+    commit_with_outbox()
+
+    assert OutboxEvent.query.count() == 0
+    assert redis_client.get(version_key('products_list')) is None
+
+
+def test_relay_merges_events_into_one_delivery(app, redis_client):
+    """Тестируем пакетную доставку: одинаковые сбросы объединяются, задачи ставятся в очередь."""
+    version = collection_version(redis_client, 'orders')
+    for i in range(3):
+        record_invalidation('orders', keys=[f"product:{i}"])
+        record_jobs(make_job('low_stock_check', {'product_ids': [i]}))
+        commit_with_outbox(eager=False)
+    assert OutboxEvent.query.count() == 6
+
+    assert relay(redis_client, batch_size=4) == 6
+    # Две пачки — два сброса версии вместо трёх
+    assert collection_version(redis_client, 'orders') == version + 2
+    assert queue_stats(redis_client)['queued'] == 3
+    assert OutboxEvent.query.count() == 0
+
+
+def test_relay_skips_events_delivered_eagerly(app, redis_client, monkeypatch):
+    """Тестируем, что relay, запущенный во время немедленной доставки, не доставляет те же события повторно."""
+    version = collection_version(redis_client, 'orders')
+    deliver = outbox.deliver
+    relayed = []
+
+    def relay_concurrently():
+        with app.app_context():
+            relayed.append(relay_batch(redis_client, batch_size=10))
+
+    def deliver_with_relay(redis_client, payloads):
+        # Relay работает в другом потоке (своя сессия) между commit и удалением событий
+        thread = threading.Thread(target=relay_concurrently)
+        thread.start()
+        thread.join()
+        deliver(redis_client, payloads)
+
+    monkeypatch.setattr(outbox, 'deliver', deliver_with_relay)
+    record_invalidation('orders')
+    commit_with_outbox()
+
+    assert relayed == [0]
+    assert collection_version(redis_client, 'orders') == version + 1
+    assert OutboxEvent.query.count() == 0
+
+
+def test_failed_eager_delivery_is_released_to_relay(app, redis_client, dead_redis):
+    """Тестируем, что после неудачной немедленной доставки relay сразу забирает события."""
+    app.redis_client = dead_redis
+    record_invalidation('orders')
+    commit_with_outbox()
+    assert OutboxEvent.query.one().claimed_at is None
+
+    assert relay_batch(redis_client, batch_size=10) == 1
+    assert OutboxEvent.query.count() == 0
@@ -22,7 +22,7 @@ def admin_user():
 @pytest.fixture
 def auth_headers(admin_user):
     """Создаем заголовки с токеном для авторизации администратора."""
-    token = create_access_token(identity=admin_user.id)
+    token = create_access_token(identity=str(admin_user.id))
     return {"Authorization": f"Bearer {token}"}
 
 
@@ -95,3 +95,149 @@ def test_delete_product(client, auth_headers, product):
     # Проверяем, что продукт был удален из базы
     deleted_product = Product.query.get(product.id)
     assert deleted_product is None
+
+
+def test_get_products_paginated(client, auth_headers):
+    """Тестируем курсорную пагинацию списка продуктов."""
+    db.session.add_all([Product(name=f"Product {i}", price=10.0 + i, stock=i) for i in range(5)])
+    db.session.commit()
+
+    response = client.get('/products/?limit=2', headers=auth_headers)
+    assert response.status_code == 200
+    first_page = response.json
+    assert [p['name'] for p in first_page['items']] == ["Product 0", "Product 1"]
+    assert first_page['next_cursor'] is not None
+
+    # Проходим по всем страницам до конца
+    names = [p['name'] for p in first_page['items']]
+    cursor = first_page['next_cursor']
+    while cursor:
+        page = client.get(f'/products/?limit=2&cursor={cursor}', headers=auth_headers).json
+        names.extend(p['name'] for p in page['items'])
+        cursor = page['next_cursor']
+    assert names == [f"Product {i}" for i in range(5)]
+
+
+def test_get_products_page_cache_invalidated(client, redis_client, auth_headers, product):
+    """Тестируем, что изменение продукта делает закэшированные страницы неактуальными."""
+    response = client.get('/products/?limit=10', headers=auth_headers)
+    assert response.json['items'][0]['name'] == "Test Product"
+
+    client.put(f'/products/{product.id}/', json={"name": "Renamed"}, headers=auth_headers)
+
+    response = client.get('/products/?limit=10', headers=auth_headers)
+    assert response.json['items'][0]['name'] == "Renamed"
+
+
+def test_get_products_invalid_cursor(client, auth_headers):
+    """Тестируем ошибку при некорректных параметрах пагинации."""
+    response = client.get('/products/?cursor=not-a-cursor', headers=auth_headers)
+    assert response.status_code == 400
+    assert response.json['error'] == 'Invalid cursor'
+
+    response = client.get('/products/?limit=0', headers=auth_headers)
+    assert response.status_code == 400
+
+
+def test_get_product_not_found(client, auth_headers):
+    """Тестируем получение несуществующего продукта."""
+    response = client.get('/products/9999/', headers=auth_headers)
+    assert response.status_code == 404
+    assert response.json['error'] == 'Product not found'
+
+
+def test_get_products_by_ids(client, redis_client, auth_headers):
+    """Тестируем пакетное получение продуктов по списку ID с кэшированием по одному."""
+    products = [Product(name=f"Product {i}", price=10.0, stock=i) for i in range(3)]
+    db.session.add_all(products)
+    db.session.commit()
+    ids = [products[2].id, 9999, products[0].id]
+
+    response = client.get(f'/products/?ids={",".join(map(str, ids))}', headers=auth_headers)
+    assert response.status_code == 200
+    assert [p['name'] for p in response.json] == ["Product 2", "Product 0"]
+
+    # Каждый найденный продукт закэширован в собственном хэше
+    assert redis_client.exists(f'product:{products[0].id}')
+    assert redis_client.exists(f'product:{products[2].id}')
+    assert not redis_client.exists(f'product:{products[1].id}')
+
+    response = client.get('/products/?ids=1,abc', headers=auth_headers)
+    assert response.status_code == 400
+
+
+def test_update_product_invalidates_only_its_entry(client, redis_client, auth_headers, product):
+    """Тестируем, что обновление сбрасывает кэш только изменённого продукта."""
+    other = Product(name="Other", price=5.0, stock=1)
+    db.session.add(other)
+    db.session.commit()
+    client.get(f'/products/?ids={product.id},{other.id}', headers=auth_headers)
+
+    client.put(f'/products/{product.id}/', json={"price": 99.0}, headers=auth_headers)
+    assert not redis_client.exists(f'product:{product.id}')
+    assert redis_client.exists(f'product:{other.id}')
+
+    response = client.get(f'/products/{product.id}/', headers=auth_headers)
+    assert response.json['price'] == 99.0
+
+
+def test_import_products_csv(client, redis_client, auth_headers):
+    """Тестируем массовый импорт каталога из CSV с upsert по sku."""
+    db.session.add(Product(sku="ROSE-1", name="Old Rose", price=1.0, stock=1))
+    db.session.commit()
+    client.get('/products/', headers=auth_headers)  # прогреваем кэш каталога
+
+    body = (
+        "sku,name,description,price,stock\n"
+        "ROSE-1,Rose,Red roses,29.99,100\n"
+        "TULIP-1,Tulip,,9.5,20\n"
+        "BROKEN,,,abc,\n"
+    )
+    response = client.post('/products/import', data=body, content_type='text/csv', headers=auth_headers)
+    assert response.status_code == 200
+    report = response.json
+    assert report['processed'] == 3
+    assert report['upserted'] == 2
+    assert report['rejected'] == 1
+    assert report['errors'][0]['row'] == 3
+    assert 'rows_per_second' in report
+
+    rose = Product.query.filter_by(sku="ROSE-1").one()
+    assert (rose.name, rose.price, rose.stock) == ("Rose", 29.99, 100)
+    assert Product.query.filter_by(sku="TULIP-1").one().description is None
+
+    # Кэш каталога перестроен один раз и уже содержит новые данные
+    response = client.get('/products/', headers=auth_headers)
+    assert sorted(p['sku'] for p in response.json) == ["ROSE-1", "TULIP-1"]
+
+
+def test_import_products_rejects_non_finite_prices(client, redis_client, auth_headers):
+    """Тестируем, что цены nan и inf отклоняются как некорректные строки."""
+    body = (
+        "sku,name,description,price,stock\n"
+        "ROSE-1,Rose,,nan,10\n"
+        "TULIP-1,Tulip,,inf,10\n"
+        "LILY-1,Lily,,-Infinity,10\n"
+        "IRIS-1,Iris,,12.5,10\n"
+    )
+    response = client.post('/products/import', data=body, content_type='text/csv', headers=auth_headers)
+    assert response.status_code == 200
+    report = response.json
+    assert (report['upserted'], report['rejected']) == (1, 3)
+    assert [error['row'] for error in report['errors']] == [1, 2, 3]
+    assert [product.sku for product in Product.query.all()] == ["IRIS-1"]
+
+
+def test_import_products_cli(app, redis_client, tmp_path):
+    """Тестируем CLI-команду flask products import для файла JSON Lines."""
+    path = tmp_path / "catalog.jsonl"
+    path.write_text(
+        '{"sku": "LILY-1", "name": "Lily", "price": 15, "stock": 3}\n'
+        '{"sku": "LILY-1", "name": "White Lily", "price": 16, "stock": 4}\n'
+    )
+    result = app.test_cli_runner().invoke(args=['products', 'import', str(path)])
+    assert result.exit_code == 0, result.output
+    assert 'rows/s' in result.output
+
+    lily = Product.query.filter_by(sku="LILY-1").one()
+    assert (lily.name, lily.stock) == ("White Lily", 4)
@@ -0,0 +1,81 @@
+import json
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import select, text
+from app import db
+from app.models import Client, Order, Product
+
+SEED_CLIENTS = 2000
+SEED_PRODUCTS = 500
+SEED_ORDERS = 200000
+SEED_START = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def large_dataset(app):
+    """Большой набор данных, на котором планировщик выбирает индекс вместо полного чтения таблицы"""
+    if db.engine.dialect.name != 'postgresql':
+        pytest.skip("Планы запросов проверяются только на PostgreSQL")
+
+    db.session.execute(text(
+        "INSERT INTO client (name, email, password, created_at, role) "
+        "SELECT 'Client ' || i, 'client' || i || '@example.com', 'x', :start, 'CLIENT' "
+        "FROM generate_series(1, :count) AS i"
+    ), {'start': SEED_START, 'count': SEED_CLIENTS})
+    db.session.execute(text(
+        "INSERT INTO product (sku, name, price, stock, created_at) "
+        "SELECT 'SKU-' || i, 'Product ' || i, 10, 1000, :start "
+        "FROM generate_series(1, :count) AS i"
+    ), {'start': SEED_START, 'count': SEED_PRODUCTS})
+    # Заказы равномерно распределены по клиентам, продуктам и году
+    db.session.execute(text(
+        'INSERT INTO "order" (client_id, product_id, quantity, total_price, created_at) '
+        "SELECT 1 + i % :clients, 1 + i % :products, 1, 10, "
+        "       :start + (i % 365) * interval '1 day' + (i % 86400) * interval '1 second' "
+        "FROM generate_series(1, :count) AS i"
+    ), {'clients': SEED_CLIENTS, 'products': SEED_PRODUCTS, 'start': SEED_START, 'count': SEED_ORDERS})
+    db.session.commit()
+
+    with db.engine.connect() as connection:
+        connection.execute(text('ANALYZE client, product, "order"'))
+
+
+def _plan_nodes(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from _plan_nodes(child)
+
+
+def _seq_scans(stmt):
+    """Таблицы, которые запрос читает полным сканированием, по плану EXPLAIN"""
+    compiled = stmt.compile(dialect=db.engine.dialect)
+    with db.engine.connect() as connection:
+        plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return [node['Relation Name'] for node in _plan_nodes(plan[0]['Plan']) if node['Node Type'] == 'Seq Scan']
+
+
+MAIN_QUERIES = {
+    'client order history': lambda: select(Order).where(Order.client_id == 42, Order.created_at.isnot(None))
+        .order_by(Order.created_at.desc(), Order.id.desc()).limit(50),
+    'client orders in period': lambda: select(Order).where(
+        Order.client_id == 42,
+        Order.created_at >= SEED_START + timedelta(days=30),
+        Order.created_at < SEED_START + timedelta(days=60)),
+    'orders in period': lambda: select(Order).where(
+        Order.created_at >= SEED_START + timedelta(days=100),
+        Order.created_at < SEED_START + timedelta(days=101)),
+    'orders of product': lambda: select(Order).where(Order.product_id == 7),
+    'orders page': lambda: select(Order).where(Order.id > 150000).order_by(Order.id).limit(50),
+    'product by sku': lambda: select(Product).where(Product.sku == 'SKU-123'),
+    'products page': lambda: select(Product).where(Product.id > 100).order_by(Product.id).limit(50),
+    'client by email': lambda: select(Client).where(Client.email == 'client42@example.com'),
+    'clients page': lambda: select(Client).where(Client.id > 1000).order_by(Client.id).limit(50),
+}
+
+
+def test_main_queries_use_indexes(large_dataset):
+    """Ни один из основных запросов не должен читать таблицу целиком"""
+    failures = {name: scans for name, query in MAIN_QUERIES.items() if (scans := _seq_scans(query()))}
+    assert not failures, f"Sequential scans in query plans: {failures}"
@@ -0,0 +1,81 @@
+import threading
+import pytest
+from flask import jsonify
+from app.utils import rate_limit as rate_limit_module
+from app.utils.rate_limit import rate_limit, hit, by_ip
+
+
+@pytest.fixture
+def limited_route(app, redis_client):
+    """Тестовый маршрут: не больше 5 запросов с одного IP за 60 секунд"""
+    @rate_limit('test_limit', limit=5, window=60, key_func=by_ip)
+    def limited():
+        return jsonify({'ok': True})
+
+    app.add_url_rule('/limited', 'limited', limited)
+    return '/limited'
+
+
+def test_sliding_window(redis_client, monkeypatch):
+    """Тестируем, что старые отметки выходят из окна и лимит восстанавливается."""
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit_module.time, 'time', lambda: now[0])
+
+    for _ in range(3):
+        allowed, _, _ = hit(redis_client, 'window:key', limit=3, window=10)
+        assert allowed
+    allowed, _, retry_after = hit(redis_client, 'window:key', limit=3, window=10)
+    assert not allowed
+    assert retry_after == 11
+
+    # Через 11 секунд все отметки старше окна
+    now[0] += 11
+    allowed, _, _ = hit(redis_client, 'window:key', limit=3, window=10)
+    assert allowed
+    assert redis_client.zcard('window:key') == 1
+    assert 0 < redis_client.ttl('window:key') <= 11
+
+
+def test_decorator_limits_per_ip(client, redis_client, limited_route):
+    """Тестируем, что лимит считается отдельно для каждого IP."""
+    for _ in range(5):
+        assert client.get(limited_route, environ_base={'REMOTE_ADDR': '10.0.0.1'}).status_code == 200
+
+    response = client.get(limited_route, environ_base={'REMOTE_ADDR': '10.0.0.1'})
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) > 0
+
+    # Отклонённые запросы не учитываются, другой IP не затронут
+    assert redis_client.zcard('test_limit:10.0.0.1') == 5
+    assert client.get(limited_route, environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code == 200
+
+
+def test_decorator_concurrent_requests(app, redis_client, limited_route):
+    """Тестируем, что параллельные запросы не могут превысить лимит."""
+    statuses = []
+    barrier = threading.Barrier(20)
+
+    def worker():
+        test_client = app.test_client()
+        barrier.wait()
+        statuses.append(test_client.get(limited_route).status_code)
+
+    threads = [threading.Thread(target=worker) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses.count(200) == 5
+    assert statuses.count(429) == 15
+
+
+def test_login_limited_per_ip(app, client, redis_client):
+    """Тестируем ограничение неудачных входов с одного IP по разным email."""
+    app.config['LOGIN_IP_MAX_ATTEMPTS'] = 3
+    for i in range(3):
+        response = client.post('/auth/login', json={'email': f'user{i}@example.com', 'password': 'wrong'})
+        assert response.status_code == 401
+
+    response = client.post('/auth/login', json={'email': 'user9@example.com', 'password': 'wrong'})
+    assert response.status_code == 429
@@ -114,7 +114,6 @@ def test_login_attempts_limit(redis_client, app, new_user_data):
         assert response.status_code == 429
         assert response.json['error'] == 'Too many login attempts. Please try again later.'
 
-        # Проверяем, что количество попыток в Redis увеличено
+        # Проверяем, что в скользящем окне учтены 5 неудачных попыток (отклонённая не считается)
         attempts_key = f"login_attempts:{new_user_data['email']}"
-        attempts = redis_client.get(attempts_key)
-        assert int(attempts) == 5
+        assert redis_client.zcard(attempts_key) == 5
@@ -0,0 +1,71 @@
+import time
+import pytest
+import redis
+from app import db
+from app.models import Product
+from app.utils.redis_client import (
+    CircuitBreaker, CircuitBreakerRedis, RedisUnavailable, create_redis_client, pool_stats
+)
+
+
+@pytest.fixture
+def dead_redis():
+    """Клиент Redis, который не может подключиться (порт закрыт)"""
+    return CircuitBreakerRedis(host='127.0.0.1', port=1, socket_connect_timeout=0.1,
+                               breaker=CircuitBreaker(failure_threshold=2, reset_timeout=0.2))
+
+
+def test_circuit_breaker_opens_and_recovers(dead_redis):
+    """Тестируем размыкание автомата после ошибок и пробный вызов после таймаута."""
+    for _ in range(2):
+        with pytest.raises(redis.ConnectionError):
+            dead_redis.get('key')
+    assert dead_redis.breaker.state == CircuitBreaker.OPEN
+
+    # Пока автомат разомкнут, запрос не уходит в сеть
+    started = time.monotonic()
+    with pytest.raises(RedisUnavailable):
+        dead_redis.get('key')
+    with pytest.raises(RedisUnavailable):
+        dead_redis.pipeline().get('key').execute()
+    assert time.monotonic() - started < 0.05
+    assert dead_redis.breaker.rejected == 2
+
+    # После таймаута пробный вызов проходит; успех замыкает цепь
+    time.sleep(0.25)
+    assert dead_redis.breaker.call(lambda: 'pong') == 'pong'
+    assert dead_redis.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_routes_degrade_to_database(app, client, auth_headers, dead_redis):
+    """Тестируем, что при недоступном Redis каталог и страницы отдаются из БД."""
+    db.session.add(Product(name="Rose", price=10.0, stock=5))
+    db.session.commit()
+    app.redis_client = dead_redis
+
+    response = client.get('/products/', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json[0]['name'] == "Rose"
+
+    response = client.get('/products/?limit=10', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json['items'][0]['name'] == "Rose"
+    assert dead_redis.breaker.rejected > 0
+
+
+def test_create_redis_client_pool_settings(app):
+    """Тестируем настройки пула и метрики заполненности."""
+    app.config.update(REDIS_MAX_CONNECTIONS=7, REDIS_POOL_BLOCKING=True)
+    redis_client = create_redis_client(app.config)
+
+    stats = pool_stats(redis_client)
+    assert stats['pool']['class'] == 'BlockingConnectionPool'
+    assert stats['pool']['max_connections'] == 7
+    assert stats['pool']['in_use'] == 0
+    assert stats['circuit_breaker'] == {'state': 'closed', 'failures': 0, 'rejected': 0}
+
+
+def test_redis_metrics_endpoint(client, redis_client, auth_headers):
+    response = client.get('/metrics/redis', headers=auth_headers)
+    assert response.status_code == 200
+    assert 'utilization' in response.json['pool']
@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+from app import db
+from app.models import Client, DailySales, Order, Product, ProductSales
+
+
+def create_catalog():
+    customers = [Client(name=name, email=f"{name.lower()}@example.com", password="x") for name in ("Jane", "Bob")]
+    products = [Product(name="Rose", price=10.0, stock=100), Product(name="Tulip", price=4.0, stock=100)]
+    db.session.add_all(customers + products)
+    db.session.commit()
+    return customers, products
+
+
+def test_reports_follow_order_changes(app, client, auth_headers):
+    """Тестируем, что создание, пакетный заказ и удаление сразу отражаются в отчётах."""
+    (jane, bob), (rose, tulip) = create_catalog()
+    first = client.post('/orders/', headers=auth_headers,
+                        json={'client_id': jane.id, 'product_id': rose.id, 'quantity': 2})
+    client.post('/orders/batch', headers=auth_headers, json={'client_id': bob.id, 'items': [
+        {'product_id': tulip.id, 'quantity': 5}, {'product_id': rose.id, 'quantity': 1}
+    ]})
+
+    response = client.get('/reports/products', headers=auth_headers)
+    assert response.status_code == 200
+    assert [(row['name'], row['orders'], row['items'], row['revenue']) for row in response.json] == \
+        [("Rose", 2, 3, 30.0), ("Tulip", 1, 5, 20.0)]
+    # Топ продаж по штукам
+    top = client.get('/reports/products?sort=items&limit=1', headers=auth_headers).json
+    assert [row['name'] for row in top] == ["Tulip"]
+
+    clients = client.get('/reports/clients', headers=auth_headers).json
+    assert [(row['name'], row['revenue']) for row in clients] == [("Bob", 30.0), ("Jane", 20.0)]
+
+    client.delete(f"/orders/{first.json['id']}/", headers=auth_headers)
+    clients = client.get('/reports/clients', headers=auth_headers).json
+    assert [row['name'] for row in clients] == ["Bob"]
+    daily = client.get('/reports/daily', headers=auth_headers).json
+    assert daily == [{'day': datetime.utcnow().date().isoformat(), 'orders': 2, 'items': 6, 'revenue': 30.0}]
+
+
+def test_rollup_rebuilds_aggregates_from_orders(app, client, auth_headers):
+    """Тестируем полный пересчёт агрегатов для заказов, записанных в обход маршрутов."""
+    (jane, _), (rose, _) = create_catalog()
+    week_ago = datetime.utcnow() - timedelta(days=7)
+    db.session.add_all([
+        Order(client_id=jane.id, product_id=rose.id, quantity=1, total_price=10.0, created_at=week_ago),
+        Order(client_id=jane.id, product_id=rose.id, quantity=4, total_price=40.0)
+    ])
+    db.session.commit()
+    assert ProductSales.query.count() == 0
+
+    result = app.test_cli_runner().invoke(args=['reports', 'rollup'])
+    assert result.exit_code == 0, result.output
+    assert 'Rebuilt sales aggregates: 1 products, 1 clients, 2 days.' in result.output
+    assert db.session.get(ProductSales, rose.id).items == 5
+    assert db.session.get(DailySales, (week_ago.date(), 0)).revenue == 10.0
+
+    response = client.get(f"/reports/daily?from={week_ago.date().isoformat()}&to={week_ago.date().isoformat()}",
+                          headers=auth_headers)
+    assert [row['orders'] for row in response.json] == [1]
+
+
+def test_reports_reject_invalid_parameters(app, client, auth_headers):
+    """Тестируем ответ 400 на некорректные limit, sort и диапазон дат."""
+    assert client.get('/reports/products?limit=0', headers=auth_headers).status_code == 400
+    assert client.get('/reports/clients?sort=name', headers=auth_headers).status_code == 400
+    assert client.get('/reports/daily?from=2026-10-18&to=2026-10-01', headers=auth_headers).status_code == 400
+    assert client.get('/reports/daily?from=yesterday', headers=auth_headers).status_code == 400
+
+
+def test_daily_report_sums_shards(app, client, auth_headers):
+    """Тестируем, что дневной отчёт складывает шарды счётчика дня."""
+    today = datetime.utcnow().date()
+    db.session.add_all([
+        DailySales(day=today, shard=0, orders=2, items=3, revenue=30.0),
+        DailySales(day=today, shard=5, orders=1, items=4, revenue=16.0)
+    ])
+    db.session.commit()
+
+    response = client.get('/reports/daily', headers=auth_headers)
+    assert response.json == [{'day': today.isoformat(), 'orders': 3, 'items': 7, 'revenue': 46.0}]
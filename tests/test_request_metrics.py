@@ -0,0 +1,65 @@
+from app import db
+from app.models import Product
+from app.utils.request_metrics import MetricsRegistry, flush_metrics, render_prometheus
+
+METRICS_HEADERS = {'Authorization': 'Bearer scrape-secret'}
+
+
+def test_prometheus_metrics_endpoint(app, client, redis_client, auth_headers):
+    """Тестируем гистограммы задержки и размера ответа и счётчики кэша по семействам ключей."""
+    app.config['METRICS_TOKEN'] = 'scrape-secret'
+    db.session.add(Product(name="Rose", price=10.0, stock=5))
+    db.session.commit()
+
+    client.get('/products/', headers=auth_headers)
+    client.get('/products/', headers=auth_headers)
+    response = client.get('/metrics', headers=METRICS_HEADERS)
+
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    body = response.get_data(as_text=True)
+    assert '# TYPE flower_shop_http_request_duration_seconds histogram' in body
+    assert 'flower_shop_http_request_duration_seconds_count{endpoint="/products/",method="GET"} 2' in body
+    assert 'flower_shop_http_request_duration_seconds_bucket{endpoint="/products/",method="GET",le="+Inf"} 2' in body
+    assert 'flower_shop_http_requests_total{endpoint="/products/",method="GET",status="200"} 2' in body
+    assert 'flower_shop_http_response_size_bytes_count{endpoint="/products/",method="GET"} 2' in body
+    assert 'flower_shop_db_time_seconds_total{endpoint="/products/",method="GET"}' in body
+    assert 'flower_shop_cache_requests_total{family="products_list",tier="local",result="hit"} 1' in body
+    assert 'flower_shop_cache_requests_total{family="products_list",tier="redis",result="miss"} 1' in body
+
+
+def test_metrics_are_aggregated_across_workers(app, client, redis_client):
+    """Тестируем суммирование значений, отправленных в Redis другим воркером."""
+    app.config['METRICS_TOKEN'] = 'scrape-secret'
+    other_worker = MetricsRegistry(app.config['METRICS_LATENCY_BUCKETS'])
+    other_worker.record_cache('orders', 'redis', hit=True)
+    other_worker.record_cache('orders', 'redis', hit=True)
+    flush_metrics(other_worker, redis_client, app.config['METRICS_REDIS_KEY'])
+
+    this_worker = app.extensions['request_metrics']
+    this_worker.record_cache('orders', 'redis', hit=True)
+
+    body = client.get('/metrics', headers=METRICS_HEADERS).get_data(as_text=True)
+    assert 'flower_shop_cache_requests_total{family="orders",tier="redis",result="hit"} 3' in body
+    assert other_worker.snapshot() == {}
+
+
+def test_metrics_token(app, client, redis_client):
+    """Тестируем, что метрики отдаются только с токеном, а без METRICS_TOKEN эндпоинт закрыт."""
+    app.config['METRICS_TOKEN'] = None
+    assert client.get('/metrics').status_code == 404
+
+    app.config['METRICS_TOKEN'] = 'scrape-secret'
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    response = client.get('/metrics', headers=METRICS_HEADERS)
+    assert response.status_code == 200
+
+
+def test_render_prometheus_orders_buckets():
+    """Тестируем, что бакеты гистограммы идут по возрастанию границы, а не по строке."""
+    registry = MetricsRegistry([0.1, 1, 10])
+    registry.record_request('/x', 'GET', 200, 0.5, None, 0, 0.0, 0.0)
+
+    lines = [line for line in render_prometheus(registry.snapshot()).splitlines() if '_bucket' in line]
+    assert [line.split('le="')[1].split('"')[0] for line in lines] == ['1.0', '10.0', '+Inf']
@@ -0,0 +1,32 @@
+import random
+from collections import Counter
+from app import db
+from app.models import Client, Order, Product
+from app.utils.seed import ZipfSampler
+
+
+def test_zipf_sampler_is_skewed():
+    """Тестируем перекос популярности: первый ранг выбирается намного чаще среднего."""
+    sampler = ZipfSampler(range(100), s=1.1, rng=random.Random(1))
+    counts = Counter(sampler.sample(20000))
+
+    top_value, top_count = counts.most_common(1)[0]
+    assert top_value == sampler.values[0]
+    assert top_count > 20000 / 100 * 10
+
+
+def test_seed_cli(app, redis_client):
+    """Тестируем CLI-команду flask seed: число строк, суммы заказов и повторный запуск."""
+    args = ['seed', '--clients', '20', '--products', '30', '--orders', '500', '--batch-size', '64', '--seed', '7']
+    result = app.test_cli_runner().invoke(args=args)
+    assert result.exit_code == 0, result.output
+    assert 'rows/s' in result.output
+
+    assert (Client.query.count(), Product.query.count(), Order.query.count()) == (20, 30, 500)
+    order = Order.query.first()
+    assert order.total_price == round(order.product.price * order.quantity, 2)
+
+    # Повторный запуск с тем же --seed не конфликтует по уникальным email и sku
+    result = app.test_cli_runner().invoke(args=args)
+    assert result.exit_code == 0, result.output
+    assert (Client.query.count(), Product.query.count(), db.session.query(Order).count()) == (40, 60, 1000)